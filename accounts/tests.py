@@ -1,3 +1,100 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from online_poll.testing import ENFORCED_BUDGETS, LOCMEM_CACHES, EndpointBudgetCoverageMixin
+
+from . import urls
+
+PASSWORD = "Correct-horse-42"
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUERY_BUDGETS=ENFORCED_BUDGETS,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+@mock.patch("accounts.utils.send_verification_email_task")
+@mock.patch("accounts.views.send_password_reset_email_task")
+@mock.patch("accounts.views.send_verification_email_task")
+class EndpointQueryBudgetTests(EndpointBudgetCoverageMixin, TestCase):
+    """
+    Every endpoint in accounts/urls.py: QueryBudgetMiddleware raises when a
+    request runs more queries than QUERY_BUDGETS allows or repeats a query
+    shape (N+1). Emails are queued, not sent, so the tasks are stubbed.
+    """
+
+    budget_urls = urls
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="user@example.com", password=PASSWORD,
+                                                         is_verified=True)
+
+    def setUp(self):
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_signup(self, *tasks):
+        response = APIClient().post(reverse("auth-signup"), {
+            "first_name": "New", "last_name": "User", "email": "new@example.com",
+            "password": PASSWORD, "confirm_password": PASSWORD,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_login(self, *tasks):
+        response = APIClient().post(reverse("token_obtain_pair"),
+                                    {"email": self.user.email, "password": PASSWORD}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_refresh(self, *tasks):
+        response = APIClient().post(reverse("token_refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self, *tasks):
+        response = self.client.post(reverse("auth-logout"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_forgot_password(self, *tasks):
+        response = APIClient().post(reverse("auth-forgot-password"), {"email": self.user.email}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_resend_verification(self, *tasks):
+        self.user.is_verified = False
+        self.user.save()
+        response = APIClient().post(reverse("resend-verification"), {"email": self.user.email}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_reset_password(self, *tasks):
+        response = APIClient().post(reverse("auth-reset-password"), {
+            "uid": str(self.user.pk), "token": default_token_generator.make_token(self.user),
+            "new_password": "Another-horse-43", "confirm_password": "Another-horse-43",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_verify_email(self, *tasks):
+        url = reverse("verify-email", args=[self.user.pk, default_token_generator.make_token(self.user)])
+        self.assertEqual(APIClient().get(url).status_code, 200)
+
+    def test_profile(self, *tasks):
+        self.assertEqual(self.client.get(reverse("profile")).status_code, 200)
+        self.assertEqual(self.client.patch(reverse("profile"), {"first_name": "Renamed"}, format="json").status_code,
+                         200)
+
+    def test_change_password(self, *tasks):
+        response = self.client.post(reverse("change-password"), {
+            "old_password": PASSWORD, "new_password": "Another-horse-43", "confirm_new_password": "Another-horse-43",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_toggle_notification(self, *tasks):
+        response = self.client.patch(reverse("toggle-notification"), {"notification_enabled": False}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch("accounts.views.current_app")
+    def test_celery_health(self, current_app, *tasks):
+        current_app.control.inspect.return_value.stats.return_value = {"worker@host": {}}
+        self.assertEqual(APIClient().get(reverse("celery-health")).status_code, 200)
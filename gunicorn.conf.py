@@ -0,0 +1,15 @@
+"""
+Gunicorn settings for the web process, loaded from the working directory
+by the gunicorn commands in Dockerfile, docker-compose.yml and render.yaml.
+
+The app is served over WSGI by default. ASGI=True serves online_poll.asgi
+through uvicorn workers instead, which the live results stream needs: see
+the ASGI notes in online_poll/settings.py before switching.
+"""
+import os
+
+if os.getenv('ASGI', 'False').lower() in ('true', '1', 't', 'yes'):
+    wsgi_app = 'online_poll.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'online_poll.wsgi:application'
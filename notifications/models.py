@@ -26,8 +26,10 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=["recipient", "read"]),
             models.Index(fields=["-created_at"]),
+            models.Index(fields=["recipient", "-created_at", "-id"]),
         ]
 
     def __str__(self):
-        return f"Notif to {self.recipient}: {self.verb}"
+        recipient = self.recipient if Notification.recipient.is_cached(self) else self.recipient_id
+        return f"Notif to {recipient}: {self.verb}"
 
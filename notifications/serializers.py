@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from voteapp.fast_serializers import ValuesSerializer
 from .models import Notification
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -17,3 +18,14 @@ class NotificationSerializer(serializers.ModelSerializer):
             # representation for actor
             return {"id": str(obj.actor_user.pk), "email": getattr(obj.actor_user, "email", None)}
         return None
+
+
+class FastNotificationSerializer(ValuesSerializer):
+    """NotificationSerializer from .values() rows, with the actor joined in"""
+    serializer_class = NotificationSerializer
+    extra_columns = {"actor": ["actor_user_id", "actor_user__email"]}
+
+    def represent_actor(self, row):
+        if row["actor_user_id"] is None:
+            return None
+        return {"id": str(row["actor_user_id"]), "email": row["actor_user__email"]}
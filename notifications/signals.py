@@ -3,6 +3,8 @@ from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.apps import apps
 from django.conf import settings
+from voteapp.signals import polls_imported, votes_recorded
+from .models import Notification
 from .utils import create_notification
 
 # don't import polls.models at top level; get models lazily inside handlers
@@ -24,6 +26,19 @@ def poll_created_notify(sender, instance, created, **kwargs):
             email=False,
         )
 
+@receiver(polls_imported)
+def polls_imported_notify(sender, polls, campaign, created_by, **kwargs):
+    # One notification for the whole import instead of one per poll
+    create_notification(
+        recipient=created_by,
+        actor_user=created_by,
+        verb="imported polls",
+        target=campaign,
+        description=f"{len(polls)} polls imported into '{campaign.title}'",
+        link=f"/campaigns/{campaign.pk}",
+        email=False,
+    )
+
 @receiver(post_save, sender=None)
 def vote_created_notify(sender, instance, created, **kwargs):
     Poll = apps.get_model('voteapp', 'Poll')
@@ -33,7 +48,9 @@ def vote_created_notify(sender, instance, created, **kwargs):
     if sender is Vote and created:
         poll = instance.poll
         voter = instance.voter_user
-        if poll.created_by != voter:
+        # Compare keys: the owner is only loaded when there is someone to notify
+        # (the vote path fetches it with the poll)
+        if poll.created_by_id != instance.voter_user_id:
             create_notification(
                 recipient=poll.created_by,
                 actor_user=voter,
@@ -45,7 +62,7 @@ def vote_created_notify(sender, instance, created, **kwargs):
             )
     # handle Comment saves
     if sender is Comment and created:
-        poll = instance.poll
+        poll = Poll.objects.select_related('created_by').get(pk=instance.poll_id)
         create_notification(
             recipient=poll.created_by,
             actor_user=instance.user,
@@ -55,3 +72,31 @@ def vote_created_notify(sender, instance, created, **kwargs):
             link=f"/polls/{poll.pk}",
             email=False,
         )
+
+@receiver(votes_recorded)
+def buffered_votes_notify(sender, votes, buffered=False, **kwargs):
+    # vote_created_notify for votes flushed from the buffer, which have no post_save
+    if not buffered:
+        return
+    Poll = apps.get_model('voteapp', 'Poll')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    polls = Poll.objects.select_related('created_by').in_bulk({vote.poll_id for vote in votes})
+    voters = User.objects.in_bulk({vote.voter_user_id for vote in votes if vote.voter_user_id})
+    notifications = []
+    for vote in votes:
+        poll = polls.get(vote.poll_id)
+        voter = voters.get(vote.voter_user_id)
+        # Same checks as create_notification(), which saves one row at a time
+        if (poll is None or poll.created_by_id == vote.voter_user_id
+                or getattr(poll.created_by, "notification_enabled", True) is False):
+            continue
+        notifications.append(Notification(
+            recipient=poll.created_by,
+            actor_user=voter,
+            verb="voted on your poll",
+            target_type="Poll",
+            target_id=str(poll.pk),
+            description=f"{voter} voted on poll '{poll.title}'",
+            link=f"/polls/{poll.pk}/results",
+        ))
+    Notification.objects.bulk_create(notifications)
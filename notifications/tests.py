@@ -1,3 +1,152 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import urls
+from online_poll.testing import ENFORCED_BUDGETS, LOCMEM_CACHES, EndpointBudgetCoverageMixin, cursor_pages
+from voteapp.models import Poll, PollOption, Vote
+from voteapp.signals import votes_recorded
+from voteapp.renderers import FastJSONRenderer
+from .models import Notification
+from .serializers import FastNotificationSerializer, NotificationSerializer
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUERY_BUDGETS=ENFORCED_BUDGETS)
+class EndpointQueryBudgetTests(EndpointBudgetCoverageMixin, TestCase):
+    """
+    Every endpoint in notifications/urls.py: QueryBudgetMiddleware raises
+    when a request runs more queries than QUERY_BUDGETS allows or repeats a
+    query shape (N+1).
+    """
+
+    budget_urls = urls
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email="user@example.com", password=None)
+        actors = [User.objects.create_user(email=f"actor{n}@example.com", password=None) for n in range(8)]
+        cls.notifications = Notification.objects.bulk_create(
+            Notification(recipient=cls.user, actor_user=actor, verb="voted on") for actor in actors
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_list(self):
+        response = self.client.get(reverse("notifications-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), len(self.notifications))
+
+    def test_unread_count(self):
+        self.assertEqual(self.client.get(reverse("notifications-unread-count")).status_code, 200)
+
+    def test_mark_read(self):
+        ids = [str(notification.pk) for notification in self.notifications]
+        response = self.client.post(reverse("notifications-mark-read"), {"ids": ids}, format="json")
+        self.assertEqual(response.data["updated"], len(ids))
+
+    def test_mark_one_read(self):
+        url = reverse("notification-mark-one", args=[self.notifications[0].pk])
+        self.assertEqual(self.client.post(url).status_code, 200)
+
+    def test_delete(self):
+        url = reverse("notification-delete", args=[self.notifications[0].pk])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FastReadPathTests(TestCase):
+    """The fast notification serializer produces the same bytes as NotificationSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email="user@example.com", password=None)
+        actor = User.objects.create_user(email="actor@example.com", password=None)
+        Notification.objects.create(recipient=cls.user, actor_user=actor, verb="voted on", target_type="Poll",
+                                    description="Ünïcode\u2028description", read=True)
+        Notification.objects.create(recipient=cls.user, verb="system notice", link="/polls/")
+
+    def test_serializer(self):
+        queryset = Notification.objects.select_related("actor_user")
+        rows = FastNotificationSerializer.values(queryset)
+        drf = JSONRenderer().render(NotificationSerializer(queryset, many=True).data)
+        self.assertEqual(drf, JSONRenderer().render(FastNotificationSerializer(rows, many=True).data))
+        self.assertEqual(drf, FastJSONRenderer().render(FastNotificationSerializer(rows, many=True).data))
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        bodies = []
+        for fast_read_path in ({'SERIALIZERS': False, 'RENDERER': False}, settings.FAST_READ_PATH):
+            with self.settings(FAST_READ_PATH=fast_read_path):
+                bodies.append(client.get(reverse("notifications-list")).content)
+        self.assertEqual(bodies[0], bodies[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BufferedVoteNotificationTests(TestCase):
+    """Votes flushed from the buffer notify poll owners like synchronous votes do"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user(email="owner@example.com", password=None)
+        cls.poll = Poll.objects.create(title="Poll", created_by=cls.owner)
+        cls.option = PollOption.objects.create(poll=cls.poll, text="Yes", order=0)
+        cls.voters = [User.objects.create_user(email=f"voter{n}@example.com", password=None) for n in range(5)]
+
+    def test_notifies_owner_once_per_vote(self):
+        votes = Vote.objects.bulk_create(
+            [Vote(poll=self.poll, option=self.option, voter_user=voter) for voter in self.voters]
+            + [Vote(poll=self.poll, option=self.option, voter_user=self.owner)]
+        )
+        with self.assertNumQueries(3):
+            votes_recorded.send(sender=Vote, votes=votes, buffered=True)
+        notifications = Notification.objects.filter(recipient=self.owner, verb="voted on your poll")
+        self.assertEqual({n.actor_user_id for n in notifications}, {voter.pk for voter in self.voters})
+
+    def test_synchronous_votes_are_left_to_post_save(self):
+        vote = Vote.objects.create(poll=self.poll, option=self.option, voter_user=self.voters[0])
+        votes_recorded.send(sender=Vote, votes=[vote])
+        self.assertEqual(Notification.objects.filter(verb="voted on your poll").count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginationTests(TestCase):
+    """?pagination=cursor on the notification list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="user@example.com", password=None)
+        moment = timezone.now()
+        Notification.objects.bulk_create(
+            # Ties on created_at are broken by id
+            Notification(recipient=cls.user, verb=f"notice {n}", created_at=moment - datetime.timedelta(minutes=n // 4))
+            for n in range(23)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_walk(self):
+        pages = cursor_pages(self.client, reverse("notifications-list"))
+        self.assertEqual([len(page["results"]) for page in pages], [10, 10, 3])
+        self.assertEqual(set(pages[0]), {"next", "previous", "results"})
+        ids = [row["id"] for page in pages for row in page["results"]]
+        expected = Notification.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+
+    def test_page_numbers_without_the_param(self):
+        page = self.client.get(reverse("notifications-list"), {"page": 3}).json()
+        self.assertEqual((page["count"], len(page["results"]), page["next"]), (23, 3, None))
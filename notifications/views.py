@@ -3,15 +3,27 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import FastNotificationSerializer, NotificationSerializer
 from django.db.models import Count
+from rest_framework.pagination import PageNumberPagination
+from voteapp.fast_serializers import FastReadMixin
+from voteapp.pagination import CursorModeMixin
 
-class NotificationListView(generics.ListAPIView):
+
+class NotificationPagination(CursorModeMixin, PageNumberPagination):
+    pass
+
+
+class NotificationListView(FastReadMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
+    fast_serializer_class = FastNotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        qs = Notification.objects.filter(recipient=self.request.user).order_by("-created_at")
+        # actor is serialized for every row
+        qs = Notification.objects.filter(recipient=self.request.user).select_related("actor_user").order_by(
+            "-created_at", "-id")
         if not getattr(self.request.user, "notification_enabled", True):
         # return empty or return only system-critical notifications (if you mark them)
             return qs.none()
@@ -0,0 +1,141 @@
+"""
+Per-request SQL query budgets and N+1 detection.
+
+QueryBudgetMiddleware records every query a request runs, in its own
+thread or in the worker threads of async views, and checks the total
+against the budget of the URL it resolved to (QUERY_BUDGETS['VIEWS'],
+keyed by "<METHOD> <url name>" or "<url name>", else DEFAULT; a budget of
+None, e.g. for the admin, means the request is not checked). A query
+shape (the SQL with IN lists and numbers folded) repeated
+N_PLUS_ONE_THRESHOLD times or more is reported as a likely N+1.
+
+Violations are logged; with QUERY_BUDGETS['RAISE'] (the test suite) they
+raise QueryBudgetExceeded instead, so the request fails loudly.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('online_poll.query_budget')
+
+_recorder = ContextVar('query_recorder', default=None)
+
+_IN_LIST = re.compile(r"\((?:%s|\?)(?:,\s*(?:%s|\?))*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_shape(sql):
+    """SQL with IN lists and numeric literals folded, so the same query with other values matches"""
+    return _NUMBER.sub("N", _IN_LIST.sub("(...)", sql))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """{shape: count} of the query shapes run at least ``threshold`` times"""
+        counts = Counter(query_shape(sql) for sql in self.queries)
+        return {shape: n for shape, n in counts.items() if n >= threshold}
+
+
+def _record(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.queries.append(sql)
+    return execute(sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    # Every connection records into the recorder of the request that uses it
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(install)
+
+
+@contextmanager
+def record_queries():
+    """Collect the queries run in this context, including sync_to_async threads it starts"""
+    # Connections opened before this module was loaded missed connection_created
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+    recorder = QueryRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def budget_for(request):
+    conf = settings.QUERY_BUDGETS
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return conf['DEFAULT'], request.path
+    name = match.view_name
+    budgets = conf['VIEWS']
+    method_key = f"{request.method} {name}"
+    if method_key in budgets:
+        return budgets[method_key], method_key
+    return budgets.get(name, conf['DEFAULT']), name
+
+
+def check(request, recorder):
+    conf = settings.QUERY_BUDGETS
+    budget, view = budget_for(request)
+    if budget is None:
+        return
+    problems = []
+    if len(recorder) > budget:
+        problems.append(f"{request.method} {request.path} ({view}) ran {len(recorder)} queries, budget {budget}")
+    for shape, n in recorder.repeated(conf['N_PLUS_ONE_THRESHOLD']).items():
+        problems.append(f"{request.method} {request.path} ({view}) repeated a query {n} times, likely N+1: {shape}")
+    for problem in problems:
+        if conf['RAISE']:
+            raise QueryBudgetExceeded(problem)
+        logger.warning(problem)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.QUERY_BUDGETS['ENABLED']:
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        check(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.QUERY_BUDGETS['ENABLED']:
+            return await self.get_response(request)
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        check(request, recorder)
+        return response
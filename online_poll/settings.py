@@ -46,7 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'online_poll.query_budget.QueryBudgetMiddleware',
+    'online_poll.static_files.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -150,6 +151,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'voteapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -198,6 +203,171 @@ CACHE_TTL = {
     'poll_results': 60 * 2,
     'categories': 60 * 15,
     'campaigns': 60 * 15,
+    'polls_trending': 30,
+}
+
+# Stampede protection for get_or_compute(): entries are served stale for
+# STALE_TTL seconds past their TTL while one caller refreshes them, and only
+# the lock holder recomputes a missing key. The others wait up to LOCK_WAIT
+# seconds for it, then get a 503 with Retry-After instead of computing too.
+# A lock expires after LOCK_TIMEOUT seconds. BETA tunes early refresh
+# (XFetch), 0 disables it.
+CACHE_STAMPEDE = {
+    'STALE_TTL': 60,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2.0,
+    'BETA': 1.0,
+}
+
+# Rendered response bytes cached by cache_response(); larger bodies can be
+# stored zlib-compressed to save Redis memory and bandwidth
+RESPONSE_CACHE = {
+    'COMPRESS': os.getenv('RESPONSE_CACHE_COMPRESS', 'False').lower() == 'true',
+    'COMPRESS_MIN_BYTES': 1024,
+    'COMPRESS_LEVEL': 6,
+}
+
+# Totals in paginated list responses: unfiltered lists use a cached row counter
+# (recounted every CACHE_TTL seconds), filtered lists on PostgreSQL use the
+# planner estimate once it reaches ESTIMATE_THRESHOLD rows
+LIST_COUNTS = {
+    'CACHE_TTL': 60 * 10,
+    'ESTIMATE_THRESHOLD': 10000,
+}
+
+# Optional per-process LRU in front of Redis for cache entries and namespace
+# generations, kept coherent across workers through Redis pub/sub
+LOCAL_CACHE = {
+    'ENABLED': os.getenv('LOCAL_CACHE_ENABLED', 'False').lower() == 'true',
+    'MAX_BYTES': int(os.getenv('LOCAL_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    'MAX_TTL': 30,
+}
+
+# ==================== VOTE INGESTION ====================
+
+# 'sync' writes each vote in the request; 'buffered' queues it in a Redis
+# stream that the flush_vote_buffer task drains in batches
+VOTE_INGESTION_MODE = os.getenv('VOTE_INGESTION_MODE', 'sync')
+VOTE_BUFFER = {
+    'BATCH_SIZE': int(os.getenv('VOTE_BUFFER_BATCH_SIZE', '500')),
+    'FLUSH_INTERVAL': 1,  # seconds between scheduled flushes
+    'CLAIM_IDLE_MS': 60 * 1000,  # reclaim entries a dead worker left pending
+    'VOTER_TTL': 60 * 60,  # buffered-voter dedupe markers
+}
+
+# Slots per option for sharded vote counters; 1 updates PollOption.vote_count directly
+VOTE_COUNTER_SHARDS = int(os.getenv('VOTE_COUNTER_SHARDS', '8'))
+
+# Lifetime of idle live result tallies in Redis
+LIVE_TALLY_TTL = 60 * 60 * 24 * 7
+
+# Lifetime of idle per-poll voter sets used to short-circuit duplicate checks
+VOTER_SET_TTL = 60 * 60 * 24 * 7
+
+# Trending feed: votes lose half their weight every HALF_LIFE seconds. Each
+# feed (all polls, per category, per campaign) keeps its MAX_ENTRIES best
+# polls and expires after TTL seconds without votes. OVERFETCH candidates
+# per requested poll make up for inactive or expired ones
+TRENDING = {
+    'HALF_LIFE': 6 * 60 * 60,
+    'MAX_ENTRIES': 1000,
+    'TTL': 60 * 60 * 24 * 7,
+    'OVERFETCH': 2,
+}
+
+# Campaign stats (GET /api/p/campaigns/<id>/?include=stats): per-campaign
+# rollups in Redis expire after TTL seconds without votes and are rebuilt by
+# a task, queued again if it hasn't finished within REBUILD_TIMEOUT seconds;
+# stats stay pending for PENDING_TIMEOUT seconds at most before a read
+# rebuilds them itself (no worker running). Stats list the TOP_POLLS polls
+# with the most votes and the votes of the last DAYS days
+CAMPAIGN_ROLLUP = {
+    'TTL': 60 * 60 * 24 * 7,
+    'REBUILD_TIMEOUT': 5 * 60,
+    'PENDING_TIMEOUT': 30,
+    'TOP_POLLS': 10,
+    'DAYS': 30,
+}
+
+# SQL queries a request may run, by "<METHOD> <url name>" or "<url name>"
+# (see online_poll/query_budget.py). Over-budget requests and query shapes
+# repeated N_PLUS_ONE_THRESHOLD times are logged, or raise with RAISE (tests).
+# Budgets are for a cold cache; the endpoint tests pin them.
+QUERY_BUDGETS = {
+    'ENABLED': os.getenv('QUERY_BUDGETS_ENABLED', 'True').lower() == 'true',
+    'RAISE': os.getenv('QUERY_BUDGETS_RAISE', 'False').lower() == 'true',
+    'DEFAULT': None,  # views not listed below (admin, schema, docs) are not checked
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'VIEWS': {
+        'GET poll-list-create': 4,
+        'POST poll-list-create': 9,
+        'poll-detail': 7,
+        'poll-results': 5,
+        'poll-results-stream': 1,
+        'poll-results-batch': 3,
+        'poll-trending': 3,
+        'vote-create': 11,
+        'GET category-list-create': 3,
+        'POST category-list-create': 2,
+        'GET category-detail': 2,
+        'category-detail': 3,
+        'DELETE category-detail': 4,
+        'GET campaign-list-create': 3,
+        'POST campaign-list-create': 2,
+        'GET campaign-detail': 5,
+        'campaign-detail': 3,
+        'DELETE campaign-detail': 4,
+        'campaign-poll-import': 8,
+        'campaign-results': 5,
+        'auth-signup': 2,
+        'token_obtain_pair': 2,
+        'token_refresh': 13,
+        'auth-logout': 8,
+        'auth-forgot-password': 1,
+        'resend-verification': 1,
+        'auth-reset-password': 7,
+        'verify-email': 2,
+        'GET profile': 1,
+        'profile': 2,
+        'change-password': 2,
+        'toggle-notification': 2,
+        'celery-health': 0,
+        'notifications-list': 3,
+        'notifications-unread-count': 2,
+        'notifications-mark-read': 2,
+        'notification-mark-one': 3,
+        'notification-delete': 3,
+    },
+}
+
+# POST /api/p/campaigns/<id>/polls/ bulk imports: polls per request
+POLL_IMPORT = {
+    'MAX_POLLS': 1000,
+}
+
+# Fast read path: poll list/detail and notification GETs are serialized from
+# .values() rows (voteapp/fast_serializers.py) and JSON is rendered with
+# orjson when it is installed (voteapp/renderers.py). The output is the same.
+FAST_READ_PATH = {
+    'SERIALIZERS': os.getenv('FAST_SERIALIZERS', 'True').lower() == 'true',
+    'RENDERER': os.getenv('FAST_JSON_RENDERER', 'True').lower() == 'true',
+}
+
+# The web process runs WSGI unless started with ASGI=True (gunicorn.conf.py),
+# which serves online_poll.asgi through uvicorn workers. Under WSGI every
+# open results stream holds a gunicorn worker, one thread, for as long as
+# its client listens: with the default two workers, two listeners take the
+# site down, so only expose the stream behind ASGI. Under ASGI a stream is
+# a coroutine, but sync views and middleware still run in asgiref's thread
+# pool, one thread per request in flight.
+
+# Serve poll list/detail/results GETs from native async views (needs ASGI to pay off)
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'True').lower() in ('true', '1', 't', 'yes')
+
+# Live results SSE endpoint
+RESULTS_STREAM = {
+    'MAX_UPDATES_PER_SECOND': 2,  # per poll, deltas in between are coalesced
+    'HEARTBEAT': 15,  # seconds between keepalive comments
 }
 
 # ==================== CELERY CONFIGURATION ==================== 
@@ -236,6 +406,25 @@ CELERY_RESULT_EXPIRES = 60 * 60 * 24  # 24 hours
 
 # Beat Scheduler
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for buffered votes; enqueue_vote also schedules flushes
+    'flush-vote-buffer': {
+        'task': 'voteapp.flush_vote_buffer',
+        'schedule': 10.0,
+    },
+    'compact-vote-counters': {
+        'task': 'voteapp.compact_vote_counters',
+        'schedule': 5 * 60.0,
+    },
+    'reconcile-live-tallies': {
+        'task': 'voteapp.reconcile_live_tallies',
+        'schedule': 15 * 60.0,
+    },
+    'rebase-trending-scores': {
+        'task': 'voteapp.rebase_trending_scores',
+        'schedule': 60 * 60.0,
+    },
+}
 
 # Connection Settings
 CELERY_BROKER_CONNECTION_RETRY = True
@@ -319,6 +508,10 @@ LOGGING = {
             'handlers': ['console', 'file'],
             'level': 'INFO',
         },
+        'online_poll': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+        },
     },
 }
 
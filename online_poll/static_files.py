@@ -0,0 +1,38 @@
+"""
+WhiteNoise for a middleware chain that stays async under ASGI.
+
+WhiteNoise's middleware is sync-only, so under the uvicorn worker Django
+runs it, and every middleware and view after it, through a thread hop on
+every request, async views included. This subclass is async-capable: a
+request that isn't for a static file is passed on without leaving the
+event loop, and only static file hits (file lookups with autorefresh,
+opening the file) run in a worker thread. Under WSGI it is WhiteNoise.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise import middleware
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            # A dict filled at startup
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
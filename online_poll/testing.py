@@ -0,0 +1,74 @@
+"""Test settings and checks shared by the apps' test suites."""
+import functools
+import unittest
+
+from django.conf import settings
+from django.test import override_settings
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+ENFORCED_BUDGETS = {**settings.QUERY_BUDGETS, 'ENABLED': True, 'RAISE': True}
+# The configured django-redis cache under a prefix of its own
+REDIS_CACHES = {'default': {**settings.CACHES['default'], 'KEY_PREFIX': 'online_poll_test'}}
+
+
+@functools.cache
+def redis_available():
+    """Whether the Redis server behind REDIS_CACHES answers"""
+    try:
+        from django_redis.cache import RedisCache
+        conf = REDIS_CACHES['default']
+        return RedisCache(conf['LOCATION'], conf).client.get_client().ping()
+    except Exception:
+        return False
+
+
+class RedisTestMixin:
+    """
+    For tests of the Redis paths: runs them against the server at REDIS_URL
+    with REDIS_CACHES, starting each test from no keys, and skips them when
+    no server answers.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        if not redis_available():
+            raise unittest.SkipTest(f"no Redis server at {settings.REDIS_URL}")
+        cls.enterClassContext(override_settings(CACHES=REDIS_CACHES))
+        super().setUpClass()
+
+    def setUp(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection("default")
+        self.clear_redis()
+        self.addCleanup(self.clear_redis)
+        super().setUp()
+
+    def clear_redis(self):
+        keys = self.redis.keys(f"{REDIS_CACHES['default']['KEY_PREFIX']}:*")
+        if keys:
+            self.redis.delete(*keys)
+
+
+class EndpointBudgetCoverageMixin:
+    """
+    For a TestCase with QUERY_BUDGETS=ENFORCED_BUDGETS: every named URL in
+    ``budget_urls`` (an app's urls module) has a QUERY_BUDGETS['VIEWS']
+    entry, since views without one are not checked at all.
+    """
+    budget_urls = None
+
+    def test_every_endpoint_has_a_budget(self, *args):
+        budgeted = {key.split(" ")[-1] for key in settings.QUERY_BUDGETS['VIEWS']}
+        self.assertEqual({pattern.name for pattern in self.budget_urls.urlpatterns} - budgeted, set())
+
+
+def cursor_pages(client, url, **params):
+    """Every page of a list in ?pagination=cursor mode, following its next links"""
+    pages = []
+    response = client.get(url, {"pagination": "cursor", **params})
+    while True:
+        assert response.status_code == 200, response.content
+        pages.append(response.json())
+        if pages[-1]["next"] is None:
+            return pages
+        response = client.get(pages[-1]["next"])
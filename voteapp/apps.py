@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VoteappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voteapp'
+
+    def ready(self):
+        # import signal handlers
+        import voteapp.signals
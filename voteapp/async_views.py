@@ -0,0 +1,180 @@
+"""
+Async variants of the hot poll read endpoints, used when ASYNC_READ_VIEWS
+is on and the app runs under ASGI. They use async cache and ORM calls so a
+slow Redis or database round trip only parks a coroutine instead of a
+worker, and they return the same payloads as the DRF views they stand in
+for. Writes are delegated to the DRF views, and so are reads the plain
+JSON path can't answer like DRF: a renderer other than compact JSON
+(?format=api, a browser's Accept, ?indent) or credentials that don't
+authenticate, which DRF turns into a 401.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import exception_handler
+
+from . import etags, fieldsets, tally
+from .cache_utils import acache_list_response, acache_response, async_etag
+from .models import Poll
+from .renderers import FastJSONRenderer
+from .views import PollDetailView, PollListCreateView, PollResultsView
+
+_poll_list_create = PollListCreateView.as_view()
+_poll_detail = PollDetailView.as_view()
+_poll_results = PollResultsView.as_view()
+
+
+def json_response(data, status=200):
+    # Same renderer as the DRF views so the bytes match
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def not_found(detail="Not found"):
+    return json_response({"detail": detail}, status=404)
+
+
+def error_response(exc):
+    """What DRF answers for an APIException, headers (e.g. Retry-After) included"""
+    response = exception_handler(exc, {})
+    http_response = json_response(response.data, status=response.status_code)
+    for header, value in response.headers.items():
+        if header != "Content-Type":
+            http_response[header] = value
+    return http_response
+
+
+async def answers_like_drf(view_class, request):
+    """
+    Whether json_response() is what the DRF view would send: content
+    negotiation picks compact JSON, and credentials, if any, authenticate.
+    """
+    view = view_class()
+    view.format_kwarg = None
+    drf_request = view.initialize_request(request)
+    try:
+        renderer, media_type = view.perform_content_negotiation(drf_request)
+    except APIException:
+        return False
+    if not isinstance(renderer, JSONRenderer) or renderer.get_indent(media_type, {}):
+        return False
+    if "HTTP_AUTHORIZATION" not in request.META:
+        # Nothing to authenticate: anonymous without touching the database
+        return True
+    try:
+        # Authenticators may look the user up
+        await sync_to_async(view.perform_authentication)(drf_request)
+    except APIException:
+        return False
+    return True
+
+
+def drf_fallback(view_class, drf_view):
+    """Send writes, and reads answers_like_drf() rejects, to ``drf_view``"""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or not await answers_like_drf(view_class, request):
+                return await sync_to_async(drf_view)(request, *args, **kwargs)
+            try:
+                return await view_func(request, *args, **kwargs)
+            except APIException as exc:
+                # e.g. StillComputing from a cache or tally rebuild another request holds
+                return error_response(exc)
+        return wrapper
+    return decorator
+
+
+@csrf_exempt
+@drf_fallback(PollDetailView, _poll_detail)
+@async_etag(etags.apoll_detail_etag)
+@acache_response(timeout=settings.CACHE_TTL.get('poll_detail', 600), key_prefix='poll_detail',
+                 version_func=etags.apoll_detail_etag)
+async def poll_detail(request, pk):
+    view = PollDetailView(request=request, format_kwarg=None, args=(), kwargs={"pk": pk})
+    try:
+        fields = fieldsets.requested_fields(request, view.get_serializer_class())
+    except APIException as exc:
+        return json_response(exc.detail, status=exc.status_code)
+
+    # The rendered bytes are cached by acache_response, under the ETag
+    try:
+        if view.use_fast_path():
+            row = await view.fast_serializer_class.values(view.get_queryset()).aget(pk=pk)
+            # Options are batch-loaded by the serializer
+            data = await sync_to_async(lambda: view.get_serializer(row).data)()
+        else:
+            instance = await view.get_queryset().aget(pk=pk)
+            data = view.get_serializer_class()(instance).data
+    except Poll.DoesNotExist:
+        return not_found("No Poll matches the given query.")
+    data = tally.overlay_counts(data, await tally.aget_counts(pk))
+    return json_response(fieldsets.project(data, fields))
+
+
+@csrf_exempt
+@drf_fallback(PollResultsView, _poll_results)
+@async_etag(etags.apoll_results_etag)
+@acache_response(timeout=settings.CACHE_TTL.get('poll_results', 120), key_prefix='poll_results',
+                 version_func=etags.apoll_results_etag)
+async def poll_results(request, pk):
+    results = await tally.aget_results(pk)
+    if results is None:
+        return not_found()
+    return json_response(results)
+
+
+@csrf_exempt
+@drf_fallback(PollListCreateView, _poll_list_create)
+@async_etag(etags.anamespace_list_etag('polls'))
+@acache_list_response('polls', settings.CACHE_TTL.get('polls_list', 300), PollListCreateView)
+async def poll_list_create(request):
+    # request carries the canonical query: the page is shared with every caller and the sync view
+    view = PollListCreateView()
+    drf_request = view.initialize_request(request)
+    view.setup(drf_request)
+    view.request = drf_request
+    view.format_kwarg = None
+
+    async def serialize(objects):
+        serializer = view.get_serializer(objects, many=True)
+        if view.use_fast_path():
+            # Options of fast path rows are batch-loaded by the serializer
+            return await sync_to_async(lambda: serializer.data)()
+        return serializer.data
+
+    async def compute():
+        # Filter validation may look up the category/campaign it filters on
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+
+        pagination = view.paginator
+        if pagination.use_cursor(drf_request):
+            # Keyset pages need no count, the page query runs in a worker thread
+            page = await sync_to_async(pagination.paginate_queryset)(queryset, drf_request, view)
+            return pagination.get_paginated_response(await serialize(page)).data
+
+        pagination.request = drf_request
+        paginator = pagination.get_paginator(queryset, drf_request)
+        page_number = await sync_to_async(pagination.get_page_number)(drf_request, paginator)
+        try:
+            # The count may hit the cache or the database, and inexact pages are fetched right away
+            page = await sync_to_async(paginator.page)(page_number)
+        except InvalidPage as exc:
+            raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if isinstance(page.object_list, QuerySet):
+            page.object_list = [poll async for poll in page.object_list]
+        pagination.page = page
+
+        return pagination.get_paginated_response(await serialize(page.object_list)).data
+
+    try:
+        data = await compute()
+    except APIException as exc:
+        return error_response(exc)
+    return json_response(data)
@@ -1,9 +1,23 @@
-from rest_framework.response import Response
 from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpResponse, QueryDict
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.exceptions import APIException
 from functools import wraps
+from typing import NamedTuple
+import asyncio
+import copy
 import hashlib
-import json
+import math
+import random
+import time
+import uuid
+import weakref
+import zlib
+from wsgiref.util import is_hop_by_hop
+
+from . import local_cache
 
 
 def make_cache_key(prefix, *args, **kwargs):
@@ -12,50 +26,560 @@ def make_cache_key(prefix, *args, **kwargs):
     return hashlib.md5(key_data.encode()).hexdigest()
 
 
-def cache_response(timeout=None, key_prefix='view'):
+def _pack_response(response, version):
+    conf = settings.RESPONSE_CACHE
+    content = response.content
+    compressed = conf['COMPRESS'] and len(content) >= conf['COMPRESS_MIN_BYTES']
+    if compressed:
+        content = zlib.compress(content, conf['COMPRESS_LEVEL'])
+    # Headers such as Vary and Allow are part of the response; cookies are
+    # kept apart in response.cookies and are never stored
+    headers = [(header, value) for header, value in response.items() if not is_hop_by_hop(header)]
+    return {'version': version, 'content': content, 'compressed': compressed, 'headers': headers}
+
+
+def _unpack_response(entry):
+    content = zlib.decompress(entry['content']) if entry['compressed'] else entry['content']
+    response = HttpResponse(content)
+    for header, value in entry['headers']:
+        response[header] = value
+    return response
+
+
+def _get_response_entry(cache_key, version):
+    """A cached response entry still at ``version``, from the L1 or the shared cache"""
+    for get in (local_cache.get, cache.get):
+        entry = get(cache_key)
+        # Entries from before headers were stored are misses
+        if entry is not None and entry['version'] == version and 'headers' in entry:
+            return entry
+    return None
+
+
+def _set_response_entry(cache_key, entry, timeout):
+    cache.set(cache_key, entry, timeout)
+    local_cache.set(cache_key, entry, timeout)
+
+
+def cache_response(timeout=None, key_prefix='view', version_func=None):
     """
-    Decorator to cache view responses
-    Usage: @cache_response(timeout=300, key_prefix='polls')
+    Decorator to cache the rendered bytes of view responses
+    Hits are returned as-is, skipping the serializer and the renderer.
+    With version_func(request, *args, **kwargs), e.g. an ETag function,
+    one entry is kept per URL and only served while its version matches.
+    Usage: @cache_response(timeout=300, key_prefix='polls', version_func=etags.poll_detail_etag)
     """
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(self, request, *args, **kwargs):
-            # Generate cache key from request parameters
+            version = version_func(request, *args, **kwargs) if version_func else None
+            if version_func and version is None:
+                # resource is gone, let the view answer
+                return view_func(self, request, *args, **kwargs)
+
+            # Generate cache key from request parameters and the negotiated format
             cache_key = make_cache_key(
                 key_prefix,
                 request.path,
                 request.GET.dict(),
+                request.accepted_media_type,
                 args,
                 kwargs
             )
-            
+
             # Try to get from cache
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                return Response(cached_response)
-            
-            # Get fresh response
+            entry = _get_response_entry(cache_key, version)
+            if entry is not None:
+                return _unpack_response(entry)
+
+            # Get fresh response and render it now so the bytes can be stored
             response = view_func(self, request, *args, **kwargs)
-            
-            # Cache the response data
+            if response.status_code == 200:
+                response = self.finalize_response(request, response, *args, **kwargs)
+                response.render()
+                cache_timeout = timeout or settings.CACHE_TTL.get(key_prefix, 300)
+                entry = _pack_response(response, version)
+                _set_response_entry(cache_key, entry, cache_timeout)
+
+            return response
+        return wrapper
+    return decorator
+
+
+def acache_response(timeout=None, key_prefix='view', version_func=None):
+    """cache_response() for async function views returning rendered responses"""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return await view_func(request, *args, **kwargs)
+            version = await version_func(request, *args, **kwargs) if version_func else None
+            if version_func and version is None:
+                return await view_func(request, *args, **kwargs)
+
+            cache_key = make_cache_key(
+                key_prefix,
+                request.path,
+                request.GET.dict(),
+                'application/json',
+                args,
+                kwargs
+            )
+            entry = _get_response_entry(cache_key, version)
+            if entry is not None:
+                return _unpack_response(entry)
+
+            response = await view_func(request, *args, **kwargs)
             if response.status_code == 200:
                 cache_timeout = timeout or settings.CACHE_TTL.get(key_prefix, 300)
-                cache.set(cache_key, response.data, cache_timeout)
-            
+                entry = _pack_response(response, version)
+                _set_response_entry(cache_key, entry, cache_timeout)
             return response
         return wrapper
     return decorator
 
 
-def invalidate_cache_pattern(pattern):
-    """Invalidate all cache keys matching a pattern"""
-    # Note: This requires django-redis backend
+def canonical_list_query(view, request):
+    """
+    The query params a DRF list view actually reads, in canonical form:
+    unknown and empty params are dropped, values are stripped, search terms
+    are lowercased and de-duplicated, sparse fieldsets are sorted, default
+    page/page_size are omitted and keys are sorted. Returns a QueryDict.
+    """
+    allowed = set(getattr(view, 'filterset_fields', None) or ())
+    search_params = set()
+    for backend in view.filter_backends:
+        if getattr(view, 'search_fields', None) and hasattr(backend, 'search_param'):
+            search_params.add(backend.search_param)
+        if hasattr(backend, 'ordering_param'):
+            allowed.add(backend.ordering_param)
+    allowed |= search_params
+
+    defaults = {}
+    paginator = view.paginator
+    if paginator is not None:
+        page_param = getattr(paginator, 'page_query_param', None)
+        if page_param:
+            allowed.add(page_param)
+            defaults[page_param] = '1'
+        size_param = getattr(paginator, 'page_size_query_param', None)
+        if size_param:
+            allowed.add(size_param)
+            defaults[size_param] = str(paginator.page_size)
+        for param in ('cursor_query_param', 'mode_query_param', 'count_query_param'):
+            if getattr(paginator, param, None):
+                allowed.add(getattr(paginator, param))
+    fieldset_params = {getattr(view, param) for param in ('fields_query_param', 'omit_query_param')
+                       if getattr(view, param, None)}
+    allowed |= fieldset_params
+
+    query = QueryDict(mutable=True)
+    for key in sorted(allowed & set(request.query_params)):
+        value = request.query_params.get(key, '').strip()
+        if key in search_params:
+            # SearchFilter matches every term case-insensitively, in any order
+            value = " ".join(sorted(set(value.replace(',', ' ').lower().split())))
+        elif key in fieldset_params:
+            value = ",".join(sorted({name.strip() for name in value.split(',') if name.strip()}))
+        if value and value != defaults.get(key):
+            query[key] = value
+    query._mutable = False
+    return query
+
+
+def _with_query(request, query):
+    """
+    A shallow copy of an HttpRequest that reads ``query`` as its query
+    string, in GET and in the URLs built from it such as pagination links
+    """
+    canonical = copy.copy(request)
+    canonical.GET = query
+    canonical.META = {**request.META, 'QUERY_STRING': query.urlencode()}
+    return canonical
+
+
+def _list_cache_key(namespace, request, query, media_type):
+    return make_cache_key(namespace, request.get_host(), request.path, query.urlencode(), media_type)
+
+
+def cache_list_response(namespace, timeout):
+    """
+    Cache a DRF list view's rendered pages under their canonical query
+    (see canonical_list_query), shared by every caller: the list payloads
+    don't depend on who asks. The page is built from the canonical query so
+    its next/previous links are the same for everyone. One entry per query,
+    tagged with the namespace generation.
+    Usage: @cache_list_response('polls', 300)
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            query = canonical_list_query(self, request)
+            version = get_namespace_version(namespace)
+            cache_key = _list_cache_key(namespace, request, query, request.accepted_media_type)
+            entry = _get_response_entry(cache_key, version)
+            if entry is not None:
+                return _unpack_response(entry)
+
+            # The view reads a canonical copy, the HttpRequest is left as it came
+            original = request._request
+            request._request = _with_query(original, query)
+            try:
+                response = view_func(self, request, *args, **kwargs)
+                if response.status_code == 200:
+                    response = self.finalize_response(request, response, *args, **kwargs)
+                    response.render()
+                    entry = _pack_response(response, version)
+                    _set_response_entry(cache_key, entry, timeout)
+            finally:
+                request._request = original
+            return response
+        return wrapper
+    return decorator
+
+
+def acache_list_response(namespace, timeout, view_class):
+    """
+    cache_list_response() for an async function view standing in for the
+    DRF list view ``view_class`` with compact JSON: it shares that view's
+    entries, and is called with a canonical copy of the request.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return await view_func(request, *args, **kwargs)
+            view = view_class()
+            query = canonical_list_query(view, view.initialize_request(request))
+            version = await aget_namespace_version(namespace)
+            cache_key = _list_cache_key(namespace, request, query, 'application/json')
+            entry = _get_response_entry(cache_key, version)
+            if entry is not None:
+                return _unpack_response(entry)
+
+            response = await view_func(_with_query(request, query), *args, **kwargs)
+            if response.status_code == 200:
+                entry = _pack_response(response, version)
+                _set_response_entry(cache_key, entry, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def get_redis():
+    """Return the raw redis client behind the default cache, or None"""
     try:
         from django_redis import get_redis_connection
-        conn = get_redis_connection("default")
-        keys = conn.keys(f"*{pattern}*")
-        if keys:
-            conn.delete(*keys)
-    except ImportError:
-        # Fallback if django-redis not available
-        cache.clear()
\ No newline at end of file
+        return get_redis_connection("default")
+    except (ImportError, NotImplementedError):
+        return None
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """An asyncio redis client for the running loop, or None without django-redis"""
+    if get_redis() is None:
+        return None
+    import redis.asyncio as aioredis
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = aioredis.from_url(settings.REDIS_URL)
+    return client
+
+
+def redis_key(*parts):
+    """Build a raw redis key under the same prefix as the django cache"""
+    prefix = settings.CACHES['default'].get('KEY_PREFIX', '')
+    return ":".join(str(part) for part in (prefix, *parts) if part)
+
+
+def _namespace_key(namespace):
+    return f"ns:{namespace}"
+
+
+def get_namespace_version(namespace):
+    """
+    Current generation of a cache namespace.
+    Missing generations are seeded from the clock so an evicted counter
+    never falls back onto keys written under an older generation.
+    """
+    key = _namespace_key(namespace)
+    version = local_cache.get(key)
+    if version is None:
+        read_at = local_cache.clock()
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        local_cache.set(key, version, settings.LOCAL_CACHE['MAX_TTL'], read_at)
+    return version
+
+
+async def aget_namespace_version(namespace):
+    key = _namespace_key(namespace)
+    version = local_cache.get(key)
+    if version is None:
+        read_at = local_cache.clock()
+        version = await cache.aget(key)
+        if version is None:
+            await cache.aadd(key, int(time.time() * 1000), None)
+            version = await cache.aget(key)
+        local_cache.set(key, version, settings.LOCAL_CACHE['MAX_TTL'], read_at)
+    return version
+
+
+def versioned_key(namespace, key):
+    """Embed the namespace generation in a cache key"""
+    return f"{key}:v{get_namespace_version(namespace)}"
+
+
+async def aversioned_key(namespace, key):
+    return f"{key}:v{await aget_namespace_version(namespace)}"
+
+
+def invalidate_namespace(namespace):
+    """
+    Invalidate every key built with versioned_key() for a namespace.
+    This is a single INCR; stale entries simply age out via their TTL.
+    """
+    key = _namespace_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+    local_cache.invalidate(key)
+
+
+def async_etag(etag_func):
+    """
+    django's etag() decorator for async views, with an async etag_func.
+    Only GET and HEAD are conditional, other methods go straight to the view.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view_func(request, *args, **kwargs)
+            res_etag = await etag_func(request, *args, **kwargs)
+            res_etag = quote_etag(res_etag) if res_etag is not None else None
+            response = get_conditional_response(request, etag=res_etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if res_etag:
+                response.headers.setdefault("ETag", res_etag)
+            return response
+        return wrapper
+    return decorator
+
+
+class CacheEntry(NamedTuple):
+    value: object
+    delta: float  # seconds the value took to compute
+    expires: float  # soft expiry, time.time() based
+
+
+_LOCK_POLL_INTERVAL = 0.05
+
+# Deletes a lock only while it still holds the caller's token
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class StillComputing(APIException):
+    """
+    Raised to callers that waited LOCK_WAIT seconds for another caller's
+    compute() and gave up: a 503 with Retry-After rather than one more
+    compute of a value that is already slow to compute.
+    """
+    status_code = 503
+    default_detail = "This resource is being computed, please retry shortly."
+    default_code = "still_computing"
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = math.ceil(settings.CACHE_STAMPEDE['LOCK_WAIT'])
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+def _acquire_lock(key):
+    """A token if the lock on ``key`` was taken, else None"""
+    token = uuid.uuid4().hex
+    timeout = settings.CACHE_STAMPEDE['LOCK_TIMEOUT']
+    conn = get_redis()
+    if conn is not None:
+        acquired = conn.set(redis_key(_lock_key(key)), token, nx=True, ex=timeout)
+    else:
+        acquired = cache.add(_lock_key(key), token, timeout)
+    return token if acquired else None
+
+
+def _release_lock(key, token):
+    """
+    Release a lock taken by _acquire_lock(), unless it expired and another
+    caller holds it now
+    """
+    conn = get_redis()
+    if conn is not None:
+        conn.eval(RELEASE_LOCK, 1, redis_key(_lock_key(key)), token)
+    elif cache.get(_lock_key(key)) == token:
+        # Not atomic, but without Redis the cache is per process anyway
+        cache.delete(_lock_key(key))
+
+
+async def _aacquire_lock(key):
+    token = uuid.uuid4().hex
+    timeout = settings.CACHE_STAMPEDE['LOCK_TIMEOUT']
+    conn = get_async_redis()
+    if conn is not None:
+        acquired = await conn.set(redis_key(_lock_key(key)), token, nx=True, ex=timeout)
+    else:
+        acquired = await cache.aadd(_lock_key(key), token, timeout)
+    return token if acquired else None
+
+
+async def _arelease_lock(key, token):
+    conn = get_async_redis()
+    if conn is not None:
+        await conn.eval(RELEASE_LOCK, 1, redis_key(_lock_key(key)), token)
+    elif await cache.aget(_lock_key(key)) == token:
+        await cache.adelete(_lock_key(key))
+
+
+def _needs_refresh(entry, beta):
+    """
+    True once the soft TTL passed, and with rising probability shortly
+    before it: expensive values (large delta) are refreshed earlier (XFetch)
+    """
+    return time.time() - entry.delta * beta * math.log(1.0 - random.random()) >= entry.expires
+
+
+def _entry(cached):
+    return cached if isinstance(cached, CacheEntry) else None
+
+
+def _keep_local(key, entry):
+    local_cache.set(key, entry, entry.expires - time.time())
+    return entry.value
+
+
+def _compute_and_store(key, compute, timeout):
+    started = time.monotonic()
+    value = compute()
+    entry = CacheEntry(value, time.monotonic() - started, time.time() + timeout)
+    cache.set(key, entry, timeout + settings.CACHE_STAMPEDE['STALE_TTL'])
+    return _keep_local(key, entry)
+
+
+def single_flight(key, compute, peek):
+    """
+    Run compute() in one caller per key across processes.
+    The others poll peek() until it returns something other than None,
+    take over if the lock is released without a result, and raise
+    StillComputing after LOCK_WAIT seconds: however slow compute() is,
+    it never runs in more than one caller at a time.
+    """
+    deadline = time.monotonic() + settings.CACHE_STAMPEDE['LOCK_WAIT']
+    while (token := _acquire_lock(key)) is None:
+        if time.monotonic() >= deadline:
+            raise StillComputing()
+        time.sleep(_LOCK_POLL_INTERVAL)
+        result = peek()
+        if result is not None:
+            return result
+    try:
+        return compute()
+    finally:
+        _release_lock(key, token)
+
+
+async def asingle_flight(key, compute, peek):
+    """single_flight() with async compute and peek callables"""
+    deadline = time.monotonic() + settings.CACHE_STAMPEDE['LOCK_WAIT']
+    while (token := await _aacquire_lock(key)) is None:
+        if time.monotonic() >= deadline:
+            raise StillComputing()
+        await asyncio.sleep(_LOCK_POLL_INTERVAL)
+        result = await peek()
+        if result is not None:
+            return result
+    try:
+        return await compute()
+    finally:
+        await _arelease_lock(key, token)
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    cache.get()/cache.set() with stampede protection.
+    A missing key is computed by a single caller (see single_flight). Past
+    its timeout the entry is still served for STALE_TTL seconds while the
+    one caller that wins the lock refreshes it, and hot entries are
+    refreshed a little early so they rarely go stale at all.
+    Fresh entries are also kept in the in-process L1 when it is enabled.
+    Usage: data = get_or_compute(key, lambda: expensive(), 300)
+    """
+    conf = settings.CACHE_STAMPEDE
+    entry = local_cache.get(key)
+    if entry is not None and not _needs_refresh(entry, conf['BETA']):
+        return entry.value
+    entry = _entry(cache.get(key))
+    if entry is not None:
+        if not _needs_refresh(entry, conf['BETA']):
+            return _keep_local(key, entry)
+        token = _acquire_lock(key)
+        if token is None:
+            return entry.value
+        try:
+            return _compute_and_store(key, compute, timeout)
+        finally:
+            _release_lock(key, token)
+
+    def peek():
+        found = _entry(cache.get(key))
+        return found.value if found is not None else None
+
+    return single_flight(key, lambda: _compute_and_store(key, compute, timeout), peek)
+
+
+async def aget_or_compute(key, compute, timeout):
+    """get_or_compute() for async views; compute is a coroutine function"""
+    conf = settings.CACHE_STAMPEDE
+
+    async def compute_and_store():
+        started = time.monotonic()
+        value = await compute()
+        entry = CacheEntry(value, time.monotonic() - started, time.time() + timeout)
+        await cache.aset(key, entry, timeout + conf['STALE_TTL'])
+        return _keep_local(key, entry)
+
+    entry = local_cache.get(key)
+    if entry is not None and not _needs_refresh(entry, conf['BETA']):
+        return entry.value
+    entry = _entry(await cache.aget(key))
+    if entry is not None:
+        if not _needs_refresh(entry, conf['BETA']):
+            return _keep_local(key, entry)
+        token = await _aacquire_lock(key)
+        if token is None:
+            return entry.value
+        try:
+            return await compute_and_store()
+        finally:
+            await _arelease_lock(key, token)
+
+    async def peek():
+        found = _entry(await cache.aget(key))
+        return found.value if found is not None else None
+
+    return await asingle_flight(key, compute_and_store, peek)
@@ -0,0 +1,56 @@
+"""
+Sharded vote counters.
+
+Each vote increments one of VOTE_COUNTER_SHARDS slots for its option
+instead of the PollOption row itself, spreading row-lock contention on
+popular options. Reads sum PollOption.vote_count and the slots (see
+PollOptionQuerySet.with_live_counts); compact_counters() folds the slots
+back into vote_count.
+"""
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import PollOption, PollOptionCounter
+
+
+def increment_vote_counts(counts):
+    """Add ``counts`` ({option_id: n}) to the options' vote counters"""
+    shards = getattr(settings, 'VOTE_COUNTER_SHARDS', 1)
+    for option_id, n in counts.items():
+        if shards <= 1:
+            PollOption.objects.filter(pk=option_id).update(vote_count=F("vote_count") + n)
+            continue
+
+        shard = random.randrange(shards)
+        slot = PollOptionCounter.objects.filter(option_id=option_id, shard=shard)
+        if slot.update(count=F("count") + n):
+            continue
+        try:
+            with transaction.atomic():
+                PollOptionCounter.objects.create(option_id=option_id, shard=shard, count=n)
+        except IntegrityError:
+            # another writer created the slot first
+            slot.update(count=F("count") + n)
+
+
+def compact_counters(option_ids=None):
+    """Fold counter slots into PollOption.vote_count. Returns the number of options compacted."""
+    slots = PollOptionCounter.objects.exclude(count=0)
+    if option_ids is not None:
+        slots = slots.filter(option_id__in=option_ids)
+
+    compacted = 0
+    for option_id in slots.values_list("option_id", flat=True).distinct():
+        with transaction.atomic():
+            locked = PollOptionCounter.objects.select_for_update().filter(option_id=option_id)
+            # FOR UPDATE can't be combined with an aggregate, sum in Python
+            total = sum(locked.values_list("count", flat=True))
+            if not total:
+                continue
+            locked.update(count=0)
+            PollOption.objects.filter(pk=option_id).update(vote_count=F("vote_count") + total)
+            compacted += 1
+    return compacted
@@ -0,0 +1,116 @@
+"""
+ETag functions for conditional GETs.
+
+Each ETag is a digest of the versions a response is built from: cache
+namespace generations plus, for polls, the live tally counts and, for
+campaign stats, the campaign rollup. None of them reads the database
+(unless a tally has to be rebuilt) or the cached body, so a matching
+If-None-Match turns into a 304 for the price of one or two Redis lookups
+(none with a warm L1).
+Sync functions go with django's condition(), the a*-variants with
+cache_utils.async_etag().
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from . import rollups, tally
+from .fieldsets import fieldset_key
+from .cache_utils import aget_namespace_version, get_namespace_version
+
+
+def per_request(etag_func):
+    """
+    Compute an ETag once per request: condition() and cache_response()
+    both ask for it.
+    """
+    attr = f"_etag_{etag_func.__qualname__}"
+
+    if iscoroutinefunction(etag_func):
+        @wraps(etag_func)
+        async def awrapper(request, *args, **kwargs):
+            if not hasattr(request, attr):
+                setattr(request, attr, await etag_func(request, *args, **kwargs))
+            return getattr(request, attr)
+        return awrapper
+
+    @wraps(etag_func)
+    def wrapper(request, *args, **kwargs):
+        if not hasattr(request, attr):
+            setattr(request, attr, etag_func(request, *args, **kwargs))
+        return getattr(request, attr)
+    return wrapper
+
+
+def _digest(*parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _counts_version(counts):
+    return ",".join(f"{option_id}={n}" for option_id, n in sorted(counts.items()))
+
+
+@per_request
+def poll_detail_etag(request, pk):
+    counts = tally.get_counts(pk)
+    if counts is None:
+        return None
+    return _digest("poll", pk, get_namespace_version(f"poll_{pk}"), _counts_version(counts), fieldset_key(request))
+
+
+@per_request
+async def apoll_detail_etag(request, pk):
+    counts = await tally.aget_counts(pk)
+    if counts is None:
+        return None
+    return _digest("poll", pk, await aget_namespace_version(f"poll_{pk}"), _counts_version(counts),
+                   fieldset_key(request))
+
+
+@per_request
+def poll_results_etag(request, pk):
+    counts = tally.get_counts(pk)
+    if counts is None:
+        return None
+    return _digest("results", pk, get_namespace_version(f"poll_{pk}"), _counts_version(counts))
+
+
+@per_request
+async def apoll_results_etag(request, pk):
+    counts = await tally.aget_counts(pk)
+    if counts is None:
+        return None
+    return _digest("results", pk, await aget_namespace_version(f"poll_{pk}"), _counts_version(counts))
+
+
+def namespace_list_etag(namespace):
+    """ETag for a list cached under a namespace: its generation and the full URL"""
+    def etag_func(request, *args, **kwargs):
+        return _digest(namespace, get_namespace_version(namespace), request.get_full_path())
+    return etag_func
+
+
+def anamespace_list_etag(namespace):
+    async def etag_func(request, *args, **kwargs):
+        return _digest(namespace, await aget_namespace_version(namespace), request.get_full_path())
+    return etag_func
+
+
+def namespace_detail_etag(namespace):
+    """ETag for a detail entry cached under a namespace, per sparse fieldset"""
+    @per_request
+    def etag_func(request, pk, *args, **kwargs):
+        return _digest(namespace, pk, get_namespace_version(namespace), fieldset_key(request))
+    return etag_func
+
+
+@per_request
+def campaign_detail_etag(request, pk, *args, **kwargs):
+    """namespace_detail_etag('campaigns') plus, with ?include=stats, the campaign rollup's version"""
+    if not rollups.stats_requested(request):
+        return _digest("campaigns", pk, get_namespace_version("campaigns"), fieldset_key(request))
+    stats = rollups.version(pk)
+    if stats is None:
+        # stats computed from the database: nothing cheap to compare, build the response
+        return None
+    return _digest("campaigns", pk, get_namespace_version("campaigns"), fieldset_key(request), stats)
@@ -0,0 +1,144 @@
+"""
+Fast read path: the output of a DRF serializer rebuilt from .values() rows.
+
+For long lists ModelSerializer spends most of its time in per-field
+machinery: model instances, get_attribute(), the to_representation()
+dispatch of every field of every object. A ValuesSerializer works out once
+per class which column and converter each field of ``serializer_class``
+needs, then turns .values() rows into plain dicts with a loop over that
+plan. Fields that are not a column (nested serializers, method fields)
+come from a ``represent_<name>(row)`` method reading the columns listed in
+``extra_columns``; ``prepare(rows)`` can batch-load what they need.
+
+Views opt in with FastReadMixin, switched by FAST_READ_PATH['SERIALIZERS'].
+The tests pin the output to the DRF serializers'.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .fieldsets import ordering_columns
+
+# Fields whose to_representation() returns database values unchanged
+_PASSTHROUGH = (serializers.CharField, serializers.BooleanField, serializers.IntegerField)
+
+
+def _compile(name, field):
+    """(column, converter) of a serializer field; converter None keeps the value"""
+    if isinstance(field, PrimaryKeyRelatedField):
+        # values('<fk>') gives the related pk, which is what the field renders
+        return field.source, field.pk_field.to_representation if field.pk_field else None
+    if (field.source == '*' or '.' in field.source
+            or isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                                  serializers.ManyRelatedField))):
+        raise ImproperlyConfigured(f"Field '{name}' is not a column: define represent_{name}(row).")
+    if type(field) in _PASSTHROUGH:
+        return field.source, None
+    if type(field) is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return field.source, str
+    return field.source, field.to_representation
+
+
+class ValuesSerializer:
+    serializer_class = None
+    # {field name: columns its represent_<name>() reads}
+    extra_columns = {}
+
+    def __init__(self, instance=None, many=False, fields=None, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.names = fields
+        self.context = context or {}
+
+    @classmethod
+    def plan(cls):
+        """[(name, column, converter)] for every field; column None for represent_<name> fields"""
+        plan = cls.__dict__.get('_plan')
+        if plan is None:
+            plan = []
+            for name, field in cls.serializer_class().fields.items():
+                represent = getattr(cls, f'represent_{name}', None)
+                if represent is not None:
+                    plan.append((name, None, represent))
+                else:
+                    plan.append((name, *_compile(name, field)))
+            cls._plan = plan
+        return plan
+
+    @classmethod
+    def columns(cls, names=None):
+        """Columns to ask .values() for so the ``names`` fields (None for all) can be built"""
+        columns = {}
+        for name, column, _ in cls.plan():
+            if names is not None and name not in names:
+                continue
+            for needed in cls.extra_columns.get(name, ()) if column is None else (column,):
+                columns[needed] = None
+        return list(columns)
+
+    @classmethod
+    def values(cls, queryset, names=None, keep=()):
+        """``queryset`` as the rows this serializer reads, plus the ``keep`` columns"""
+        columns = dict.fromkeys([*cls.columns(names), *keep])
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+    def active_plan(self):
+        if self.names is None:
+            return self.plan()
+        return [step for step in self.plan() if step[0] in self.names]
+
+    def prepare(self, rows):
+        """Batch-load whatever represent_<name>() needs for ``rows``"""
+
+    def to_representation(self, row, plan=None):
+        data = {}
+        for name, column, convert in self.active_plan() if plan is None else plan:
+            if column is None:
+                data[name] = convert(self, row)
+            else:
+                value = row[column]
+                data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            rows = list(self.instance) if self.many else [self.instance]
+            self.prepare(rows)
+            plan = self.active_plan()
+            data = [self.to_representation(row, plan) for row in rows]
+            self._data = data if self.many else data[0]
+        return self._data
+
+
+class FastReadMixin:
+    """
+    View whose GETs are serialized by ``fast_serializer_class`` from
+    .values() rows while FAST_READ_PATH['SERIALIZERS'] is on. Sparse
+    fieldsets (SparseFieldsetsMixin) narrow the rows to the requested fields.
+    """
+    fast_serializer_class = None
+
+    def use_fast_path(self):
+        return (self.fast_serializer_class is not None and self.request.method in ('GET', 'HEAD')
+                and settings.FAST_READ_PATH['SERIALIZERS'])
+
+    def fast_fields(self):
+        sparse_fields = getattr(self, 'sparse_fields', None)
+        return sparse_fields() if sparse_fields is not None else None
+
+    def filter_queryset(self, queryset):
+        # Rows are taken last, so filters and ordering still see the model queryset
+        queryset = super().filter_queryset(queryset)
+        if not self.use_fast_path():
+            return queryset
+        keep = ordering_columns(queryset, self.paginator)
+        return self.fast_serializer_class.values(queryset, self.fast_fields(), keep)
+
+    def get_serializer(self, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().get_serializer(*args, **kwargs)
+        kwargs.setdefault('fields', self.fast_fields())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return self.fast_serializer_class(*args, **kwargs)
@@ -0,0 +1,153 @@
+"""
+Sparse fieldsets: ?fields=a,b returns only those top-level fields, ?omit=a,b
+everything but them.
+
+List views plan their queryset from the fields actually serialized:
+relations nobody reads are neither joined nor prefetched, and plain columns
+are narrowed with only(). Cached detail views serialize every field once and
+project the cached data per request instead (see project()).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _names(request, param):
+    value = request.GET.get(param, '') if request is not None else ''
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fields(request, serializer_class):
+    """
+    Names of the serializer's fields a request asks for, or None for all of
+    them. Unknown names are a 400.
+    """
+    fields, omit = _names(request, FIELDS_PARAM), _names(request, OMIT_PARAM)
+    if not fields and not omit:
+        return None
+    available = list(serializer_class().fields)
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        param = FIELDS_PARAM if unknown & fields else OMIT_PARAM
+        raise ValidationError({param: [f"Unknown field(s): {', '.join(sorted(unknown))}."]})
+    return {name for name in available if (not fields or name in fields) and name not in omit}
+
+
+def fieldset_key(request):
+    """Canonical form of a request's fieldset, for cache keys and ETags"""
+    return "|".join(
+        ",".join(sorted(_names(request, param))) for param in (FIELDS_PARAM, OMIT_PARAM)
+    )
+
+
+def project(data, names):
+    """Serialized data of one object cut down to ``names`` (None keeps everything)"""
+    if names is None:
+        return data
+    return {key: value for key, value in data.items() if key in names}
+
+
+def ordering_columns(queryset, paginator=None):
+    """Columns a list reads besides the serialized fields: its ordering and the cursor's"""
+    ordering = list(queryset.query.order_by)
+    cursor_class = getattr(paginator, 'cursor_class', None)
+    if cursor_class is not None:
+        # Cursor links are built from the last row's ordering fields
+        ordering += cursor_class.ordering
+    return [field.lstrip('-') for field in ordering if isinstance(field, str)]
+
+
+def plan_queryset(queryset, serializer_class, names=None, keep=()):
+    """
+    Drop the joins and prefetches the selected serializer fields don't read
+    and defer the columns they don't need. ``keep`` lists extra columns that
+    are read outside the serializer, e.g. for cursor positions.
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name, *keep}
+    relations = set()
+    for name, field in serializer_class().fields.items():
+        if names is not None and name not in names:
+            continue
+        if field.source == '*':
+            # Reads the whole object: nothing can be deferred
+            columns = None
+            continue
+        attr = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # A property or method, which may read any column
+            columns = None
+            continue
+        if model_field.is_relation and (model_field.many_to_many or model_field.one_to_many):
+            relations.add(attr)
+        elif model_field.is_relation:
+            if columns is not None:
+                columns.add(model_field.name)
+            # Only nested serializers and dotted sources read past the key
+            if isinstance(field, serializers.BaseSerializer) or '.' in field.source:
+                relations.add(attr)
+        elif columns is not None:
+            columns.add(model_field.name)
+
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in relations
+    ]
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        kept = [relation for relation in select_related if relation in relations]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+        elif columns is not None:
+            queryset = queryset.only(*columns)
+    elif columns is not None and not select_related:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+class SparseFieldsetsSerializerMixin:
+    """Serializer taking ``fields``: the names of the fields to keep"""
+
+    def __init__(self, *args, **kwargs):
+        names = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if names is not None:
+            for name in set(self.fields) - set(names):
+                self.fields.pop(name)
+
+
+class SparseFieldsetsMixin:
+    """
+    List view honouring ?fields= / ?omit= on GET: the serializer leaves the
+    other fields out and the queryset only fetches what the kept ones read.
+    """
+    fields_query_param = FIELDS_PARAM
+    omit_query_param = OMIT_PARAM
+
+    def sparse_fields(self):
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        if not hasattr(self.request, '_sparse_fields'):
+            self.request._sparse_fields = requested_fields(self.request, self.get_serializer_class())
+        return self.request._sparse_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        keep = ordering_columns(queryset, self.paginator)
+        return plan_queryset(queryset, self.get_serializer_class(), self.sparse_fields(), keep)
+
+    def get_serializer(self, *args, **kwargs):
+        names = self.sparse_fields()
+        if names is not None:
+            kwargs.setdefault('fields', names)
+        return super().get_serializer(*args, **kwargs)
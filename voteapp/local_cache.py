@@ -0,0 +1,209 @@
+"""
+Optional in-process cache (L1) in front of the shared Django cache.
+
+Each worker process keeps a bounded LRU of recently read cache entries and
+namespace generations, so hot detail reads skip the Redis round trip and
+the unpickling. Entries expire with the value they mirror and never live
+longer than LOCAL_CACHE['MAX_TTL']. Invalidations are published on a
+Redis channel and every process drops the key as soon as it hears of it.
+A value read from the shared cache before the drop is refused when it is
+set afterwards, so a slow reader can't put the old value back (see set()).
+The L1 is only consulted while this process is subscribed; after a lost
+connection it is cleared and bypassed until the subscription is back.
+
+Cached values are shared between requests and must be treated as read-only.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger('voteapp')
+
+
+class LocalCache:
+    """Thread-safe LRU bounded by the pickled size of its values"""
+
+    def __init__(self, max_bytes, max_ttl):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self._data = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        # key -> when it was last invalidated, oldest first, kept for max_ttl;
+        # reads that started before _forgotten may predate a forgotten one
+        self._invalidated = OrderedDict()
+        self._forgotten = float('-inf')
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def set(self, key, value, ttl, read_at=None):
+        """
+        Keep ``value`` for ``ttl`` seconds. ``read_at``, the clock() reading
+        taken before the value was read from the shared cache, refuses it if
+        the key was invalidated since.
+        """
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if read_at is not None and read_at <= max(self._forgotten, self._invalidated.get(key, self._forgotten)):
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def delete(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+            # Remembered even if the key wasn't here: a reader may be about to set it
+            self._invalidated[key] = now
+            self._invalidated.move_to_end(key)
+            while True:
+                oldest, when = next(iter(self._invalidated.items()))
+                if when > now - self.max_ttl:
+                    break
+                del self._invalidated[oldest]
+                self._forgotten = when
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._invalidated.clear()
+            self._forgotten = time.monotonic()
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = None
+_listener_pid = None
+_subscribed = threading.Event()
+_start_lock = threading.Lock()
+
+
+def enabled():
+    return settings.LOCAL_CACHE['ENABLED']
+
+
+def channel():
+    from .cache_utils import redis_key
+
+    return redis_key("l1", "invalidate")
+
+
+def _local():
+    """The process-wide LocalCache, or None while it can't be trusted"""
+    global _cache, _listener_pid
+    if not enabled():
+        return None
+    if _listener_pid != os.getpid():
+        # first use in this process (or in a forked worker): start listening
+        with _start_lock:
+            if _listener_pid != os.getpid():
+                conf = settings.LOCAL_CACHE
+                _cache = LocalCache(conf['MAX_BYTES'], conf['MAX_TTL'])
+                _subscribed.clear()
+                _listener_pid = os.getpid()
+                threading.Thread(target=_listen, name="local-cache-invalidation", daemon=True).start()
+    return _cache if _subscribed.is_set() else None
+
+
+def _listen():
+    import redis
+
+    while True:
+        try:
+            # Own connection without the cache's socket timeout: the channel can be idle for long
+            client = redis.Redis.from_url(settings.REDIS_URL, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel())
+            # Invalidations sent while unsubscribed were missed
+            _cache.clear()
+            _subscribed.set()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    _cache.delete(message["data"].decode())
+        except Exception as e:
+            logger.warning(f"Local cache invalidation listener reconnecting: {e}")
+        _subscribed.clear()
+        _cache.clear()
+        time.sleep(1)
+
+
+def clock():
+    """Reading to pass to set() as read_at, taken before the shared cache is read"""
+    return time.monotonic()
+
+
+def get(key):
+    local = _local()
+    return local.get(key) if local is not None else None
+
+
+def set(key, value, ttl, read_at=None):
+    local = _local()
+    if local is not None:
+        local.set(key, value, ttl, read_at)
+
+
+def invalidate(key):
+    """Drop a key from the L1 of every process"""
+    if not enabled():
+        return
+    local = _local()
+    if local is not None:
+        local.delete(key)
+    from .cache_utils import get_redis
+
+    conn = get_redis()
+    if conn is not None:
+        conn.publish(channel(), key)
+
+
+def stats():
+    """Counters of this process's L1"""
+    local = _local()
+    return local.stats() if local is not None else {"enabled": enabled(), "subscribed": False}
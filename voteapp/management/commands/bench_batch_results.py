@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from online_poll.query_budget import record_queries
+from voteapp import tally
+from voteapp.models import Poll, PollOption
+from voteapp.views import BatchResultsView, PollResultsView
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of the results of N polls: N per-poll results requests against one batch "
+        "request, with warm tallies and with cold ones (rebuilt from the database), next to a "
+        "batch of one. Seeds polls in the configured database inside a transaction that is "
+        "rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=50)
+        parser.add_argument("--options", type=int, default=4, help="Options per poll")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        owner = get_user_model().objects.create_user(email="batch-results-bench@example.com", password=None)
+        polls = Poll.objects.bulk_create(
+            Poll(title=f"Benchmark poll {n}", created_by=owner) for n in range(options["polls"])
+        )
+        PollOption.objects.bulk_create(
+            PollOption(poll=poll, text=f"Option {n}", order=n, vote_count=n * 5)
+            for poll in polls for n in range(options["options"])
+        )
+        factory = APIRequestFactory()
+        single_view, batch_view = PollResultsView.as_view(), BatchResultsView.as_view()
+
+        def render(response):
+            # Response cache hits come back already rendered
+            if hasattr(response, "render"):
+                response.render()
+
+        def one_by_one():
+            for poll in polls:
+                render(single_view(factory.get(f"/api/p/polls/{poll.pk}/results/"), pk=poll.pk))
+
+        def batch_of(group):
+            ids = ",".join(str(poll.pk) for poll in group)
+            return lambda: render(batch_view(factory.get(f"/api/p/results/?ids={ids}")))
+
+        for name, fetch in [
+            (f"{len(polls)} single requests", one_by_one),
+            (f"batch of {len(polls)}", batch_of(polls)),
+            ("batch of 1", batch_of(polls[:1])),
+        ]:
+            for state in ("warm", "cold"):
+                timings = []
+                for _ in range(options["repeat"]):
+                    if state == "cold":
+                        for poll in polls:
+                            tally.forget(poll.pk)
+                    else:
+                        fetch()
+                    with record_queries() as queries:
+                        started = time.perf_counter()
+                        fetch()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{name:>20} ({state}): {statistics.median(timings) * 1000:8.2f} ms, "
+                    f"{len(queries):3d} queries"
+                )
@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from voteapp.cache_utils import invalidate_namespace
+from voteapp.models import Poll, PollOption
+from voteapp.views import PollDetailView, PollResultsView, VoteCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Cache hit ratio of the poll detail and results endpoints under a mixed "
+        "read/write workload. A read counts as a hit when it needs no database query. "
+        "Runs against a throwaway poll in the configured database and cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--write-ratio", type=float, default=0.05)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--invalidate-on-vote", action="store_true",
+            help="Also drop the poll's cached detail after every vote, like the old delete-on-vote strategy",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        factory = RequestFactory()
+        detail = PollDetailView.as_view()
+        results = PollResultsView.as_view()
+        vote = VoteCreateView.as_view()
+
+        owner = get_user_model().objects.order_by("pk").first()
+        if owner is None:
+            raise CommandError("Needs at least one user to own the benchmark poll.")
+        poll = Poll.objects.create(title="Cache benchmark", description="Temporary poll", created_by=owner)
+        option_ids = [
+            str(PollOption.objects.create(poll=poll, text=f"Option {n}", order=n).id)
+            for n in range(options["options"])
+        ]
+        stats = {"detail": [0, 0], "results": [0, 0]}  # endpoint -> [hits, reads]
+        writes = 0
+        started = time.perf_counter()
+        try:
+            for n in range(options["requests"]):
+                if rng.random() < options["write_ratio"]:
+                    request = factory.post(
+                        "/api/votes/",
+                        {"poll": str(poll.id), "option": rng.choice(option_ids)},
+                        content_type="application/json",
+                        REMOTE_ADDR=f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}",
+                    )
+                    vote(request)
+                    writes += 1
+                    if options["invalidate_on_vote"]:
+                        invalidate_namespace(f"poll_{poll.id}")
+                    continue
+
+                name, view = rng.choice((("detail", detail), ("results", results)))
+                with CaptureQueriesContext(connection) as queries:
+                    view(factory.get(f"/api/polls/{poll.id}/"), pk=poll.id)
+                stats[name][0] += not queries.captured_queries
+                stats[name][1] += 1
+        finally:
+            poll.delete()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{options['requests']} requests ({writes} votes) in {elapsed:.2f}s")
+        for name, (hits, reads) in stats.items():
+            ratio = hits / reads if reads else 0
+            self.stdout.write(f"{name:>8}: {hits}/{reads} hits ({ratio:.1%})")
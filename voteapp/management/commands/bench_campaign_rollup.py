@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from online_poll.query_budget import record_queries
+from voteapp import rollups
+from voteapp.cache_utils import get_redis
+from voteapp.models import Campaign, Poll, PollOption, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of a campaign's stats as it grows: read from its rollup in Redis against "
+        "computed from the votes table, plus the cost of a rebuild. Seeds campaigns in the "
+        "configured database inside a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, nargs="+", default=[10, 100, 500])
+        parser.add_argument("--votes", type=int, default=200, help="Votes per poll")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            self.stdout.write("Redis is not configured: only the database path can be measured")
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        owner = get_user_model().objects.create_user(email="rollup-bench@example.com", password=None)
+        for size in options["polls"]:
+            campaign = Campaign.objects.create(title=f"Benchmark campaign {size}", created_by=owner)
+            polls = Poll.objects.bulk_create(
+                Poll(title=f"Benchmark poll {n}", created_by=owner, campaign=campaign) for n in range(size)
+            )
+            poll_options = PollOption.objects.bulk_create(
+                PollOption(poll=poll, text=f"Option {n}", order=n) for poll in polls for n in range(2)
+            )
+            Vote.objects.bulk_create(
+                (Vote(poll=option.poll, option=option, voter_ip=f"10.{n // 65536}.{n // 256 % 256}.{n % 256}")
+                 for option in poll_options[::2] for n in range(options["votes"])),
+                batch_size=5000,
+            )
+            paths = [("database", lambda: rollups._load_from_db(campaign.pk))]
+            if get_redis() is not None:
+                rollups.rebuild(campaign.pk)
+                paths += [
+                    ("rollup", lambda: rollups.campaign_stats(campaign.pk)),
+                    ("rebuild", lambda: rollups.rebuild(campaign.pk)),
+                ]
+            for name, read in paths:
+                timings = []
+                for _ in range(options["repeat"]):
+                    with record_queries() as queries:
+                        started = time.perf_counter()
+                        read()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{size:5d} polls, {size * options['votes']:7d} votes, {name:>8}: "
+                    f"{statistics.median(timings) * 1000:8.2f} ms, {len(queries):2d} queries"
+                )
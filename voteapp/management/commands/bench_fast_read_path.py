@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from notifications.models import Notification
+from notifications.serializers import FastNotificationSerializer, NotificationSerializer
+from voteapp import tally
+from voteapp.models import Poll, PollOption
+from voteapp.renderers import FastJSONRenderer, orjson
+from voteapp.serializers import FastPollSerializer, PollSerializer
+from voteapp.views import PollListCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Objects per second of the hot read shapes (poll list, poll results, notifications) "
+        "through ModelSerializer + JSONRenderer against the fast serializers + FastJSONRenderer, "
+        "queries included. Seeds rows in the configured database inside a transaction that is "
+        "rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objects", type=int, default=1000, help="Polls and notifications to seed")
+        parser.add_argument("--options", type=int, default=4, help="Options per poll")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed: FastJSONRenderer falls back to JSONRenderer")
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        User = get_user_model()
+        owner = User.objects.create_user(email="fast-read-bench@example.com", password=None)
+        actor = User.objects.create_user(email="fast-read-actor@example.com", password=None)
+        polls = Poll.objects.bulk_create(
+            Poll(title=f"Benchmark poll {n}", description="A poll seeded by bench_fast_read_path " * 4,
+                 created_by=owner)
+            for n in range(options["objects"])
+        )
+        PollOption.objects.bulk_create(
+            PollOption(poll=poll, text=f"Option {n}", order=n, vote_count=n * 3)
+            for poll in polls for n in range(options["options"])
+        )
+        Notification.objects.bulk_create(
+            Notification(recipient=owner, actor_user=actor, verb="voted on", target_type="Poll",
+                         target_id=str(poll.pk), link=f"/polls/{poll.pk}/")
+            for poll in polls
+        )
+
+        poll_list = PollListCreateView.queryset.all()
+        notifications = Notification.objects.filter(recipient=owner).select_related("actor_user")
+        results = [tally.format_results(*tally._load_from_db(poll.pk)) for poll in polls[:100]]
+
+        shapes = [
+            ("poll list", len(polls),
+             lambda: JSONRenderer().render(PollSerializer(poll_list.all(), many=True).data),
+             lambda: FastJSONRenderer().render(
+                 FastPollSerializer(FastPollSerializer.values(poll_list), many=True).data)),
+            ("poll results", len(results),
+             lambda: JSONRenderer().render(results),
+             lambda: FastJSONRenderer().render(results)),
+            ("notifications", len(polls),
+             lambda: JSONRenderer().render(NotificationSerializer(notifications.all(), many=True).data),
+             lambda: FastJSONRenderer().render(
+                 FastNotificationSerializer(FastNotificationSerializer.values(notifications), many=True).data)),
+        ]
+        for name, count, drf, fast in shapes:
+            drf_rate, fast_rate = self.rate(drf, count, options["repeat"]), self.rate(fast, count, options["repeat"])
+            self.stdout.write(
+                f"{name:>14}: DRF {drf_rate:10.0f} objects/s, fast {fast_rate:10.0f} objects/s "
+                f"({fast_rate / drf_rate:4.1f}x)"
+            )
+
+    @staticmethod
+    def rate(render, count, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+        return count / statistics.median(timings)
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from voteapp.cache_utils import invalidate_namespace
+from voteapp.models import Poll, PollOption
+from voteapp.views import PollListCreateView
+
+FIELDSETS = [
+    ("all fields", ""),
+    ("?omit=options", "omit=options"),
+    ("?fields=id,title", "fields=id,title"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Queries, payload size and latency of a poll list page with sparse fieldsets "
+        "against the full representation. Seeds polls in the configured database inside "
+        "a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=1000)
+        parser.add_argument("--options", type=int, default=4, help="Options per poll")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        owner = get_user_model().objects.create_user(email="fieldsets-bench@example.com", password=None)
+        polls = Poll.objects.bulk_create(
+            Poll(title=f"Benchmark poll {n}", description="A poll seeded by bench_fieldsets " * 4, created_by=owner)
+            for n in range(options["polls"])
+        )
+        PollOption.objects.bulk_create(
+            PollOption(poll=poll, text=f"Option {n}", order=n) for poll in polls for n in range(options["options"])
+        )
+
+        view = PollListCreateView.as_view()
+        factory = APIRequestFactory()
+        for name, query in FIELDSETS:
+            timings = []
+            for _ in range(options["repeat"]):
+                # Measure the view, not the list cache
+                invalidate_namespace("polls")
+                request = factory.get(f"/api/p/polls/?page_size={options['page_size']}&{query}")
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f"{name:>18}: {len(queries):2d} queries, {len(response.content):8d} bytes, "
+                f"{statistics.median(timings) * 1000:8.2f} ms"
+            )
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from voteapp.cache_utils import _namespace_key, get_redis, invalidate_namespace, redis_key, versioned_key
+
+NAMESPACE = "bench_invalidation"
+
+
+class Command(BaseCommand):
+    help = (
+        "Cost of invalidating a cache namespace as the keyspace grows: invalidate_namespace "
+        "(one INCR) against the KEYS '*polls*' scan it replaced, which is timed alone, "
+        "without the DELETE that followed it. The scan is only timed on django-redis. "
+        "Fills the configured cache with keys under a benchmark prefix and deletes them at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument(
+            "--matching-share", type=float, default=0.2,
+            help="Share of the keys that contain 'polls' (cached lists, details, results)",
+        )
+
+    def handle(self, *args, **options):
+        conn = get_redis()
+        if conn is None:
+            self.stdout.write("no django-redis: only invalidate_namespace is timed")
+        written = []
+        try:
+            for size in sorted(options["sizes"]):
+                written += self.fill(len(written), size, options["matching_share"])
+                line = f"{size:>8} keys: invalidate_namespace {self.time(invalidate_namespace, NAMESPACE, options['rounds']):8.3f} ms"
+                if conn is not None:
+                    line += f", KEYS scan {self.time(conn.keys, redis_key('*polls*'), options['rounds']):8.3f} ms"
+                self.stdout.write(line)
+        finally:
+            for start in range(0, len(written), 1000):
+                cache.delete_many(written[start:start + 1000])
+            cache.delete(_namespace_key(NAMESPACE))
+
+    @staticmethod
+    def key(n, matching_share):
+        kind = "polls" if n % 100 < matching_share * 100 else "other"
+        return f"{NAMESPACE}:{kind}:{n}"
+
+    def fill(self, start, size, matching_share):
+        """Add benchmark keys ``start`` to ``size``, versioned like the real ones; returns them"""
+        keys = [versioned_key(NAMESPACE, self.key(n, matching_share)) for n in range(start, size)]
+        for chunk in range(0, len(keys), 1000):
+            cache.set_many(dict.fromkeys(keys[chunk:chunk + 1000], b"x" * 64), 600)
+        return keys
+
+    @staticmethod
+    def time(func, arg, rounds):
+        """Median milliseconds per call"""
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            func(arg)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,63 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from voteapp.cache_utils import canonical_list_query
+from voteapp.views import PollListCreateView
+
+SEARCHES = ["", "", "", "election", "Election", "best pizza", "pizza best", "sports"]
+ORDERINGS = ["", "", "-created_at", "title"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulated hit rate of the poll list cache: per-URL-and-token keys "
+        "(cache_page + vary on Authorization) against canonical shared keys. "
+        "Counts a hit whenever a request's key was produced before; TTLs and "
+        "invalidations are ignored, so both numbers are upper bounds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--requests-per-user", type=int, default=5)
+        parser.add_argument("--anonymous-share", type=float, default=0.3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        factory = RequestFactory()
+        view = PollListCreateView()
+        seen = {"per-token": set(), "canonical": set()}
+        hits = {"per-token": 0, "canonical": 0}
+        total = 0
+
+        for user in range(options["users"]):
+            token = "" if rng.random() < options["anonymous_share"] else f"Bearer token-{user}"
+            for _ in range(options["requests_per_user"]):
+                params = [("page", str(min(int(rng.expovariate(0.7)) + 1, 20)))]
+                if search := rng.choice(SEARCHES):
+                    params.append(("search", search))
+                if ordering := rng.choice(ORDERINGS):
+                    params.append(("ordering", ordering))
+                if rng.random() < 0.1:
+                    params.append(("utm_source", f"campaign-{rng.randrange(50)}"))
+                rng.shuffle(params)
+                query = "&".join(f"{k}={v}" for k, v in params)
+                request = factory.get(f"/api/p/polls/?{query}", HTTP_AUTHORIZATION=token)
+
+                keys = {
+                    "per-token": (request.get_full_path(), token),
+                    "canonical": canonical_list_query(view, Request(request)).urlencode(),
+                }
+                for name, key in keys.items():
+                    hits[name] += key in seen[name]
+                    seen[name].add(key)
+                total += 1
+
+        self.stdout.write(f"{options['users']} users, {total} list requests")
+        for name in ("per-token", "canonical"):
+            self.stdout.write(
+                f"{name:>10}: {hits[name] / total:.1%} hit rate, {len(seen[name])} distinct entries"
+            )
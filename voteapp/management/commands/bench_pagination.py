@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+
+from voteapp.models import Poll
+from voteapp.pagination import HybridResultsSetPagination
+from voteapp.views import PollListCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of page-number against cursor pagination of the poll list at a "
+        "shallow and a deep page. Seeds --rows polls in the configured database inside "
+        "a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--page", type=int, default=10_000, help="Deep page to compare with page 1")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        page_size = HybridResultsSetPagination.page_size
+        if options["page"] * page_size > options["rows"]:
+            raise CommandError("--page is beyond the seeded rows")
+
+        with transaction.atomic():
+            self.run(options, page_size)
+            transaction.set_rollback(True)
+
+    def run(self, options, page_size):
+        owner = get_user_model().objects.create_user(email="pagination-bench@example.com", password=None)
+        self.stdout.write(f"Seeding {options['rows']} polls...")
+        for start in range(0, options["rows"], options["batch_size"]):
+            Poll.objects.bulk_create(
+                Poll(title=f"Benchmark poll {n}", created_by=owner)
+                for n in range(start, min(start + options["batch_size"], options["rows"]))
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Poll._meta.db_table}")
+
+        queryset = PollListCreateView.queryset
+        factory = RequestFactory()
+
+        # Cursor equivalent of the deep page: positioned after the last row of the page before it
+        boundary = queryset.values_list("created_at", flat=True)[(options["page"] - 1) * page_size - 1]
+        cursor_pagination = HybridResultsSetPagination.cursor_class()
+        cursor_pagination.base_url = "http://localhost/api/p/polls/"
+        deep_cursor = cursor_pagination.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(boundary))
+        ).split("cursor=")[1]
+
+        cases = [
+            ("page-number, page 1", "?page=1"),
+            (f"page-number, page {options['page']}", f"?page={options['page']}"),
+            ("cursor, page 1", "?pagination=cursor"),
+            (f"cursor, page {options['page']}", f"?cursor={deep_cursor}"),
+        ]
+        self.stdout.write(f"{queryset.count()} polls, page size {page_size}")
+        for name, query in cases:
+            timings = []
+            for _ in range(options["repeat"]):
+                request = Request(factory.get(f"/api/p/polls/{query}"))
+                started = time.perf_counter()
+                # page-number pages include the COUNT(*) here, like in the response
+                page = HybridResultsSetPagination().paginate_queryset(queryset, request)
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(f"{name:>28}: {statistics.median(timings) * 1000:9.2f} ms ({len(page)} rows)")
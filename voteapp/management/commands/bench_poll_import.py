@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from online_poll.query_budget import record_queries
+from voteapp.models import Campaign, PollOption
+from voteapp.serializers import CreatePollSerializer
+from voteapp.views import CampaignPollImportView, PollListCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput of creating a campaign's polls: a poll then its options one by one (the "
+        "flow before nested options), one nested POST per poll, and the campaign bulk import. "
+        "Runs in the configured database inside a transaction that is rolled back at the end; "
+        "on-commit side effects are run in place so they are part of the timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=1000)
+        parser.add_argument("--options", type=int, default=4, help="Options per poll")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        self.owner = get_user_model().objects.create_user(email="import-bench@example.com", password=None)
+        self.factory = APIRequestFactory()
+        for name, create in [
+            ("poll + options", self.create_then_options),
+            ("nested POST", self.nested_posts),
+            ("campaign import", self.campaign_import),
+        ]:
+            campaign = Campaign.objects.create(title=f"Benchmark {name}", created_by=self.owner)
+            polls = [
+                {"title": f"Imported poll {n}", "description": "A poll seeded by bench_poll_import",
+                 "options": [{"text": f"Option {m}"} for m in range(options["options"])]}
+                for n in range(options["polls"])
+            ]
+            with record_queries() as queries, TestCase.captureOnCommitCallbacks(execute=True):
+                started = time.perf_counter()
+                create(campaign, polls)
+                elapsed = time.perf_counter() - started
+            assert PollOption.objects.filter(poll__campaign=campaign).count() == options["polls"] * options["options"]
+            self.stdout.write(
+                f"{name:>16}: {elapsed:7.2f} s, {len(polls) / elapsed:8.0f} polls/s, {len(queries):6d} queries"
+            )
+
+    def create_then_options(self, campaign, polls):
+        for data in polls:
+            serializer = CreatePollSerializer(data={**data, "campaign": campaign.pk, "options": []})
+            serializer.is_valid(raise_exception=True)
+            poll = serializer.save(created_by=self.owner)
+            for position, option in enumerate(data["options"]):
+                PollOption.objects.create(poll=poll, text=option["text"], order=position)
+
+    def nested_posts(self, campaign, polls):
+        view = PollListCreateView.as_view()
+        for data in polls:
+            request = self.factory.post("/api/p/polls/", {**data, "campaign": str(campaign.pk)}, format="json")
+            force_authenticate(request, self.owner)
+            assert view(request).status_code == 201
+
+    def campaign_import(self, campaign, polls):
+        view = CampaignPollImportView.as_view()
+        request = self.factory.post(f"/api/p/campaigns/{campaign.pk}/polls/", {"polls": polls}, format="json")
+        force_authenticate(request, self.owner)
+        assert view(request, pk=campaign.pk).status_code == 201
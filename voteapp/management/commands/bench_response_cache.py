@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from voteapp.cache_utils import _pack_response, _unpack_response
+from voteapp.models import Poll, PollOption
+from voteapp.serializers import PollSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Cache hit latency of a poll detail payload stored as a serializer dict "
+        "(unpickle + JSON render) versus as pre-rendered bytes (cache_response)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--options", type=int, default=10, help="Options on the benchmark poll")
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.order_by("pk").first()
+        if owner is None:
+            raise CommandError("Needs at least one user to own the benchmark poll.")
+        poll = Poll.objects.create(title="Response cache benchmark", created_by=owner)
+        try:
+            for n in range(options["options"]):
+                PollOption.objects.create(poll=poll, text=f"Option {n}", order=n)
+            data = PollSerializer(Poll.objects.prefetch_related("options").get(pk=poll.pk)).data
+        finally:
+            poll.delete()
+
+        renderer = JSONRenderer()
+        content = renderer.render(data)
+        cache.set("bench_response_dict", data, 300)
+        cache.set("bench_response_bytes", _pack_response(HttpResponse(content, content_type="application/json"), "v1"), 300)
+
+        def dict_hit():
+            response = Response(cache.get("bench_response_dict"))
+            return renderer.render(response.data)
+
+        def bytes_hit():
+            return _unpack_response(cache.get("bench_response_bytes")).content
+
+        assert dict_hit() == bytes_hit()
+        try:
+            self.stdout.write(f"payload: {len(content)} bytes, {options['iterations']} hits each")
+            for name, hit in (("dict cache", dict_hit), ("bytes cache", bytes_hit)):
+                timings = []
+                for _ in range(options["iterations"]):
+                    started = time.perf_counter()
+                    hit()
+                    timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{name:>12}: median {statistics.median(timings) * 1e6:.1f} us, "
+                    f"p99 {sorted(timings)[int(len(timings) * 0.99)] * 1e6:.1f} us"
+                )
+        finally:
+            cache.delete_many(["bench_response_dict", "bench_response_bytes"])
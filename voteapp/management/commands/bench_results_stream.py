@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+
+from voteapp import tally
+from voteapp.cache_utils import get_redis
+from voteapp.models import Poll, PollOption
+from voteapp.streaming import get_hub
+
+
+class Connection:
+    """One SSE client talking to the ASGI application in-process"""
+
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.chunks = []
+        self.status = None
+        self.received = asyncio.Event()
+        self.requested = False
+        self.closed = asyncio.Event()
+
+    async def run(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": self.path, "raw_path": self.path.encode(), "query_string": b"",
+            "root_path": "", "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+        }
+        try:
+            await self.app(scope, self.receive, self.send)
+        finally:
+            self.received.set()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            self.chunks.append(message["body"])
+            self.received.set()
+
+    async def next_event(self):
+        await self.received.wait()
+        self.received.clear()
+        return self.chunks[-1] if self.status == 200 and self.chunks else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Opens thousands of idle Server-Sent Events streams on one poll through the ASGI "
+        "application in this process, then reports the Python memory each open stream holds "
+        "(tracemalloc: the request, the response generator and its hub subscription, not the "
+        "server's socket buffers), the threads they keep, and how long one vote takes to reach "
+        "every stream. Needs django-redis for the pub/sub fan-out. Seeds a poll, commits it and "
+        "deletes it at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError("The results stream fans out through Redis pub/sub: needs django-redis.")
+        owner = get_user_model().objects.create_user(email="stream-bench@example.com", password=None)
+        try:
+            poll = Poll.objects.create(title="Stream benchmark", created_by=owner)
+            option = PollOption.objects.create(poll=poll, text="Option", order=0)
+            # A poll with an audience has a warm tally
+            tally.get_results(poll.pk)
+            asyncio.run(self.run(poll, option, options["connections"]))
+        finally:
+            Poll.objects.filter(created_by=owner).delete()
+            owner.delete()
+
+    async def run(self, poll, option, count):
+        app = get_asgi_application()
+        path = reverse("poll-results-stream", args=[poll.pk])
+        hub = get_hub()
+        # Let the hub subscribe before the vote is published
+        await asyncio.sleep(0.5)
+
+        threads = threading.active_count()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        connections = [Connection(app, path) for _ in range(count)]
+        tasks = [asyncio.create_task(connection.run()) for connection in connections]
+        started = time.perf_counter()
+        await asyncio.gather(*(connection.next_event() for connection in connections))
+        opened = time.perf_counter() - started
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / count
+        tracemalloc.stop()
+        failed = [connection for connection in connections if connection.status != 200]
+        connections = [connection for connection in connections if connection.status == 200]
+        self.stdout.write(
+            f"{len(connections)} streams open in {opened:.2f}s, {per_connection / 1024:.1f} KiB each, "
+            f"{threading.active_count() - threads} more threads"
+            + (f"; {len(failed)} refused ({', '.join(sorted({str(c.status) for c in failed}))})" if failed else "")
+        )
+
+        started = time.perf_counter()
+        response = await AsyncClient().post(
+            reverse("vote-create"), {"poll": str(poll.pk), "option": str(option.pk)}, REMOTE_ADDR="10.0.0.1",
+        )
+        if response.status_code != 201:
+            raise CommandError(f"vote answered {response.status_code}: {response.content!r}")
+        events = await asyncio.gather(*(connection.next_event() for connection in connections))
+        delivered = sum(event is not None and event.startswith(b"event: delta") for event in events)
+        self.stdout.write(f"vote reached {delivered}/{len(connections)} streams in {time.perf_counter() - started:.2f}s")
+
+        for connection in connections + failed:
+            connection.closed.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.stdout.write(f"subscriptions left after disconnect: {len(hub.subscribers.get(str(poll.pk), ()))}")
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from voteapp.models import Category, Poll, PollOption
+
+
+class Command(BaseCommand):
+    help = (
+        "Bytes saved and latency of conditional GETs (If-None-Match -> 304) compared "
+        "with full responses on the poll, results, category and list endpoints. "
+        "Runs against throwaway objects in the configured database and cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and mode")
+        parser.add_argument("--host", default="localhost", help="Host header, must be in ALLOWED_HOSTS")
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.order_by("pk").first()
+        if owner is None:
+            raise CommandError("Needs at least one user to own the benchmark objects.")
+        client = Client(HTTP_HOST=options["host"])
+        category = Category.objects.create(title="Revalidation benchmark", created_by=owner)
+        poll = Poll.objects.create(title="Revalidation benchmark", created_by=owner, category=category)
+        for n in range(4):
+            PollOption.objects.create(poll=poll, text=f"Option {n}", order=n)
+
+        endpoints = {
+            "poll detail": reverse("poll-detail", args=[poll.pk]),
+            "poll results": reverse("poll-results", args=[poll.pk]),
+            "poll list": reverse("poll-list-create"),
+            "category detail": reverse("category-detail", args=[category.pk]),
+            "category list": reverse("category-list-create"),
+        }
+        try:
+            self.stdout.write(f"{'endpoint':<16} {'200 ms':>8} {'304 ms':>8} {'200 bytes':>10} {'bytes saved':>12}")
+            for name, url in endpoints.items():
+                self.stdout.write(self.measure(client, name, url, options["requests"]))
+        finally:
+            poll.delete()
+            category.delete()
+
+    def measure(self, client, name, url, count):
+        first = client.get(url)
+        etag = first.headers.get("ETag")
+        if first.status_code != 200 or not etag:
+            raise CommandError(f"{url} returned {first.status_code} without a usable ETag")
+
+        full, revalidated = [], []
+        body = 0
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(url)
+            full.append(time.perf_counter() - started)
+            body = len(response.content)
+
+            started = time.perf_counter()
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            revalidated.append(time.perf_counter() - started)
+            if response.status_code != 304:
+                raise CommandError(f"{url} answered a matching If-None-Match with {response.status_code}")
+
+        return (
+            f"{name:<16} {statistics.median(full) * 1000:>8.2f} {statistics.median(revalidated) * 1000:>8.2f} "
+            f"{body:>10} {body * count:>12}"
+        )
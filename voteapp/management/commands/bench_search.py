@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework import filters
+from rest_framework.request import Request
+
+from voteapp import search
+from voteapp.models import Poll
+from voteapp.pagination import HybridResultsSetPagination
+from voteapp.views import PollListCreateView
+
+SYLLABLES = "ba be bi bo ka ke ki ko la le li lo ma me mi mo na ne ni no ra re ri ro sa se si so ta te ti to".split()
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of a poll search through the full-text index against the icontains "
+        "SearchFilter as the table grows. Seeds polls in the configured database inside "
+        "a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Comma-separated table sizes to measure at")
+        parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct words in the seeded text")
+        parser.add_argument("--query", help="Search string (terms match as prefixes); "
+                                            "defaults to a word of middling frequency")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Search backend: {search.backend()}")
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        owner = get_user_model().objects.create_user(email="search-bench@example.com", password=None)
+        rng = random.Random(0)
+        words = vocabulary(rng, options["vocabulary"])
+        # Zipf-like word frequencies, as in natural text
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        query = options["query"] or words[len(words) // 50]
+        self.stdout.write(f"Query: {query!r}")
+        view = PollListCreateView()
+        factory = RequestFactory()
+        backends = [("full-text", search.PollSearchFilter()), ("icontains", filters.SearchFilter())]
+        seeded = 0
+
+        for size in sorted(int(n) for n in options["sizes"].split(",")):
+            while seeded < size:
+                batch = min(options["batch_size"], size - seeded)
+                Poll.objects.bulk_create(
+                    Poll(
+                        title=" ".join(rng.choices(words, weights, k=4)),
+                        description=" ".join(rng.choices(words, weights, k=20)),
+                        created_by=owner,
+                    )
+                    for _ in range(batch)
+                )
+                seeded += batch
+            # bulk_create skips the save signals that keep FTS5 current
+            search.rebuild_index()
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Poll._meta.db_table}")
+
+            for name, backend in backends:
+                timings = []
+                for _ in range(options["repeat"]):
+                    request = Request(factory.get("/api/p/polls/", {"search": query}))
+                    started = time.perf_counter()
+                    queryset = backend.filter_queryset(request, view.queryset, view)
+                    # The first page with its total, as the list view reads it
+                    rows = HybridResultsSetPagination().paginate_queryset(queryset, request)
+                    timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{size:>9} polls, {name:>9}: {statistics.median(timings) * 1000:9.2f} ms ({len(rows)} rows)"
+                )
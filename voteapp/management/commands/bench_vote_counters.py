@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+
+from voteapp.counters import increment_vote_counts
+from voteapp.models import Poll, PollOption
+
+
+class Command(BaseCommand):
+    help = (
+        "Vote counter increments per second on one hot option, from concurrent writers each "
+        "committing its own transactions, for several VOTE_COUNTER_SHARDS values. "
+        "Measures row-lock contention, so run it against PostgreSQL: SQLite locks the whole "
+        "database per write whatever the shard count. Seeds a poll, commits it (the writers use "
+        "their own connections) and deletes it at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument("--increments", type=int, default=200, help="Per writer")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"database: {connection.vendor}, {options['writers']} writers")
+        owner = get_user_model().objects.create_user(email="counter-bench@example.com", password=None)
+        try:
+            poll = Poll.objects.create(title="Counter benchmark", created_by=owner)
+            for shards in options["shards"]:
+                option = PollOption.objects.create(poll=poll, text=f"{shards} shards", order=shards)
+                with override_settings(VOTE_COUNTER_SHARDS=shards):
+                    elapsed = self.run(option, options["writers"], options["increments"])
+                total = options["writers"] * options["increments"]
+                counted = PollOption.objects.with_live_counts().get(pk=option.pk).live_vote_count
+                self.stdout.write(
+                    f"{shards:>3} shards: {total / elapsed:8.0f} increments/s"
+                    + ("" if counted == total else f" (counted {counted} of {total})")
+                )
+        finally:
+            Poll.objects.filter(created_by=owner).delete()
+            owner.delete()
+
+    @staticmethod
+    def run(option, writers, increments):
+        def write(_):
+            try:
+                for _ in range(increments):
+                    with transaction.atomic():
+                        increment_vote_counts({option.pk: 1})
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(writers) as pool:
+            list(pool.map(write, range(writers)))
+        return time.perf_counter() - started
@@ -0,0 +1,115 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from voteapp import vote_buffer
+from voteapp.cache_utils import get_redis, redis_key
+from voteapp.models import Poll, PollOption, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Votes per second and POST latency of the vote endpoint with VOTE_INGESTION_MODE "
+        "'sync' (insert and counter update per request) and 'buffered' (XADD to the vote "
+        "stream, 202), then how fast vote_buffer.flush() drains the buffered votes into the "
+        "database. Each vote comes from its own IP, from concurrent clients. The scheduled "
+        "flush task is held off while votes are buffered so the flush is timed on its own; "
+        "stop any Celery worker flushing the same stream. Buffered mode needs django-redis. "
+        "Seeds polls, commits them (the clients use their own database connections) and "
+        "deletes them at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votes", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--options", type=int, default=4)
+
+    def handle(self, *args, **options):
+        conn = get_redis()
+        if conn is None:
+            self.stdout.write("no django-redis: only sync ingestion is timed")
+        self.stdout.write(f"database: {connection.vendor}, {options['concurrency']} clients")
+        owner = get_user_model().objects.create_user(email="ingestion-bench@example.com", password=None)
+        try:
+            for mode in ["sync", "buffered"] if conn is not None else ["sync"]:
+                poll = Poll.objects.create(title=f"Ingestion benchmark ({mode})", created_by=owner)
+                choices = PollOption.objects.bulk_create(
+                    PollOption(poll=poll, text=f"Option {n}", order=n) for n in range(options["options"])
+                )
+                votes = [
+                    {"poll": str(poll.pk), "option": str(choices[n % len(choices)].pk),
+                     "ip": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"}
+                    for n in range(options["votes"])
+                ]
+                with override_settings(VOTE_INGESTION_MODE=mode):
+                    if mode == "buffered":
+                        self.run_buffered(conn, poll, votes, options["concurrency"])
+                    else:
+                        self.report(mode, *self.post(votes, options["concurrency"], 201))
+                stored = Vote.objects.filter(poll=poll).count()
+                if stored != len(votes):
+                    self.stdout.write(f"  {stored} of {len(votes)} votes stored")
+        finally:
+            Poll.objects.filter(created_by=owner).delete()
+            owner.delete()
+
+    def run_buffered(self, conn, poll, votes, concurrency):
+        scheduled = redis_key("vote_buffer", "scheduled")
+        if conn.xlen(redis_key("vote_buffer", "stream")):
+            raise CommandError("The vote buffer is not empty: flush it before benchmarking.")
+        # schedule_flush() only queues a task when this key is missing
+        conn.set(scheduled, 1, ex=3600)
+        try:
+            self.report("buffered", *self.post(votes, concurrency, 202))
+            started = time.perf_counter()
+            flushed = vote_buffer.flush()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"   flush: {flushed / elapsed:8.0f} votes/s, {flushed} votes in {elapsed:.2f}s "
+                f"(batches of {settings.VOTE_BUFFER['BATCH_SIZE']})"
+            )
+        finally:
+            conn.delete(scheduled, redis_key("vote_buffer", "voters", poll.pk))
+
+    @staticmethod
+    def post(votes, concurrency, expected):
+        local = threading.local()
+
+        def vote(data):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.post(
+                reverse("vote-create"), {"poll": data["poll"], "option": data["option"]},
+                content_type="application/json", REMOTE_ADDR=data["ip"],
+            )
+            if response.status_code != expected:
+                raise CommandError(f"vote answered {response.status_code}: {response.content!r}")
+            return time.perf_counter() - started
+
+        def run(chunk):
+            try:
+                return [vote(data) for data in chunk]
+            finally:
+                connection.close()
+
+        chunks = [votes[n::concurrency] for n in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = [latency for chunk in pool.map(run, chunks) for latency in chunk]
+        return time.perf_counter() - started, latencies
+
+    def report(self, mode, elapsed, latencies):
+        latencies.sort()
+        self.stdout.write(
+            f"{mode:>8}: {len(latencies) / elapsed:8.0f} votes/s, p50 {statistics.median(latencies) * 1000:7.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} ms"
+        )
@@ -0,0 +1,98 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from voteapp.models import Poll, PollOption
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests per second and latency of the poll list, detail and results GETs through "
+        "Django's WSGI handler, one thread per concurrent request as under gunicorn's gthread "
+        "workers, and through its ASGI handler, coroutines on one event loop as under the "
+        "uvicorn worker, at the same concurrency. Lists middleware that would put every ASGI "
+        "request through a thread hop. Seeds polls, commits them (the worker threads use "
+        "their own database connections) and deletes them at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=600)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--polls", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sync_only = [path for path in settings.MIDDLEWARE if not getattr(import_string(path), "async_capable", False)]
+        self.stdout.write(f"sync-only middleware: {', '.join(sync_only) or 'none'}")
+        if not settings.ASYNC_READ_VIEWS:
+            self.stdout.write("ASYNC_READ_VIEWS is off: both handlers serve the DRF views")
+
+        owner = get_user_model().objects.create_user(email="wsgi-asgi-bench@example.com", password=None)
+        try:
+            polls = Poll.objects.bulk_create(
+                Poll(title=f"Benchmark poll {n}", created_by=owner) for n in range(options["polls"])
+            )
+            PollOption.objects.bulk_create(
+                PollOption(poll=poll, text=f"Option {n}", order=n, vote_count=n) for poll in polls for n in range(4)
+            )
+            urls = [reverse("poll-list-create")]
+            for poll in polls:
+                urls += [reverse("poll-detail", args=[poll.pk]), reverse("poll-results", args=[poll.pk])]
+            paths = [urls[n % len(urls)] for n in range(options["requests"])]
+
+            for name, run in [("WSGI", self.run_wsgi), ("ASGI", self.run_asgi)]:
+                cache.clear()
+                run(urls, options["concurrency"])  # warm caches and connections
+                elapsed, latencies = run(paths, options["concurrency"])
+                latencies.sort()
+                self.stdout.write(
+                    f"{name}: {len(paths) / elapsed:8.0f} req/s, p50 {statistics.median(latencies) * 1000:7.2f} ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} ms "
+                    f"(concurrency {options['concurrency']})"
+                )
+        finally:
+            Poll.objects.filter(created_by=owner).delete()
+            owner.delete()
+
+    @staticmethod
+    def run_wsgi(paths, concurrency):
+        local = threading.local()
+
+        def get(path):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            assert local.client.get(path).status_code == 200
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(get, paths))
+        return time.perf_counter() - started, latencies
+
+    @staticmethod
+    def run_asgi(paths, concurrency):
+        async def run():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def get(path):
+                async with slots:
+                    started = time.perf_counter()
+                    assert (await client.get(path)).status_code == 200
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(get(path) for path in paths))
+            return time.perf_counter() - started, list(latencies)
+
+        return asyncio.run(run())
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from voteapp import rollups
+from voteapp.cache_utils import get_redis
+from voteapp.models import Campaign
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild campaign stats rollups from the votes table, e.g. after polls moved between "
+        "campaigns or Redis lost writes. Rollups are otherwise rebuilt on their first read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--campaign", action="append", default=[], help="Campaign id; repeat for several")
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            self.stdout.write("Nothing to rebuild: campaign stats are read from the database without Redis")
+            return
+        campaign_ids = options["campaign"] or Campaign.objects.values_list("id", flat=True).iterator()
+        rebuilt = 0
+        for campaign_id in campaign_ids:
+            rollups.rebuild(campaign_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} campaign rollups"))
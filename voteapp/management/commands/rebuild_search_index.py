@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from voteapp import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-fill the SQLite FTS5 poll search table, e.g. after bulk writes that bypass "
+        "the save signals. PostgreSQL maintains its search vector itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if search.backend(using) != "fts5":
+            self.stdout.write(f"Nothing to rebuild: search backend is {search.backend(using)}")
+            return
+        indexed = search.rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} polls"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from voteapp import membership
+from voteapp.cache_utils import get_redis
+
+
+class Command(BaseCommand):
+    help = (
+        "How the per-poll voter sets answered duplicate-vote checks since the last reset: "
+        "database queries avoided (definite \"not voted\" answers), the false-positive rate "
+        "of \"maybe\" answers the database did not confirm, and lookups that found a cold set "
+        "and went to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Start counting again after reporting")
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            self.stdout.write("No voter sets without django-redis: every check goes to the database")
+            return
+        stats = membership.stats()
+        lookups = stats["lookups"]
+
+        def share(n):
+            return f"{n:>8} ({n / lookups:6.1%})" if lookups else f"{n:>8}"
+
+        self.stdout.write(f"lookups:            {lookups:>8}")
+        self.stdout.write(f"db queries avoided: {share(stats['db_queries_avoided'])}")
+        self.stdout.write(f"maybe:              {share(stats['maybe'])}, {stats['confirmed']} confirmed, "
+                          f"false-positive rate {stats['false_positive_rate']:.2%}")
+        self.stdout.write(f"cold set (unknown): {share(stats['unknown'])}")
+        if lookups and stats["unknown"] > lookups / 2:
+            self.stdout.write(self.style.WARNING(
+                "Most lookups found a cold set: check that a worker runs voteapp.warm_voter_set"))
+        if options["reset"]:
+            membership.reset_stats()
@@ -0,0 +1,144 @@
+"""
+Per-poll voter membership sets.
+
+A Redis set per poll holds a key for every voter ("user:<id>" or
+"ip:<addr>") plus a WARM marker once it has been filled from the votes
+table. For a warm set, "not a member" means the voter has definitely not
+voted, so the duplicate check needs no database round trip. Members are
+only "maybe": the vote could have been rolled back, so the database
+has the final say. Sets are filled by the warm_voter_set task, updated as
+votes commit and dropped when the poll is deleted. Keeping the marker
+inside the set means it expires together with the members.
+"""
+import logging
+
+from django.conf import settings
+
+from .cache_utils import get_redis, redis_key
+from .models import Vote
+
+NOT_VOTED = "not_voted"
+MAYBE = "maybe"
+UNKNOWN = "unknown"
+
+WARM = "__warm__"
+
+logger = logging.getLogger('voteapp')
+
+
+def set_key(poll_id):
+    return redis_key("voters", poll_id)
+
+
+def _stats_key():
+    return redis_key("voters", "stats")
+
+
+def voter_key(user=None, ip=None):
+    return f"user:{user.pk}" if user else f"ip:{ip}"
+
+
+def check(poll_id, member):
+    """NOT_VOTED, MAYBE or UNKNOWN (set missing or still warming)"""
+    conn = get_redis()
+    if conn is None:
+        return UNKNOWN
+    warm, present = conn.smismember(set_key(poll_id), [WARM, member])
+    if not warm:
+        schedule_warm(conn, poll_id)
+        result = UNKNOWN
+    else:
+        result = MAYBE if present else NOT_VOTED
+    conn.hincrby(_stats_key(), result, 1)
+    return result
+
+
+def record_confirmed_duplicate():
+    """A MAYBE answer that the database confirmed"""
+    conn = get_redis()
+    if conn is not None:
+        conn.hincrby(_stats_key(), "confirmed", 1)
+
+
+def add_votes(votes):
+    conn = get_redis()
+    if conn is None:
+        return
+    pipe = conn.pipeline()
+    for vote in votes:
+        if vote.voter_user_id or vote.voter_ip:
+            key = set_key(vote.poll_id)
+            member = f"user:{vote.voter_user_id}" if vote.voter_user_id else f"ip:{vote.voter_ip}"
+            pipe.sadd(key, member)
+            pipe.expire(key, settings.VOTER_SET_TTL)
+    pipe.execute()
+
+
+def _queued_key(poll_id):
+    return redis_key("voters", poll_id, "queued")
+
+
+def schedule_warm(conn, poll_id):
+    from .tasks import warm_voter_set
+
+    if conn.set(redis_key("voters", poll_id, "warming"), 1, nx=True, ex=60):
+        # warm() clears the marker: still there, the last warm-up never ran
+        if not conn.set(_queued_key(poll_id), 1, nx=True, ex=settings.VOTER_SET_TTL):
+            logger.warning(f"Voter set of poll {poll_id} still cold a minute after its warm-up was queued: "
+                           f"is a worker running warm_voter_set?")
+        try:
+            warm_voter_set.delay(str(poll_id))
+        except Exception as e:
+            # Votes still go through the database check meanwhile; retried after the lock expires
+            logger.warning(f"Could not schedule voter set warm-up for poll {poll_id}: {e}")
+
+
+def warm(poll_id, chunk_size=5000):
+    """Fill a poll's set from the votes table, then mark it warm"""
+    conn = get_redis()
+    key = set_key(poll_id)
+    rows = Vote.objects.filter(poll_id=poll_id).values_list("voter_user_id", "voter_ip")
+    pipe = conn.pipeline()
+    for n, (user_id, ip) in enumerate(rows.iterator(chunk_size=chunk_size), 1):
+        if user_id or ip:
+            pipe.sadd(key, f"user:{user_id}" if user_id else f"ip:{ip}")
+        if n % chunk_size == 0:
+            pipe.execute()
+    # Votes committed meanwhile were added by their votes_recorded handler
+    pipe.sadd(key, WARM)
+    pipe.expire(key, settings.VOTER_SET_TTL)
+    pipe.delete(_queued_key(poll_id))
+    pipe.execute()
+
+
+def forget(poll_id):
+    conn = get_redis()
+    if conn is not None:
+        conn.delete(set_key(poll_id), _queued_key(poll_id))
+
+
+def stats():
+    """
+    Lookup outcomes since the last reset_stats(), reported by
+    ``manage.py voter_set_stats``. ``db_queries_avoided`` counts NOT_VOTED
+    answers; ``false_positive_rate`` is the share of MAYBE answers the
+    database did not confirm; ``unknown`` lookups found a cold set.
+    """
+    conn = get_redis()
+    raw = {k.decode(): int(v) for k, v in conn.hgetall(_stats_key()).items()} if conn else {}
+    maybe = raw.get(MAYBE, 0)
+    confirmed = raw.get("confirmed", 0)
+    return {
+        "lookups": sum(raw.get(result, 0) for result in (NOT_VOTED, MAYBE, UNKNOWN)),
+        "db_queries_avoided": raw.get(NOT_VOTED, 0),
+        "maybe": maybe,
+        "confirmed": confirmed,
+        "unknown": raw.get(UNKNOWN, 0),
+        "false_positive_rate": round((maybe - confirmed) / maybe, 4) if maybe else 0.0,
+    }
+
+
+def reset_stats():
+    conn = get_redis()
+    if conn is not None:
+        conn.delete(_stats_key())
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voteapp', '0002_alter_campaign_options_alter_category_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollOptionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='voteapp.polloption')),
+            ],
+            options={
+                'db_table': 'poll_option_counters',
+                'unique_together': {('option', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voteapp', '0003_polloptioncounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['-created_at', '-id'], name='voteapp_cam_created_4c36ca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['-created_at', '-id'], name='voteapp_cat_created_d88c14_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['-created_at', '-id'], name='polls_created_bd668c_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='poll',
+            name='polls_created_5313cc_idx',
+        ),
+    ]
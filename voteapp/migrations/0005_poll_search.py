@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# Weighted title/description vector kept by PostgreSQL itself; see voteapp/search.py
+POSTGRES_FORWARDS = [
+    """
+    ALTER TABLE polls ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX polls_search_vector_gin ON polls USING gin (search_vector)",
+]
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS polls_search_vector_gin",
+    "ALTER TABLE polls DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARDS = [
+    # prefix indexes make "term"* queries of 2-4 characters index lookups
+    """
+    CREATE VIRTUAL TABLE polls_fts USING fts5(
+        poll_id UNINDEXED, title, description, tokenize = 'porter unicode61', prefix = '2 3 4'
+    )
+    """,
+]
+SQLITE_BACKWARDS = ["DROP TABLE IF EXISTS polls_fts"]
+
+
+def fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_FORWARDS:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'sqlite' and fts5_available(connection):
+        for sql in SQLITE_FORWARDS:
+            schema_editor.execute(sql)
+        Poll = apps.get_model('voteapp', 'Poll')
+        rows = [
+            (poll_id.int >> 65, poll_id.hex, title, description)
+            for poll_id, title, description in Poll.objects.values_list('id', 'title', 'description')
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO polls_fts (rowid, poll_id, title, description) VALUES (%s, %s, %s, %s)", rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARDS:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_BACKWARDS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voteapp', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:11
+
+import voteapp.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voteapp', '0006_vote_voted_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollSearchEntry',
+            fields=[
+                ('rowid', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('document', voteapp.models.SearchDocumentField(db_column='polls_fts')),
+            ],
+            options={
+                'db_table': 'polls_fts',
+                'managed': False,
+            },
+        ),
+    ]
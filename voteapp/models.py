@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.conf import settings
@@ -14,6 +16,7 @@ class Category(models.Model):
     class Meta:
         unique_together = ("created_by", "title")
         ordering = ["title"]
+        indexes = [models.Index(fields=['-created_at', '-id'])]
 
     def __str__(self):
         return self.title
@@ -30,6 +33,7 @@ class Campaign(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=['-created_at', '-id'])]
 
     def __str__(self):
         return self.title
@@ -49,7 +53,8 @@ class Poll(models.Model):
     class Meta:
         db_table = 'polls'
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['-created_at']), models.Index(fields=['is_active', 'expires_at'])]
+        # (-created_at, -id) also serves plain -created_at ordering
+        indexes = [models.Index(fields=['-created_at', '-id']), models.Index(fields=['is_active', 'expires_at'])]
 
     def __str__(self):
         return self.title
@@ -65,9 +70,8 @@ class Poll(models.Model):
         return self.votes.count()
 
     def get_results(self):
-        from django.db.models import Count
-        results = self.options.annotate(vote_count=Count('votes')).values('id', 'text', 'vote_count')
-        total = sum(r['vote_count'] for r in results)
+        results = self.options.with_live_counts().values('id', 'text', 'live_vote_count')
+        total = sum(r['live_vote_count'] for r in results)
         return {
             'poll_id': str(self.id),
             'title': self.title,
@@ -76,12 +80,24 @@ class Poll(models.Model):
                 {
                     'id': r['id'],
                     'text': r['text'],
-                    'votes': r['vote_count'],
-                    'percentage': round((r['vote_count'] / total * 100), 2) if total > 0 else 0
+                    'votes': r['live_vote_count'],
+                    'percentage': round((r['live_vote_count'] / total * 100), 2) if total > 0 else 0
                 } for r in results
             ]
         }
 
+class PollOptionQuerySet(models.QuerySet):
+    def with_live_counts(self):
+        """Annotate live_vote_count: the compacted vote_count plus any unfolded counter shards"""
+        shard_total = (
+            PollOptionCounter.objects.filter(option=OuterRef('pk'))
+            .values('option')
+            .annotate(total=Sum('count'))
+            .values('total')
+        )
+        return self.annotate(live_vote_count=F('vote_count') + Coalesce(Subquery(shard_total), 0))
+
+
 class PollOption(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='options')
@@ -89,6 +105,8 @@ class PollOption(models.Model):
     order = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     vote_count = models.IntegerField(default=0)
 
+    objects = PollOptionQuerySet.as_manager()
+
     class Meta:
         db_table = 'poll_options'
         ordering = ['order', 'id']
@@ -96,7 +114,30 @@ class PollOption(models.Model):
         indexes = [models.Index(fields=['poll', 'order'])]
 
     def __str__(self):
-        return f"{self.poll.title} - {self.text}"
+        # Never load the poll just to print an option
+        poll = self.poll.title if PollOption.poll.is_cached(self) else self.poll_id
+        return f"{poll} - {self.text}"
+
+    @property
+    def total_vote_count(self):
+        if hasattr(self, 'live_vote_count'):
+            return self.live_vote_count
+        return self.vote_count + (self.counter_shards.aggregate(total=Sum('count'))['total'] or 0)
+
+
+class PollOptionCounter(models.Model):
+    """
+    One slot of a sharded vote counter. Votes bump a random slot so writers
+    on a hot option don't queue on a single row lock; compact_counters()
+    periodically folds the slots back into PollOption.vote_count.
+    """
+    option = models.ForeignKey(PollOption, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'poll_option_counters'
+        unique_together = ['option', 'shard']
 
 class Vote(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -104,7 +145,8 @@ class Vote(models.Model):
     option = models.ForeignKey(PollOption, on_delete=models.CASCADE, related_name='votes')
     voter_ip = models.GenericIPAddressField(null=True, blank=True)
     voter_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='votes')
-    voted_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: buffered votes keep the time they were accepted at
+    voted_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = 'votes'
@@ -120,7 +162,8 @@ class Vote(models.Model):
         ]
 
     def __str__(self):
-        return f"Vote for {self.option.text}"
+        option = self.option.text if Vote.option.is_cached(self) else self.option_id
+        return f"Vote for {option}"
 
     @classmethod
     def has_voted(cls, poll, voter_ip=None, voter_user=None):
@@ -131,6 +174,40 @@ class Vote(models.Model):
             return qs.filter(voter_ip=voter_ip).exists()
         return False
 
+class SearchDocumentField(models.TextField):
+    """
+    The hidden column an FTS5 table shares its name with: MATCH against it
+    searches every indexed column, and ranking functions take it.
+    """
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class PollSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 index of poll titles and descriptions, which
+    migration 0005 creates where FTS5 is available (see search.py). Only
+    read through the ORM: search.py writes it with raw SQL.
+    """
+    rowid = models.BigIntegerField(primary_key=True)
+    poll = models.OneToOneField(Poll, on_delete=models.DO_NOTHING, db_constraint=False, related_name='search_entry')
+    title = models.TextField()
+    description = models.TextField()
+    document = SearchDocumentField(db_column='polls_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'polls_fts'
+
+
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name="comments")
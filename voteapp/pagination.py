@@ -1,15 +1,109 @@
-from rest_framework.pagination import PageNumberPagination
+import math
+
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
+from .row_counts import count_rows
+
+
+class ApproximatePage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator whose total comes from count_source(queryset) -> (count, exact),
+    with count None when it was not asked for. Unless the count is exact,
+    pages fetch one extra row to tell whether there is a next page, so an
+    estimated or missing total never truncates or invents pages.
+    """
+
+    def __init__(self, object_list, per_page, count_source=count_rows, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_source = count_source
+        self.count_exact = True
+
+    @cached_property
+    def count(self):
+        count, self.count_exact = self.count_source(self.object_list)
+        return count
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        if self.count_exact:
+            return super().num_pages
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def validate_number(self, number):
+        if self.count is not None and self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count is not None and self.count_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return ApproximatePage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
 
 class StandardResultsSetPagination(PageNumberPagination):
+    """
+    count and total_pages come from row_counts.count_rows: a cached counter
+    for unfiltered lists, a planner estimate for large filtered ones (both
+    count_exact: false), an exact COUNT(*) otherwise. ?count=false leaves
+    them out (null) and skips counting altogether.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    django_paginator_class = ApproximateCountPaginator
+    count_query_param = 'count'
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('false', '0', 'no', 'off')
+
+    def get_paginator(self, queryset, request):
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        if not self.wants_count(request):
+            paginator.count_source = lambda queryset: (None, False)
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if not self.get_page_size(request):
+            return None
+        paginator = self.get_paginator(queryset, request)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        return list(self.page)
 
     def get_paginated_response(self, data):
         return Response({
             'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'total_pages': self.page.paginator.num_pages,
@@ -18,7 +112,53 @@ class StandardResultsSetPagination(PageNumberPagination):
         })
 
 
+class BatchResultsPagination(StandardResultsSetPagination):
+    page_size = 50
+    max_page_size = 100
+
+
 class LargeResultsSetPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
-    max_page_size = 200
\ No newline at end of file
+    max_page_size = 200
+
+class KeysetResultsSetPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class CursorModeMixin:
+    """
+    Opt-in keyset pagination for a page-number paginator.
+    ?pagination=cursor (and the cursor links it returns) switches a request
+    to cursor pagination on (-created_at, -id), which needs no COUNT(*) and
+    no OFFSET scan, so deep pages cost the same as the first one. Cursor
+    responses carry next, previous and results only; without the param the
+    page-number format is unchanged.
+    """
+    mode_query_param = 'pagination'
+    cursor_class = KeysetResultsSetPagination
+    cursor_query_param = cursor_class.cursor_query_param
+    cursor_paginator = None
+
+    def use_cursor(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class HybridResultsSetPagination(CursorModeMixin, StandardResultsSetPagination):
+    pass
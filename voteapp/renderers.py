@@ -0,0 +1,36 @@
+"""
+JSON rendering through orjson, when FAST_READ_PATH['RENDERER'] is on and
+orjson is installed; DRF's JSONRenderer otherwise.
+
+The bytes are the same as JSONRenderer's compact output: orjson writes
+UTF-8 without spaces, values it doesn't handle the DRF way (datetimes,
+Decimals, lazy strings...) are passed to DRF's JSONEncoder, and U+2028 /
+U+2029 are escaped like DRF does. Indented (browsable or ?indent) and
+ASCII-only output stay with JSONRenderer. One difference: NaN and
+infinities are written as null where strict JSONRenderer raises.
+"""
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def fast_json_enabled():
+    return orjson is not None and settings.FAST_READ_PATH['RENDERER']
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (not fast_json_enabled() or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=self.encoder_class().default,
+                           option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        # Line separators are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,375 @@
+"""
+Campaign result rollups in Redis.
+
+Each campaign has four keys, bumped as votes commit: a hash with the total
+votes and the time of the last one, a sorted set of votes per poll, a hash
+of votes per day (UTC) and a HyperLogLog of voters ("user:<id>" or
+"ip:<addr>", as in membership.py). campaign_stats() reads them with one
+pipeline plus one query for the titles of the top polls, so its cost does
+not depend on the number of polls or votes in the campaign; unique voters
+are approximate (HyperLogLog, about 1% off).
+
+Missing rollups are rebuilt from the votes table, three queries that grow
+with the campaign, by the voteapp.rebuild_campaign_rollup task: reads never
+scan votes, a cold rollup reads as ``{"pending": true}`` until the task is
+done. A task no worker has run within PENDING_TIMEOUT (or that could not
+be queued) is done by the next read instead, by one request at a time.
+Votes only bump rollups that exist, so a rollup never holds part of its
+campaign's votes.
+
+Every vote also bumps a per-campaign sequence, rollup or not. A rebuild
+reads it before the scan and only writes if it hasn't moved (WATCH), so
+votes recorded in between are neither missed nor overwritten; it scans
+again instead. The database stays the source of truth: a deleted poll
+drops its campaign's rollup, but polls moved to another campaign leave it
+off until the next rebuild (`manage.py rebuild_campaign_rollups`). Without
+Redis the same stats are computed from the database on every read.
+"""
+import datetime
+import logging
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from redis.exceptions import WatchError
+
+from .cache_utils import get_redis, redis_key, single_flight
+from .models import Poll, Vote
+
+# KEYS: summary, polls, days, voters, sequence; ARGV: ttl, votes, last vote
+# time, number of polls, (poll, votes)..., number of days, (day, votes)...,
+# voters... Only bumps rollups that exist: a partial rollup would read as
+# complete stats
+RECORD_VOTES = """
+redis.call('INCR', KEYS[5])
+redis.call('EXPIRE', KEYS[5], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'total', ARGV[2])
+local last = tonumber(redis.call('HGET', KEYS[1], 'last_vote_at')) or 0
+if tonumber(ARGV[3]) > last then
+    redis.call('HSET', KEYS[1], 'last_vote_at', ARGV[3])
+end
+local i = 4
+for _ = 1, tonumber(ARGV[i]) do
+    redis.call('ZINCRBY', KEYS[2], ARGV[i + 2], ARGV[i + 1])
+    i = i + 2
+end
+i = i + 1
+for _ = 1, tonumber(ARGV[i]) do
+    redis.call('HINCRBY', KEYS[3], ARGV[i + 1], ARGV[i + 2])
+    i = i + 2
+end
+i = i + 1
+while i <= #ARGV do
+    local j = math.min(i + 999, #ARGV)
+    redis.call('PFADD', KEYS[4], unpack(ARGV, i, j))
+    i = j + 1
+end
+for i = 1, 4 do
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+return 1
+"""
+
+_PFADD_BATCH = 1000
+
+# Scans of the database a rebuild makes before it writes regardless
+REBUILD_ATTEMPTS = 3
+
+logger = logging.getLogger('voteapp')
+
+
+def _keys(campaign_id):
+    """summary, polls, days and voters keys of a campaign"""
+    return [redis_key("rollup", campaign_id, part) for part in ("summary", "polls", "days", "voters")]
+
+
+def _sequence_key(campaign_id):
+    return redis_key("rollup_seq", campaign_id)
+
+
+def stats_requested(request):
+    """Whether the request asked for ?include=stats"""
+    return "stats" in request.query_params.get("include", "").split(",")
+
+
+def _voter(user_id, ip):
+    if user_id or ip:
+        return f"user:{user_id}" if user_id else f"ip:{ip}"
+    return None
+
+
+def _day(moment):
+    return moment.astimezone(datetime.timezone.utc).date().isoformat()
+
+
+def _scan(campaign_id, since=None):
+    """
+    A campaign's rollup from its votes: {total, last_vote_at, polls: {poll_id:
+    (title, votes)}, days: {date: votes}} plus its voters, as an iterator.
+    ``since`` limits the days to that date onwards.
+    """
+    votes = Vote.objects.filter(poll__campaign_id=campaign_id).order_by()
+    polls, last_vote_at = {}, None
+    rows = votes.values_list('poll_id', 'poll__title').annotate(n=Count('id'), last=Max('voted_at'))
+    for poll_id, title, n, last in rows:
+        polls[str(poll_id)] = (title, n)
+        last_vote_at = last if last_vote_at is None else max(last_vote_at, last)
+    days = votes.filter(voted_at__date__gte=since) if since is not None else votes
+    days = days.annotate(day=TruncDate('voted_at', tzinfo=datetime.timezone.utc)).values_list('day')
+    voters = votes.exclude(voter_user=None, voter_ip=None).values_list('voter_user_id', 'voter_ip').distinct()
+    return {
+        'total': sum(n for _, n in polls.values()),
+        'last_vote_at': last_vote_at.timestamp() if last_vote_at else None,
+        'polls': polls,
+        'days': {day.isoformat(): n for day, n in days.annotate(n=Count('id'))},
+    }, voters
+
+
+def rebuild(campaign_id, conn=None):
+    """
+    Reload a campaign's rollup from the database; returns its total votes.
+    A vote recorded during the scan makes it scan again; the last attempt
+    is written regardless.
+    """
+    conn = conn or get_redis()
+    for attempt in range(1, REBUILD_ATTEMPTS + 1):
+        sequence = conn.get(_sequence_key(campaign_id)) if conn is not None else None
+        scan, voters = _scan(campaign_id)
+        if conn is None:
+            return scan['total']
+        if _store(conn, campaign_id, scan, voters, sequence, check=attempt < REBUILD_ATTEMPTS):
+            break
+    return scan['total']
+
+
+def _store(conn, campaign_id, scan, voters, sequence, check=True):
+    """Write a scanned rollup unless a vote was recorded since ``sequence`` was read; returns whether it did"""
+    summary, polls, days, voters_key = keys = _keys(campaign_id)
+    ttl = settings.CAMPAIGN_ROLLUP['TTL']
+    batches, batch = [], []
+    for user_id, ip in voters.iterator(_PFADD_BATCH):
+        batch.append(_voter(user_id, ip))
+        if len(batch) == _PFADD_BATCH:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+
+    with conn.pipeline(transaction=True) as pipe:
+        try:
+            if check:
+                pipe.watch(_sequence_key(campaign_id))
+                if pipe.get(_sequence_key(campaign_id)) != sequence:
+                    return False
+                pipe.multi()
+            pipe.delete(*keys)
+            pipe.hset(summary, mapping={
+                'total': scan['total'],
+                'last_vote_at': scan['last_vote_at'] or 0,
+                'built_at': time.time(),
+            })
+            if scan['polls']:
+                pipe.zadd(polls, {poll_id: n for poll_id, (_, n) in scan['polls'].items()})
+            if scan['days']:
+                pipe.hset(days, mapping=scan['days'])
+            for batch in batches:
+                pipe.pfadd(voters_key, *batch)
+            for key in keys:
+                pipe.expire(key, ttl)
+            pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+def _read(campaign_id, conn):
+    """The raw rollup of a campaign, or None if it is not built"""
+    summary, polls, days, voters = _keys(campaign_id)
+    conf = settings.CAMPAIGN_ROLLUP
+    dates = _last_days(conf['DAYS'])
+    pipe = conn.pipeline(transaction=False)
+    pipe.hgetall(summary)
+    pipe.zrevrange(polls, 0, conf['TOP_POLLS'] - 1, withscores=True)
+    pipe.zcard(polls)
+    pipe.pfcount(voters)
+    pipe.hmget(days, dates)
+    totals, top, polls_with_votes, unique_voters, per_day = pipe.execute()
+    if not totals:
+        return None
+    return {
+        'total': int(totals[b'total']),
+        'last_vote_at': float(totals[b'last_vote_at']) or None,
+        'top': [(member.decode(), int(score)) for member, score in top],
+        'polls_with_votes': polls_with_votes,
+        'unique_voters': unique_voters,
+        'days': {date: int(n or 0) for date, n in zip(dates, per_day)},
+    }
+
+
+def _rebuilding_key(campaign_id):
+    return redis_key("rollup", campaign_id, "rebuilding")
+
+
+def schedule_rebuild(conn, campaign_id):
+    """
+    Queue one rebuild task per campaign; another is queued if it hasn't
+    finished within REBUILD_TIMEOUT. Returns when the queued task was
+    queued, or None if it could not be.
+    """
+    from .tasks import rebuild_campaign_rollup
+
+    now = time.time()
+    if conn.set(_rebuilding_key(campaign_id), now, nx=True, ex=settings.CAMPAIGN_ROLLUP['REBUILD_TIMEOUT']):
+        try:
+            rebuild_campaign_rollup.delay(str(campaign_id))
+        except Exception as e:
+            conn.delete(_rebuilding_key(campaign_id))
+            logger.warning(f"Could not schedule the rollup rebuild of campaign {campaign_id}: {e}")
+            return None
+        return now
+    queued_at = conn.get(_rebuilding_key(campaign_id))
+    # Gone meanwhile: the task just finished
+    return float(queued_at) if queued_at is not None else now
+
+
+def _rebuild_and_read(campaign_id, conn):
+    rebuild(campaign_id, conn)
+    return _read(campaign_id, conn)
+
+
+def rebuild_scheduled(campaign_id):
+    """rebuild() for the task queued by schedule_rebuild()"""
+    conn = get_redis()
+    try:
+        rebuild(campaign_id, conn)
+    finally:
+        conn.delete(_rebuilding_key(campaign_id))
+
+
+def _today():
+    return timezone.now().astimezone(datetime.timezone.utc).date()
+
+
+def _last_days(days):
+    today = _today()
+    return [(today - datetime.timedelta(days=n)).isoformat() for n in range(days - 1, -1, -1)]
+
+
+def _load_from_db(campaign_id):
+    """What _read() returns, computed from the votes table"""
+    conf = settings.CAMPAIGN_ROLLUP
+    dates = _last_days(conf['DAYS'])
+    scan, voters = _scan(campaign_id, since=datetime.date.fromisoformat(dates[0]))
+    # Same order as ZREVRANGE: most votes first, ties by poll id descending
+    top = sorted(scan['polls'].items(), key=lambda item: (item[1][1], item[0]), reverse=True)[:conf['TOP_POLLS']]
+    return {
+        'total': scan['total'],
+        'last_vote_at': scan['last_vote_at'],
+        'top': [(poll_id, n) for poll_id, (_, n) in top],
+        'titles': {poll_id: title for poll_id, (title, _) in top},
+        'polls_with_votes': len(scan['polls']),
+        'unique_voters': voters.count(),
+        'days': {date: scan['days'].get(date, 0) for date in dates},
+    }
+
+
+def campaign_stats(campaign_id):
+    """The ``stats`` block of a campaign detail"""
+    conn = get_redis()
+    if conn is None:
+        rollup = _load_from_db(campaign_id)
+    else:
+        rollup = _read(campaign_id, conn)
+        if rollup is None:
+            queued_at = schedule_rebuild(conn, campaign_id)
+            if queued_at is not None and time.time() - queued_at < settings.CAMPAIGN_ROLLUP['PENDING_TIMEOUT']:
+                return {'pending': True}
+            # No worker took the task: one request rebuilds it, the others wait for its rollup
+            rollup = single_flight(
+                redis_key("rollup", campaign_id, "inline"),
+                lambda: _rebuild_and_read(campaign_id, conn),
+                lambda: _read(campaign_id, conn),
+            )
+    titles = rollup.get('titles')
+    if titles is None:
+        titles = {str(poll_id): title for poll_id, title in
+                  Poll.objects.filter(pk__in=[poll_id for poll_id, _ in rollup['top']]).values_list('id', 'title')}
+    last_vote_at = rollup['last_vote_at']
+    return {
+        'pending': False,
+        'total_votes': rollup['total'],
+        'unique_voters': rollup['unique_voters'],
+        'polls_with_votes': rollup['polls_with_votes'],
+        'last_vote_at': (datetime.datetime.fromtimestamp(last_vote_at, datetime.timezone.utc).isoformat()
+                         if last_vote_at else None),
+        'top_polls': [
+            # a poll deleted since is left out until the rollup is rebuilt
+            {'poll_id': poll_id, 'title': titles[poll_id], 'votes': n}
+            for poll_id, n in rollup['top'] if poll_id in titles
+        ],
+        'votes_by_day': [{'date': date, 'votes': n} for date, n in rollup['days'].items()],
+    }
+
+
+def version(campaign_id):
+    """
+    Changes whenever a campaign's stats do: its total, last vote and build
+    time, and the UTC date that ends votes_by_day. None without Redis,
+    where there is no rollup to version.
+    """
+    conn = get_redis()
+    if conn is None:
+        return None
+    totals = conn.hmget(_keys(campaign_id)[0], ['total', 'last_vote_at', 'built_at'])
+    if totals[0] is None:
+        # campaign_stats() schedules the rebuild and answers pending
+        return f"{_today()}:pending"
+    return ":".join([_today().isoformat(), *(value.decode() for value in totals)])
+
+
+def record_votes(votes):
+    """Add committed votes to the rollups of their polls' campaigns"""
+    conn = get_redis()
+    if conn is None or not votes:
+        return
+    # Polls already loaded by the vote path save the lookup
+    polls = {vote.poll_id: vote.poll for vote in votes if Vote.poll.is_cached(vote)}
+    missing = {vote.poll_id for vote in votes} - set(polls)
+    if missing:
+        polls.update(Poll.objects.only('id', 'campaign_id').in_bulk(missing))
+
+    campaigns = defaultdict(list)
+    for vote in votes:
+        poll = polls.get(vote.poll_id)
+        if poll is not None and poll.campaign_id is not None:
+            campaigns[poll.campaign_id].append(vote)
+    if not campaigns:
+        return
+
+    script = conn.register_script(RECORD_VOTES)
+    pipe = conn.pipeline()
+    now = timezone.now()
+    for campaign_id, campaign_votes in campaigns.items():
+        per_poll = Counter(str(vote.poll_id) for vote in campaign_votes)
+        voted_at = [vote.voted_at or now for vote in campaign_votes]
+        per_day = Counter(_day(moment) for moment in voted_at)
+        voters = {_voter(vote.voter_user_id, vote.voter_ip) for vote in campaign_votes} - {None}
+        args = [settings.CAMPAIGN_ROLLUP['TTL'], len(campaign_votes), max(voted_at).timestamp(),
+                len(per_poll), *(item for pair in per_poll.items() for item in pair),
+                len(per_day), *(item for pair in per_day.items() for item in pair),
+                *voters]
+        script(keys=[*_keys(campaign_id), _sequence_key(campaign_id)], args=args, client=pipe)
+    pipe.execute()
+
+
+def forget(campaign_id):
+    """Drop a campaign's rollup, rebuilt on its next read"""
+    conn = get_redis()
+    if conn is not None and campaign_id is not None:
+        conn.delete(*_keys(campaign_id))
@@ -0,0 +1,63 @@
+"""
+Cheap totals for paginated lists.
+
+Unfiltered lists are counted from a per-table counter in the cache. It is
+filled with one COUNT(*) and then kept current by post_save/post_delete
+handlers (see signals.py) until it expires. Bulk inserts, QuerySet.delete()
+and an evicted-then-refilled counter racing a handler can leave it off
+until then, so it is reported as inexact, like the estimates. Filtered
+lists on PostgreSQL use the planner's row estimate when it is large, since
+exact counts of big filtered sets are the slow case. Everything else is
+counted exactly.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+def _table_key(model):
+    return f"row_count_{model._meta.label_lower}"
+
+
+def table_count(model):
+    """Number of rows in a model's table, served from the cache: exact when counted, then maintained"""
+    key = _table_key(model)
+    count = cache.get(key)
+    if count is None:
+        count = model._default_manager.count()
+        cache.add(key, count, settings.LIST_COUNTS['CACHE_TTL'])
+    return count
+
+
+def adjust(model, delta):
+    """Keep a cached table count current; a missing counter is recounted on its next read"""
+    try:
+        cache.incr(_table_key(model), delta)
+    except ValueError:
+        pass
+
+
+def estimate_count(queryset):
+    """The planner's row estimate for a queryset, or None when the database has none to offer"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(queryset):
+    """(count, exact) for a list queryset"""
+    if not queryset.query.where:
+        return table_count(queryset.model), False
+    estimate = estimate_count(queryset)
+    if estimate is not None and estimate >= settings.LIST_COUNTS['ESTIMATE_THRESHOLD']:
+        return estimate, False
+    return queryset.count(), True
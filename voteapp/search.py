@@ -0,0 +1,159 @@
+"""
+Full-text search over poll titles and descriptions.
+
+PostgreSQL keeps a weighted ``search_vector`` column on the polls table,
+generated from title (A) and description (B) and covered by a GIN index,
+so the database updates it on every write. SQLite (DEBUG) uses the FTS5
+table ``polls_fts`` (joined through the unmanaged PollSearchEntry model),
+updated from the Poll post_save/post_delete handlers; bulk writes skip
+those, so run ``manage.py rebuild_search_index`` after them. Both are
+created by migration 0005. Without either, search falls
+back to DRF's icontains SearchFilter.
+
+Every search term is matched as a prefix ("vot" finds "voting"), all terms
+must match, and results are ordered by relevance unless ?ordering is given.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Poll
+
+POSTGRES_CONFIG = 'english'
+FTS_TABLE = 'polls_fts'
+# bm25 column weights for poll_id (not indexed), title and description
+FTS_WEIGHTS = (0.0, 10.0, 5.0)
+
+_backends = {}
+
+
+class BM25(Func):
+    """FTS5's bm25() rank of the row a search matched, given the table's document column"""
+    function = 'bm25'
+    output_field = FloatField()
+
+
+def backend(using='default'):
+    """'postgresql', 'fts5' or None when the database has no search index"""
+    connection = connections[using]
+    key = (using, connection.settings_dict['NAME'])
+    if key not in _backends:
+        if connection.vendor == 'postgresql':
+            _backends[key] = 'postgresql'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backends[key] = 'fts5'
+        else:
+            _backends[key] = None
+    return _backends[key]
+
+
+def search_terms(text):
+    """Words of a search string, lowercased; punctuation never reaches the query parser"""
+    return re.findall(r"\w+", text.lower())
+
+
+def fts_rowid(poll_id):
+    """FTS5 rowid of a poll: 63 bits of its UUID, so updates and deletes are rowid lookups"""
+    return poll_id.int >> 65
+
+
+def search(queryset, terms):
+    """Polls matching every term as a prefix, annotated with search_rank (higher is better)"""
+    db = queryset.db
+    table = Poll._meta.db_table
+    if backend(db) == 'postgresql':
+        query = " & ".join(f"{term}:*" for term in terms)
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f"ts_rank_cd({table}.search_vector, to_tsquery(%s::regconfig, %s))",
+                (POSTGRES_CONFIG, query), output_field=FloatField(),
+            )
+        ).filter(
+            RawSQL(
+                f"{table}.search_vector @@ to_tsquery(%s::regconfig, %s)",
+                (POSTGRES_CONFIG, query), output_field=BooleanField(),
+            )
+        )
+    query = " ".join(f'"{term}"*' for term in terms)
+    return queryset.filter(search_entry__document__match=query).annotate(
+        # bm25() is lower for better matches
+        search_rank=-BM25(F('search_entry__document'), *(Value(weight) for weight in FTS_WEIGHTS))
+    )
+
+
+def index_poll(poll):
+    if backend(poll._state.db) != 'fts5':
+        return
+    with connections[poll._state.db].cursor() as cursor:
+        rowid = fts_rowid(poll.pk)
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, poll_id, title, description) VALUES (%s, %s, %s, %s)",
+            [rowid, poll.pk.hex, poll.title, poll.description],
+        )
+
+
+def index_new_polls(polls):
+    """index_poll() for freshly inserted polls (e.g. from bulk_create), one statement"""
+    polls = list(polls)
+    if not polls or backend(polls[0]._state.db) != 'fts5':
+        return
+    with connections[polls[0]._state.db].cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, poll_id, title, description) VALUES (%s, %s, %s, %s)",
+            [(fts_rowid(poll.pk), poll.pk.hex, poll.title, poll.description) for poll in polls],
+        )
+
+
+def unindex_poll(poll):
+    if backend(poll._state.db) != 'fts5':
+        return
+    with connections[poll._state.db].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [fts_rowid(poll.pk)])
+
+
+def rebuild_index(using='default', batch_size=2000):
+    """Re-fill the FTS5 table from the polls table; returns the number of polls indexed"""
+    if backend(using) != 'fts5':
+        return 0
+    indexed = 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        rows = Poll.objects.using(using).values_list('id', 'title', 'description').iterator(batch_size)
+        batch = []
+        for poll_id, title, description in rows:
+            batch.append((fts_rowid(poll_id), poll_id.hex, title, description))
+            if len(batch) == batch_size:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, poll_id, title, description) VALUES (%s, %s, %s, %s)", batch
+                )
+                indexed += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, poll_id, title, description) VALUES (%s, %s, %s, %s)", batch
+            )
+            indexed += len(batch)
+    return indexed
+
+
+class PollSearchFilter(filters.SearchFilter):
+    """
+    ?search= through the full-text index, ranked by relevance unless an
+    explicit ?ordering is given. Falls back to SearchFilter's icontains
+    lookups on databases without a search index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if backend(queryset.db) is None:
+            return super().filter_queryset(request, queryset, view)
+        terms = search_terms(" ".join(self.get_search_terms(request)))
+        if not terms:
+            return queryset
+        queryset = search(queryset, terms)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
@@ -1,12 +1,23 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Poll, PollOption, Vote, Category, Campaign, Comment
+from . import membership
+from .counters import increment_vote_counts
+from .fast_serializers import ValuesSerializer
+from .fieldsets import SparseFieldsetsSerializerMixin
+from .signals import polls_imported, votes_recorded
+from .vote_buffer import buffer_enabled, claim_voter, enqueue_vote
 
 class PollOptionSerializer(serializers.ModelSerializer):
+    vote_count = serializers.IntegerField(source="total_vote_count", read_only=True)
+
     class Meta:
         model = PollOption
         fields = ["id", "text", "order", "vote_count"]
 
-class PollSerializer(serializers.ModelSerializer):
+class PollSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     options = PollOptionSerializer(many=True, read_only=True)
     class Meta:
         model = Poll
@@ -14,13 +25,132 @@ class PollSerializer(serializers.ModelSerializer):
                   "category", "created_at", "expires_at", "is_active", 
                   "allow_multiple_votes", "options"]
 
+class FastPollOptionSerializer(ValuesSerializer):
+    serializer_class = PollOptionSerializer
+    extra_columns = {"vote_count": ["live_vote_count"]}
+
+    def represent_vote_count(self, row):
+        return row["live_vote_count"]
+
+class FastPollSerializer(ValuesSerializer):
+    """PollSerializer from .values() rows; options come from one query per batch"""
+    serializer_class = PollSerializer
+    extra_columns = {"options": ["id"]}
+
+    def prepare(self, rows):
+        self.options = {}
+        if self.names is not None and "options" not in self.names:
+            return
+        option_rows = list(
+            PollOption.objects.filter(poll_id__in=[row["id"] for row in rows]).with_live_counts()
+            .values("poll_id", *FastPollOptionSerializer.columns())
+        )
+        options = FastPollOptionSerializer(option_rows, many=True)
+        for row, data in zip(option_rows, options.data):
+            self.options.setdefault(row["poll_id"], []).append(data)
+
+    def represent_options(self, row):
+        return self.options.get(row["id"], [])
+
+class CreatePollOptionSerializer(serializers.ModelSerializer):
+    # Defaults to the option's position in the list
+    order = serializers.IntegerField(min_value=0, required=False)
+
+    class Meta:
+        model = PollOption
+        fields = ["id", "text", "order"]
+
+def new_options(poll, options):
+    """Unsaved PollOptions of a poll from validated option data"""
+    return [
+        PollOption(poll=poll, text=option["text"], order=option.get("order", position))
+        for position, option in enumerate(options)
+    ]
+
 class CreatePollSerializer(serializers.ModelSerializer):
+    options = CreatePollOptionSerializer(many=True, required=False)
+
     class Meta:
         model = Poll
         fields = ["title", "description", "campaign", "category", 
-                  "expires_at", "is_active", "allow_multiple_votes"]
+                  "expires_at", "is_active", "allow_multiple_votes", "options"]
+
+    def validate_options(self, options):
+        texts = [option["text"] for option in options]
+        if len(set(texts)) != len(texts):
+            raise serializers.ValidationError("Option texts must be unique within a poll.")
+        return options
+
+    def create(self, validated_data):
+        options = validated_data.pop("options", [])
+        # Nobody sees the poll before its options; post_save side effects run once, for the poll
+        with transaction.atomic():
+            poll = super().create(validated_data)
+            PollOption.objects.bulk_create(new_options(poll, options))
+        return poll
+
+class ImportPollSerializer(CreatePollSerializer):
+    # Checked once for the whole import (see CampaignPollImportSerializer) instead of a query per poll
+    category = serializers.UUIDField(required=False, allow_null=True)
+
+    class Meta(CreatePollSerializer.Meta):
+        fields = [name for name in CreatePollSerializer.Meta.fields if name != "campaign"]
+
+class CampaignPollImportSerializer(serializers.Serializer):
+    """
+    Many polls with their options for one campaign (context["campaign"]),
+    inserted with a bulk_create for the polls and one for the options in a
+    single transaction. Side effects run once, from polls_imported.
+    """
+    polls = ImportPollSerializer(many=True, allow_empty=False, max_length=settings.POLL_IMPORT["MAX_POLLS"])
+
+    def validate_polls(self, polls):
+        category_ids = {poll["category"] for poll in polls if poll.get("category")}
+        known = set(Category.objects.filter(pk__in=category_ids).values_list("pk", flat=True))
+        if category_ids - known:
+            unknown = ", ".join(sorted(str(pk) for pk in category_ids - known))
+            raise serializers.ValidationError(f"Unknown category: {unknown}.")
+        return polls
+
+    def create(self, validated_data):
+        campaign = self.context["campaign"]
+        user = self.context["request"].user
+        polls, options = [], {}
+        for data in validated_data["polls"]:
+            data = dict(data)
+            option_data = data.pop("options", [])
+            poll = Poll(campaign=campaign, created_by=user, category_id=data.pop("category", None), **data)
+            polls.append(poll)
+            options[poll.pk] = new_options(poll, option_data)
+
+        with transaction.atomic():
+            Poll.objects.bulk_create(polls)
+            PollOption.objects.bulk_create([option for poll_options in options.values() for option in poll_options])
+            transaction.on_commit(lambda: polls_imported.send(
+                sender=Poll, polls=polls, campaign=campaign, created_by=user))
+        return {"campaign": campaign, "polls": polls, "options": options}
+
+    def to_representation(self, instance):
+        # Built from the inserted objects, no need to read them back
+        return {
+            "campaign": str(instance["campaign"].pk),
+            "created": len(instance["polls"]),
+            "polls": [
+                {
+                    "id": str(poll.pk),
+                    "title": poll.title,
+                    "options": [
+                        {"id": str(option.pk), "text": option.text, "order": option.order}
+                        for option in instance["options"][poll.pk]
+                    ],
+                } for poll in instance["polls"]
+            ],
+        }
 
 class VoteSerializer(serializers.ModelSerializer):
+    # The poll owner is read when the vote notification goes out
+    poll = serializers.PrimaryKeyRelatedField(queryset=Poll.objects.select_related('created_by'))
+
     class Meta:
         model = Vote
         fields = ["id", "poll", "option", "voter_ip", "voter_user", "voted_at"]
@@ -39,14 +169,36 @@ class VoteSerializer(serializers.ModelSerializer):
         if not poll.is_active or poll.is_expired:
             raise serializers.ValidationError("Poll is not active.")
 
-        if not poll.allow_multiple_votes:
-            if user and Vote.has_voted(poll, voter_user=user):
-                raise serializers.ValidationError("User has already voted in this poll.")
-            if not user and ip and Vote.has_voted(poll, voter_ip=ip):
-                raise serializers.ValidationError("This IP has already voted in this poll.")
+        # Synchronous votes rely on the unique constraints at insert time (see create);
+        # buffered votes are only inserted later, so they are checked up front
+        if buffer_enabled() and not poll.allow_multiple_votes and (user or ip):
+            if self.known_voter(poll, user, ip, skip_unknown=False):
+                raise serializers.ValidationError(self.duplicate_vote_message(user))
+            if not claim_voter(poll.pk, membership.voter_key(user, ip)):
+                raise serializers.ValidationError(self.duplicate_vote_message(user))
 
         return attrs
 
+    @staticmethod
+    def known_voter(poll, user, ip, skip_unknown):
+        """
+        Duplicate check through the poll's voter set: a definite "not voted"
+        costs no query, only possible hits are confirmed against the database.
+        """
+        answer = membership.check(poll.pk, membership.voter_key(user, ip))
+        if answer == membership.NOT_VOTED or (answer == membership.UNKNOWN and skip_unknown):
+            return False
+        voted = Vote.has_voted(poll, voter_user=user) if user else Vote.has_voted(poll, voter_ip=ip)
+        if voted and answer == membership.MAYBE:
+            membership.record_confirmed_duplicate()
+        return voted
+
+    @staticmethod
+    def duplicate_vote_message(user):
+        if user:
+            return "User has already voted in this poll."
+        return "This IP has already voted in this poll."
+
     def create(self, validated_data):
         request = self.context.get("request")
         user = request.user if request and request.user.is_authenticated else None
@@ -54,20 +206,50 @@ class VoteSerializer(serializers.ModelSerializer):
         validated_data["voter_user"] = user
         validated_data["voter_ip"] = None if user else ip
 
-        from django.db import transaction
-        from django.db.models import F
-        with transaction.atomic():
-            vote = Vote.objects.create(**validated_data)
-            # update denormalized count
-            PollOption.objects.filter(pk=vote.option.pk).update(vote_count=F("vote_count") + 1)
+        if buffer_enabled():
+            return enqueue_vote(**validated_data)
+
+        poll = validated_data["poll"]
+        if not poll.allow_multiple_votes and (user or ip):
+            # Known voters are turned away before the insert; everyone else goes
+            # straight to it and the constraints catch what the voter set missed
+            if self.known_voter(poll, user, ip, skip_unknown=True):
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [self.duplicate_vote_message(user)]
+                })
+
+        # One round trip for dedupe: the unique_user_vote_per_poll / unique_ip_vote_per_poll
+        # constraints reject a second vote, and the conflict becomes the usual 400
+        try:
+            with transaction.atomic():
+                vote = Vote.objects.create(**validated_data)
+                # update denormalized count
+                increment_vote_counts({vote.option_id: 1})
+                transaction.on_commit(lambda: votes_recorded.send(sender=Vote, votes=[vote]))
+        except IntegrityError as exc:
+            if not self.is_duplicate_vote(exc, poll, user, ip):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.duplicate_vote_message(user)]
+            })
         return vote
 
-class CategorySerializer(serializers.ModelSerializer):
+    @staticmethod
+    def is_duplicate_vote(exc, poll, user, ip):
+        """Whether an IntegrityError from the insert is one of Vote's voter constraints"""
+        # psycopg2 names the constraint that failed
+        constraint = getattr(getattr(exc.__cause__, "diag", None), "constraint_name", None)
+        if constraint is not None:
+            return constraint in {unique.name for unique in Vote._meta.constraints}
+        # Other backends (SQLite) don't: look for the vote the constraints protect
+        return Vote.has_voted(poll, voter_user=user, voter_ip=ip)
+
+class CategorySerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "title", "description", "created_at"]
 
-class CampaignSerializer(serializers.ModelSerializer):
+class CampaignSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Campaign
         fields = ["id", "title", "description", "start_date",
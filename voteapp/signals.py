@@ -0,0 +1,109 @@
+# voteapp/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from . import membership, rollups, row_counts, search, streaming, tally, trending
+from .cache_utils import get_redis, invalidate_namespace
+from .models import Campaign, Category, Poll, PollOption
+
+# Sent once committed votes are in the database, by both the synchronous
+# vote path and the buffered flush. Receivers get ``votes``: a list of the
+# Vote instances that were actually inserted, and ``buffered``=True from the
+# flush, whose bulk_create sends no post_save. A flush replaying a batch
+# after a crash sends the batch's votes again (see voteapp/vote_buffer.py).
+votes_recorded = Signal()
+
+# Sent once polls inserted with bulk_create, which sends no post_save, are
+# committed. Receivers get ``polls``: the Poll instances inserted, plus the
+# ``campaign`` they were imported into and the user they are ``created_by``.
+polls_imported = Signal()
+
+
+@receiver(votes_recorded)
+def invalidate_vote_caches(sender, votes, **kwargs):
+    # Poll details stay cached: their counts are read from the live tally
+    invalidate_namespace('polls')
+
+
+@receiver(votes_recorded)
+def update_live_tallies(sender, votes, **kwargs):
+    tally.record_votes(votes)
+
+
+@receiver(votes_recorded)
+def update_trending_scores(sender, votes, **kwargs):
+    trending.record_votes(votes)
+
+
+@receiver(votes_recorded)
+def update_campaign_rollups(sender, votes, **kwargs):
+    rollups.record_votes(votes)
+
+
+@receiver(votes_recorded)
+def update_voter_sets(sender, votes, **kwargs):
+    membership.add_votes(votes)
+
+
+@receiver(votes_recorded)
+def publish_vote_events(sender, votes, **kwargs):
+    conn = get_redis()
+    if conn is not None:
+        streaming.publish_vote_events(conn, {vote.poll_id for vote in votes})
+
+
+@receiver(post_save, sender=Poll)
+@receiver(post_delete, sender=Poll)
+def poll_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        tally.forget(instance.pk)
+        invalidate_namespace(f"poll_{instance.pk}")
+
+
+@receiver(post_save, sender=PollOption)
+@receiver(post_delete, sender=PollOption)
+def option_changed(sender, instance, **kwargs):
+    tally.forget(instance.poll_id)
+    invalidate_namespace(f"poll_{instance.poll_id}")
+
+
+@receiver(post_delete, sender=Poll)
+def poll_deleted(sender, instance, **kwargs):
+    membership.forget(instance.pk)
+    search.unindex_poll(instance)
+    trending.forget(instance)
+    # Its votes are gone from the campaign's stats
+    rollups.forget(instance.campaign_id)
+
+
+@receiver(post_delete, sender=Campaign)
+def campaign_deleted(sender, instance, **kwargs):
+    rollups.forget(instance.pk)
+
+
+@receiver(post_save, sender=Poll)
+def poll_saved(sender, instance, **kwargs):
+    # PostgreSQL maintains its search vector itself, this only writes the SQLite FTS5 table
+    search.index_poll(instance)
+
+
+@receiver(post_save, sender=Poll)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Campaign)
+def row_created(sender, instance, created, **kwargs):
+    if created:
+        row_counts.adjust(sender, 1)
+
+
+@receiver(post_delete, sender=Poll)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Campaign)
+def row_deleted(sender, instance, **kwargs):
+    row_counts.adjust(sender, -1)
+
+
+@receiver(polls_imported)
+def polls_imported_changed(sender, polls, **kwargs):
+    # What poll_saved and row_created do for each saved poll, once per import
+    search.index_new_polls(polls)
+    row_counts.adjust(Poll, len(polls))
+    invalidate_namespace('polls')
@@ -0,0 +1,181 @@
+"""
+Live results fan-out for the SSE endpoint.
+
+Committed votes publish their poll id on one Redis pub/sub channel. Each
+web process runs a single ResultsHub with one subscription to that
+channel, whatever the number of open streams. The hub marks polls dirty
+and, at most RESULTS_STREAM['MAX_UPDATES_PER_SECOND'] times a second,
+reads each dirty poll's live tally once and pushes the changed options to
+every local subscriber. A slow client's pending updates are merged, not
+queued, so memory per connection stays constant.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import tally
+from .cache_utils import redis_key
+
+logger = logging.getLogger('voteapp')
+
+
+def events_channel():
+    return redis_key("poll_events")
+
+
+def publish_vote_events(conn, poll_ids):
+    """Announce that these polls received votes"""
+    pipe = conn.pipeline()
+    for poll_id in poll_ids:
+        pipe.publish(events_channel(), str(poll_id))
+    pipe.execute()
+
+
+def results_delta(previous, current):
+    """Options whose votes or percentage changed between two results payloads"""
+    before = {option['id']: option for option in previous['options']} if previous else {}
+    return {
+        'poll_id': current['poll_id'],
+        'total_votes': current['total_votes'],
+        'options': {
+            option['id']: {'votes': option['votes'], 'percentage': option['percentage']}
+            for option in current['options']
+            if before.get(option['id']) != option
+        },
+    }
+
+
+class Subscriber:
+    """One open stream. Pending deltas are merged until the client reads them."""
+    __slots__ = ('pending', 'ready')
+
+    def __init__(self):
+        self.pending = None
+        self.ready = asyncio.Event()
+
+    def push(self, delta):
+        if self.pending is None:
+            self.pending = {**delta, 'options': dict(delta['options'])}
+        else:
+            self.pending['total_votes'] = delta['total_votes']
+            self.pending['options'].update(delta['options'])
+        self.ready.set()
+
+    async def next(self, timeout):
+        await asyncio.wait_for(self.ready.wait(), timeout)
+        delta, self.pending = self.pending, None
+        self.ready.clear()
+        return delta
+
+
+class ResultsHub:
+    def __init__(self):
+        self.subscribers = {}
+        self.snapshots = {}
+        self.dirty = set()
+        self.tasks = []
+
+    def start(self):
+        # Fresh contexts: the hub outlives the request that started it
+        self.tasks = [
+            asyncio.create_task(self.listen(), context=contextvars.Context()),
+            asyncio.create_task(self.broadcast(), context=contextvars.Context()),
+        ]
+
+    def subscribe(self, poll_id, snapshot):
+        poll_id = str(poll_id)
+        subscriber = Subscriber()
+        self.subscribers.setdefault(poll_id, set()).add(subscriber)
+        self.snapshots.setdefault(poll_id, snapshot)
+        return subscriber
+
+    def unsubscribe(self, poll_id, subscriber):
+        poll_id = str(poll_id)
+        subscribers = self.subscribers.get(poll_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[poll_id]
+            self.snapshots.pop(poll_id, None)
+
+    async def listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.from_url(settings.REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(events_channel())
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        poll_id = message['data'].decode()
+                        if poll_id in self.subscribers:
+                            self.dirty.add(poll_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Results stream lost its Redis subscription, reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await client.close()
+
+    async def broadcast(self):
+        interval = 1 / settings.RESULTS_STREAM['MAX_UPDATES_PER_SECOND']
+        while True:
+            await asyncio.sleep(interval)
+            dirty, self.dirty = self.dirty, set()
+            for poll_id in dirty:
+                subscribers = self.subscribers.get(poll_id)
+                if not subscribers:
+                    continue
+                try:
+                    current = await sync_to_async(tally.get_results, thread_sensitive=False)(poll_id)
+                except Exception:
+                    logger.warning(f"Could not read live results for poll {poll_id}", exc_info=True)
+                    continue
+                if current is None:
+                    continue
+                delta = results_delta(self.snapshots.get(poll_id), current)
+                self.snapshots[poll_id] = current
+                if not delta['options']:
+                    continue
+                for subscriber in subscribers:
+                    subscriber.push(delta)
+
+
+_hubs = {}
+
+
+def get_hub():
+    """The hub for the running event loop, started on first use"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = ResultsHub()
+        hub.start()
+    return hub
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def results_event_stream(poll_id, snapshot, subscriber, hub):
+    heartbeat = settings.RESULTS_STREAM['HEARTBEAT']
+    try:
+        yield sse_event('results', snapshot)
+        while True:
+            try:
+                delta = await subscriber.next(heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield sse_event('delta', delta)
+    finally:
+        hub.unsubscribe(poll_id, subscriber)
@@ -0,0 +1,330 @@
+"""
+Live poll tallies in Redis.
+
+Each poll has a hash of option_id -> votes, bumped with HINCRBY as votes
+commit, plus a cached metadata entry (title and ordered options). Results
+are served from those two keys without touching the database, and cached
+poll details get their vote counts from the hash too. Missing
+tallies are rebuilt from the vote counters, and reconcile_tallies()
+periodically rewrites any tally that drifted from the database, which
+stays the source of truth.
+
+Every vote also bumps a per-poll sequence. A rebuild reads it before the
+database and only writes its hash if it hasn't moved, so votes recorded
+in between are not overwritten; it reads again instead. A poll without
+options has no hash: its cached metadata alone is a warm tally.
+"""
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_utils import get_async_redis, get_redis, redis_key, single_flight
+from .models import Poll, PollOption
+
+# KEYS: tally, sequence; ARGV: option, votes, ttl
+# Only bump tallies that exist: a partial hash would read as complete results
+INCR_IF_EXISTS = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+"""
+
+# KEYS: tally, sequence, active set; ARGV: sequence read before the
+# database ('*' to write regardless), ttl, poll, (option, votes)...
+STORE_IF_UNCHANGED = """
+if ARGV[1] ~= '*' and (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[3])
+return 1
+"""
+
+# Reads of the database a rebuild makes before it writes regardless
+REBUILD_ATTEMPTS = 3
+
+
+def tally_key(poll_id):
+    return redis_key("tally", poll_id)
+
+
+def _sequence_key(poll_id):
+    return redis_key("tally_seq", poll_id)
+
+
+def meta_key(poll_id):
+    return f"poll_meta_{poll_id}"
+
+
+def _active_key():
+    return redis_key("tally", "active")
+
+
+def format_results(meta, counts):
+    """Same shape as Poll.get_results()"""
+    votes = [(option_id, text, int(counts.get(option_id, 0))) for option_id, text in meta['options']]
+    total = sum(count for _, _, count in votes)
+    return {
+        'poll_id': meta['poll_id'],
+        'title': meta['title'],
+        'total_votes': total,
+        'options': [
+            {
+                'id': option_id,
+                'text': text,
+                'votes': count,
+                'percentage': round((count / total * 100), 2) if total > 0 else 0
+            } for option_id, text, count in votes
+        ]
+    }
+
+
+def _load_from_db(poll_id):
+    """Return (meta, counts) from the database, or (None, None) if the poll is gone"""
+    poll = Poll.objects.filter(pk=poll_id).only('id', 'title').first()
+    if poll is None:
+        return None, None
+    options = list(
+        PollOption.objects.filter(poll_id=poll_id).with_live_counts().values_list('id', 'text', 'live_vote_count')
+    )
+    meta = {
+        'poll_id': str(poll.id),
+        'title': poll.title,
+        'options': [(str(option_id), text) for option_id, text, _ in options],
+    }
+    counts = {str(option_id): count for option_id, _, count in options}
+    return meta, counts
+
+
+def _load_many_from_db(poll_ids):
+    """{poll_id: (meta, counts)} of the polls that exist, from one query over their options"""
+    loaded = {}
+    rows = PollOption.objects.filter(poll_id__in=poll_ids).with_live_counts().values_list(
+        'poll_id', 'poll__title', 'id', 'text', 'live_vote_count')
+    for poll_id, title, option_id, text, count in rows:
+        meta, counts = loaded.setdefault(str(poll_id), ({'poll_id': str(poll_id), 'title': title, 'options': []}, {}))
+        meta['options'].append((str(option_id), text))
+        counts[str(option_id)] = count
+    # Polls without options only show up in the polls table
+    missing = {str(poll_id) for poll_id in poll_ids} - set(loaded)
+    if missing:
+        for poll_id, title in Poll.objects.filter(pk__in=missing).values_list('id', 'title'):
+            loaded[str(poll_id)] = ({'poll_id': str(poll_id), 'title': title, 'options': []}, {})
+    return loaded
+
+
+def _read_sequences(conn, poll_ids):
+    """Current vote sequence of each poll, to hand to _store_counts() after the database read"""
+    return [(sequence or b'').decode() for sequence in conn.mget([_sequence_key(poll_id) for poll_id in poll_ids])]
+
+
+def _store_counts(conn, poll_id, counts, sequence, client=None):
+    """Write a tally unless a vote was recorded since ``sequence`` was read; returns whether it did"""
+    args = [sequence, settings.LIVE_TALLY_TTL, str(poll_id)]
+    for option_id, count in counts.items():
+        args += [option_id, count]
+    store = conn.register_script(STORE_IF_UNCHANGED)
+    return store(keys=[tally_key(poll_id), _sequence_key(poll_id), _active_key()], args=args, client=client)
+
+
+def rebuild(poll_id, conn=None):
+    """
+    Reload a poll's tally and metadata from the database. A vote recorded
+    during the read makes it read again; the last attempt is written
+    regardless and reconcile_tallies() fixes what it missed.
+    """
+    conn = conn or get_redis()
+    for attempt in range(1, REBUILD_ATTEMPTS + 1):
+        sequence = _read_sequences(conn, [poll_id])[0] if conn is not None else None
+        meta, counts = _load_from_db(poll_id)
+        if meta is None:
+            return None, None
+        if conn is None or not counts:
+            break
+        if _store_counts(conn, poll_id, counts, sequence if attempt < REBUILD_ATTEMPTS else '*'):
+            break
+    cache.set(meta_key(poll_id), meta, settings.LIVE_TALLY_TTL)
+    return meta, counts
+
+
+def rebuild_many(poll_ids, conn=None):
+    """
+    rebuild() for many polls: one query, one cache.set_many and one Redis
+    pipeline. Tallies that got a vote during the read are not written and
+    are rebuilt on a later read.
+    """
+    conn = conn or get_redis()
+    sequences = dict(zip(map(str, poll_ids), _read_sequences(conn, poll_ids))) if conn is not None else {}
+    loaded = _load_many_from_db(poll_ids)
+    if not loaded:
+        return loaded
+    cache.set_many({meta_key(poll_id): meta for poll_id, (meta, _) in loaded.items()}, settings.LIVE_TALLY_TTL)
+    if conn is not None:
+        pipe = conn.pipeline()
+        for poll_id, (_, counts) in loaded.items():
+            if counts:
+                _store_counts(conn, poll_id, counts, sequences[poll_id], client=pipe)
+        pipe.execute()
+    return loaded
+
+
+def _read_counts(poll_id, conn):
+    if conn is None:
+        return None
+    return {k.decode(): int(v) for k, v in conn.hgetall(tally_key(poll_id)).items()} or None
+
+
+def _warm(meta, counts):
+    # A poll without options has no counts to keep
+    return meta is not None and bool(counts or not meta['options'])
+
+
+def _peek(poll_id, conn):
+    """(meta, counts) if the tally is warm, else None"""
+    meta = cache.get(meta_key(poll_id))
+    counts = _read_counts(poll_id, conn)
+    return (meta, counts or {}) if _warm(meta, counts) else None
+
+
+def _rebuild_once(poll_id, conn):
+    """rebuild() by a single caller per poll; concurrent callers wait for its tally"""
+    return single_flight(
+        tally_key(poll_id), lambda: rebuild(poll_id, conn), lambda: _peek(poll_id, conn)
+    )
+
+
+def get_results(poll_id):
+    """Results for a poll from the live tally, or None if the poll does not exist"""
+    conn = get_redis()
+    meta, counts = _peek(poll_id, conn) or _rebuild_once(poll_id, conn)
+    if meta is None:
+        return None
+    return format_results(meta, counts)
+
+
+def get_many_results(poll_ids):
+    """
+    {poll_id: results} of the polls in ``poll_ids`` that exist. Warm tallies
+    cost one cache.get_many and one Redis pipeline for all of them; the cold
+    ones are rebuilt together by rebuild_many(). There is no per-poll lock
+    as in get_results(): a concurrent rebuild costs one query, not one per poll.
+    """
+    conn = get_redis()
+    poll_ids = list(dict.fromkeys(str(poll_id) for poll_id in poll_ids))
+    metas = cache.get_many([meta_key(poll_id) for poll_id in poll_ids])
+    counts = {}
+    if conn is not None:
+        pipe = conn.pipeline()
+        for poll_id in poll_ids:
+            pipe.hgetall(tally_key(poll_id))
+        for poll_id, raw in zip(poll_ids, pipe.execute()):
+            counts[poll_id] = {k.decode(): int(v) for k, v in raw.items()}
+
+    found, cold = {}, []
+    for poll_id in poll_ids:
+        meta = metas.get(meta_key(poll_id))
+        if _warm(meta, counts.get(poll_id)):
+            found[poll_id] = (meta, counts.get(poll_id, {}))
+        else:
+            cold.append(poll_id)
+    if cold:
+        found.update(rebuild_many(cold, conn))
+    return {poll_id: format_results(*found[poll_id]) for poll_id in poll_ids if poll_id in found}
+
+
+def get_counts(poll_id):
+    """Live option_id -> votes for a poll, or None if the poll does not exist"""
+    conn = get_redis()
+    counts = _read_counts(poll_id, conn)
+    if counts is None:
+        _, counts = _peek(poll_id, conn) or _rebuild_once(poll_id, conn)
+    return counts
+
+
+async def aget_counts(poll_id):
+    conn = get_async_redis()
+    counts = None
+    if conn is not None:
+        counts = {k.decode(): int(v) for k, v in (await conn.hgetall(tally_key(poll_id))).items()}
+    if not counts:
+        return await sync_to_async(get_counts)(poll_id)
+    return counts
+
+
+def overlay_counts(poll_data, counts):
+    """Copy of serialized poll data with the options' vote_count taken from live counts"""
+    if not counts or 'options' not in poll_data:
+        return poll_data
+    options = [
+        {**option, 'vote_count': counts.get(str(option['id']), option['vote_count'])}
+        for option in poll_data['options']
+    ]
+    return {**poll_data, 'options': options}
+
+
+async def aget_results(poll_id):
+    """get_results() for async views; only a cold tally is rebuilt in a worker thread"""
+    conn = get_async_redis()
+    meta = await cache.aget(meta_key(poll_id))
+    counts = None
+    if conn is not None:
+        counts = {k.decode(): v for k, v in (await conn.hgetall(tally_key(poll_id))).items()}
+    if not _warm(meta, counts):
+        return await sync_to_async(get_results)(poll_id)
+    return format_results(meta, counts or {})
+
+
+def record_votes(votes):
+    """Bump live tallies for committed votes"""
+    conn = get_redis()
+    if conn is None:
+        return
+    incr = conn.register_script(INCR_IF_EXISTS)
+    pipe = conn.pipeline()
+    for (poll_id, option_id), n in Counter((vote.poll_id, vote.option_id) for vote in votes).items():
+        incr(keys=[tally_key(poll_id), _sequence_key(poll_id)], args=[str(option_id), n, settings.LIVE_TALLY_TTL],
+             client=pipe)
+    pipe.execute()
+
+
+def forget(poll_id):
+    """Drop a poll's tally and metadata, e.g. after it was deleted or its options changed"""
+    cache.delete(meta_key(poll_id))
+    conn = get_redis()
+    if conn is not None:
+        conn.delete(tally_key(poll_id), _sequence_key(poll_id))
+        conn.srem(_active_key(), str(poll_id))
+
+
+def reconcile_tallies():
+    """
+    Compare every live tally with the database and rewrite the ones that drifted,
+    e.g. after Redis lost writes. Returns the number of tallies rewritten.
+    """
+    conn = get_redis()
+    if conn is None:
+        return 0
+    rewritten = 0
+    for member in conn.smembers(_active_key()):
+        poll_id = member.decode()
+        key = tally_key(poll_id)
+        current = {k.decode(): int(v) for k, v in conn.hgetall(key).items()}
+        if not current:
+            # expired or lost; rebuilt lazily on the next read
+            conn.srem(_active_key(), poll_id)
+            continue
+        meta, counts = _load_from_db(poll_id)
+        if meta is None:
+            forget(poll_id)
+            continue
+        if current != counts:
+            rebuild(poll_id, conn)
+            rewritten += 1
+    return rewritten
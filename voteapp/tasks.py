@@ -0,0 +1,45 @@
+from celery import shared_task
+
+
+@shared_task(name="voteapp.flush_vote_buffer", ignore_result=True)
+def flush_vote_buffer():
+    """Drain buffered votes into the database in batches"""
+    from .vote_buffer import flush
+    return flush()
+
+
+@shared_task(name="voteapp.compact_vote_counters", ignore_result=True)
+def compact_vote_counters():
+    """Fold sharded vote counter slots back into PollOption.vote_count"""
+    from .counters import compact_counters
+    return compact_counters()
+
+
+@shared_task(name="voteapp.reconcile_live_tallies", ignore_result=True)
+def reconcile_live_tallies():
+    """Compact vote counters, then rewrite live tallies that drifted from the database"""
+    from .counters import compact_counters
+    from .tally import reconcile_tallies
+    compact_counters()
+    return reconcile_tallies()
+
+
+@shared_task(name="voteapp.warm_voter_set", ignore_result=True)
+def warm_voter_set(poll_id):
+    """Fill a poll's voter membership set from existing votes"""
+    from .membership import warm
+    warm(poll_id)
+
+
+@shared_task(name="voteapp.rebase_trending_scores", ignore_result=True)
+def rebase_trending_scores():
+    """Move the trending epoch forward so score weights stay small"""
+    from .trending import rebase_scores
+    return rebase_scores()
+
+
+@shared_task(name="voteapp.rebuild_campaign_rollup", ignore_result=True)
+def rebuild_campaign_rollup(campaign_id):
+    """Rebuild a campaign's stats rollup from the votes table"""
+    from .rollups import rebuild_scheduled
+    rebuild_scheduled(campaign_id)
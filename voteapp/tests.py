@@ -1,3 +1,1143 @@
-from django.test import TestCase
+import datetime
+import decimal
+import io
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_init
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from online_poll.testing import (ENFORCED_BUDGETS, LOCMEM_CACHES, EndpointBudgetCoverageMixin, RedisTestMixin,
+                                 cursor_pages)
+
+from . import async_views, cache_utils, membership, rollups, search, signals, tally, urls, vote_buffer
+from .cache_utils import redis_key
+from .local_cache import LocalCache
+from .models import Campaign, Category, Poll, PollOption, PollOptionCounter, Vote
+from .renderers import FastJSONRenderer
+from .serializers import FastPollSerializer, PollSerializer
+from .views import PollDetailView, PollListCreateView, PollResultsView
+
+FAST_READ_PATH_OFF = {'SERIALIZERS': False, 'RENDERER': False}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PollReadPathVoteCostTests(TestCase):
+    """Poll detail and results must cost the same whatever the number of votes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.small = cls.make_poll(owner, "Small", votes=1)
+        cls.large = cls.make_poll(owner, "Large", votes=300)
+
+    @staticmethod
+    def make_poll(owner, title, votes):
+        poll = Poll.objects.create(title=title, created_by=owner)
+        options = PollOption.objects.bulk_create(
+            PollOption(poll=poll, text=f"Option {n}", order=n) for n in range(3)
+        )
+        Vote.objects.bulk_create(
+            Vote(poll=poll, option=options[n % 3], voter_ip=f"10.0.{n // 256}.{n % 256}") for n in range(votes)
+        )
+        return poll
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.votes_loaded = 0
+        post_init.connect(self.count_vote, sender=Vote)
+        self.addCleanup(post_init.disconnect, self.count_vote, sender=Vote)
+
+    def count_vote(self, **kwargs):
+        self.votes_loaded += 1
+
+    def measure(self, view, path, poll):
+        """(status, queries) of an uncached GET"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(self.factory.get(path.format(pk=poll.pk)), pk=poll.pk)
+        return response.status_code, len(queries)
+
+    def assert_bounded_by_options(self, view, path):
+        small = self.measure(view, path, self.small)
+        large = self.measure(view, path, self.large)
+        self.assertEqual(small[0], 200)
+        self.assertEqual(small, large)
+        self.assertEqual(self.votes_loaded, 0)
+
+    def test_detail(self):
+        self.assert_bounded_by_options(PollDetailView.as_view(), "/api/p/polls/{pk}/")
+
+    def test_results(self):
+        self.assert_bounded_by_options(PollResultsView.as_view(), "/api/p/polls/{pk}/results/")
+
+    def test_async_detail(self):
+        self.assert_bounded_by_options(async_to_sync(async_views.poll_detail), "/api/p/polls/{pk}/")
+
+    def test_async_results(self):
+        self.assert_bounded_by_options(async_to_sync(async_views.poll_results), "/api/p/polls/{pk}/results/")
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CACHE_STAMPEDE={**settings.CACHE_STAMPEDE, 'LOCK_WAIT': 0.2})
+class SingleFlightTests(TestCase):
+    """Only the lock holder computes, and only its own lock is released"""
+
+    def setUp(self):
+        cache.clear()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return "value"
+
+    def test_waiters_give_up_without_computing(self):
+        token = cache_utils._acquire_lock("key")
+        with self.assertRaises(cache_utils.StillComputing):
+            cache_utils.single_flight("key", self.compute, lambda: None)
+        with self.assertRaises(cache_utils.StillComputing):
+            async_to_sync(cache_utils.asingle_flight)("key", sync_to_async(self.compute), sync_to_async(lambda: None))
+        self.assertEqual(self.computed, 0)
+        cache_utils._release_lock("key", token)
+        self.assertEqual(cache_utils.single_flight("key", self.compute, lambda: None), "value")
+
+    def test_waiters_take_the_holders_result(self):
+        cache_utils._acquire_lock("key")
+        self.assertEqual(cache_utils.single_flight("key", self.compute, lambda: "theirs"), "theirs")
+        self.assertEqual(self.computed, 0)
+
+    def test_expired_lock_is_not_released_by_its_old_holder(self):
+        stale = cache_utils._acquire_lock("key")
+        cache.delete(cache_utils._lock_key("key"))  # expired
+        current = cache_utils._acquire_lock("key")
+        cache_utils._release_lock("key", stale)
+        self.assertIsNone(cache_utils._acquire_lock("key"))
+        cache_utils._release_lock("key", current)
+        self.assertIsNotNone(cache_utils._acquire_lock("key"))
+
+    def test_view_answers_503(self):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        poll = PollReadPathVoteCostTests.make_poll(owner, "Poll", votes=1)
+        cache_utils._acquire_lock(tally.tally_key(poll.pk))
+        for url in (reverse("poll-results", args=[poll.pk]), f"/api/p/polls/{poll.pk}/results/?format=api",
+                    reverse("poll-results-stream", args=[poll.pk])):
+            response = APIClient().get(url)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "1")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LiveTallyTests(TestCase):
+    """A poll without options has no counts to cache: its metadata alone keeps it warm"""
+
+    def test_poll_without_options_stays_warm(self):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        poll = Poll.objects.create(title="Empty", created_by=owner)
+        cache.clear()
+        self.assertEqual(tally.get_results(poll.pk)["options"], [])
+        with self.assertNumQueries(0):
+            self.assertEqual(tally.get_results(poll.pk)["total_votes"], 0)
+            self.assertEqual(tally.get_counts(poll.pk), {})
+
+
+class LocalCacheTests(SimpleTestCase):
+    """A value read before an invalidation can't be put back in the L1 after it"""
+
+    def test_set_after_invalidation(self):
+        local = LocalCache(max_bytes=1 << 20, max_ttl=60)
+        read_at = time.monotonic()
+        local.delete("generation")  # purge heard while the reader was at the shared cache
+        local.set("generation", 1, 60, read_at)
+        self.assertIsNone(local.get("generation"))
+        local.set("generation", 2, 60, time.monotonic())
+        self.assertEqual(local.get("generation"), 2)
+
+    def test_forgotten_invalidations_still_refuse_older_reads(self):
+        local = LocalCache(max_bytes=1 << 20, max_ttl=0.01)
+        read_at = time.monotonic()
+        local.delete("a")
+        time.sleep(0.02)
+        local.delete("b")  # "a" is forgotten
+        local.set("a", 1, 60, read_at)
+        self.assertIsNone(local.get("a"))
+
+
+class ResponseCacheHeadersTests(SimpleTestCase):
+    """A cached response carries the headers of the response it was stored from"""
+
+    def test_round_trip(self):
+        response = HttpResponse(b"{}" * 1000, content_type="application/json")
+        response["Vary"] = "Accept"
+        response["Allow"] = "GET, HEAD, OPTIONS"
+        response["Content-Language"] = "en"
+        response["Connection"] = "keep-alive"
+        response.set_cookie("sessionid", "secret")
+
+        hit = cache_utils._unpack_response(cache_utils._pack_response(response, "v1"))
+        self.assertEqual(hit.content, response.content)
+        for header in ("Content-Type", "Vary", "Allow", "Content-Language"):
+            self.assertEqual(hit[header], response[header])
+        self.assertNotIn("Connection", hit)
+        self.assertFalse(hit.cookies)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, VOTE_INGESTION_MODE='sync')
+class ConditionalGetTests(TestCase):
+    """ETags: a matching If-None-Match is a 304 until a vote, an edit or another fieldset changes the response"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.category = Category.objects.create(title="Category", created_by=cls.owner)
+        cls.campaign = Campaign.objects.create(title="Campaign", created_by=cls.owner)
+        cls.poll = PollReadPathVoteCostTests.make_poll(cls.owner, "Poll", votes=2)
+        Poll.objects.filter(pk=cls.poll.pk).update(category=cls.category, campaign=cls.campaign)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.votes = 0
+
+    def vote(self):
+        self.votes += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(reverse("vote-create"), {
+                "poll": str(self.poll.pk), "option": str(self.poll.options.first().pk),
+            }, format="json", REMOTE_ADDR=f"10.1.0.{self.votes}")
+        self.assertEqual(response.status_code, 201)
+
+    def client_get(self, url, **params):
+        return lambda etag: self.client.get(url, params, **({"HTTP_IF_NONE_MATCH": etag} if etag else {}))
+
+    def poll_views(self, sync_view, async_view, path, **params):
+        """GETs of a poll endpoint through its DRF view, its async view and the URL in use"""
+        factory = APIRequestFactory()
+
+        def view_get(view):
+            def get(etag):
+                request = factory.get(path, params, **({"HTTP_IF_NONE_MATCH": etag} if etag else {}))
+                return view(request, pk=self.poll.pk)
+            return get
+        return [view_get(sync_view.as_view()), view_get(async_to_sync(async_view)), self.client_get(path, **params)]
+
+    def assert_revalidates(self, get):
+        """The ETag of get()'s response, once a matching If-None-Match is a 304"""
+        response = get(None)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(get(etag).status_code, 304)
+        return etag
+
+    def assert_changed_by(self, gets, change):
+        before = [self.assert_revalidates(get) for get in gets]
+        change()
+        for get, etag in zip(gets, before):
+            self.assertEqual(get(etag).status_code, 200)
+            self.assertNotEqual(self.assert_revalidates(get), etag)
+
+    def edit_poll(self):
+        self.poll.title = "Edited"
+        self.poll.save()
+
+    def test_poll_detail(self):
+        path = reverse("poll-detail", args=[self.poll.pk])
+        gets = self.poll_views(PollDetailView, async_views.poll_detail, path)
+        self.assert_changed_by(gets, self.vote)
+        self.assert_changed_by(gets, self.edit_poll)
+        sparse = self.poll_views(PollDetailView, async_views.poll_detail, path, fields="id,title")
+        self.assertNotEqual(self.assert_revalidates(sparse[0]), self.assert_revalidates(gets[0]))
+        self.assertNotEqual(self.assert_revalidates(sparse[1]), self.assert_revalidates(gets[1]))
+
+    def test_poll_results(self):
+        gets = self.poll_views(PollResultsView, async_views.poll_results, reverse("poll-results", args=[self.poll.pk]))
+        self.assert_changed_by(gets, self.vote)
+        self.assert_changed_by(gets, self.edit_poll)
+
+    def test_poll_list(self):
+        factory = APIRequestFactory()
+        path = reverse("poll-list-create")
+
+        def view_get(view):
+            return lambda etag: view(factory.get(path, **({"HTTP_IF_NONE_MATCH": etag} if etag else {})))
+        gets = [view_get(PollListCreateView.as_view()), view_get(async_to_sync(async_views.poll_list_create)),
+                self.client_get(path)]
+        self.assert_changed_by(gets, self.vote)
+        self.assert_changed_by(gets, lambda: self.client.post(path, {
+            "title": "New poll", "options": [{"text": "Yes"}, {"text": "No"}]}, format="json"))
+        self.assertNotEqual(self.assert_revalidates(self.client_get(path, page=2, page_size=1)),
+                            self.assert_revalidates(self.client_get(path)))
+
+    def test_categories(self):
+        detail = reverse("category-detail", args=[self.category.pk])
+        gets = [self.client_get(reverse("category-list-create")), self.client_get(detail)]
+        self.assert_changed_by(gets, lambda: self.client.patch(detail, {"description": "Edited"}, format="json"))
+        self.assertNotEqual(self.assert_revalidates(self.client_get(detail, fields="id,title")),
+                            self.assert_revalidates(gets[1]))
+
+    def test_campaigns(self):
+        detail = reverse("campaign-detail", args=[self.campaign.pk])
+        gets = [self.client_get(reverse("campaign-list-create")), self.client_get(detail)]
+        self.assert_changed_by(gets, lambda: self.client.patch(detail, {"description": "Edited"}, format="json"))
+        self.assertNotEqual(self.assert_revalidates(self.client_get(detail, fields="id,title")),
+                            self.assert_revalidates(gets[1]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginationTests(TestCase):
+    """?pagination=cursor on the poll, category and campaign lists"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        for n in range(25):
+            Poll.objects.create(title=f"Poll {n}", created_by=cls.owner)
+            Category.objects.create(title=f"Category {n}", created_by=cls.owner)
+            Campaign.objects.create(title=f"Campaign {n}", created_by=cls.owner)
+        # Ties on created_at are broken by id
+        moment = timezone.now()
+        for model in (Poll, Category, Campaign):
+            model.objects.filter(title__endswith="0").update(created_at=moment)
+            model.objects.exclude(title__endswith="0").update(created_at=moment - datetime.timedelta(hours=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def lists(self):
+        return [(reverse("poll-list-create"), Poll), (reverse("category-list-create"), Category),
+                (reverse("campaign-list-create"), Campaign)]
+
+    def test_walk(self):
+        for url, model in self.lists():
+            pages = cursor_pages(APIClient(), url, page_size=10)
+            self.assertEqual([len(page["results"]) for page in pages], [10, 10, 5])
+            for page in pages:
+                self.assertEqual(set(page), {"next", "previous", "results"})
+            for page in pages[1:]:
+                self.assertIn("pagination=cursor", page["previous"])
+            ids = [row["id"] for page in pages for row in page["results"]]
+            expected = [str(pk) for pk in model.objects.order_by("-created_at", "-id").values_list("id", flat=True)]
+            self.assertEqual(ids, expected, url)
+
+    def test_sync_poll_list(self):
+        # The URL serves the async list, this is the DRF one
+        view = PollListCreateView.as_view()
+        factory = APIRequestFactory()
+        response = view(factory.get("/api/p/polls/", {"pagination": "cursor", "page_size": 20}))
+        ids = [row["id"] for row in response.data["results"]]
+        response = view(factory.get(response.data["next"]))
+        ids += [row["id"] for row in response.data["results"]]
+        expected = Poll.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+
+    def test_page_numbers_without_the_param(self):
+        for url, model in self.lists():
+            page = APIClient().get(url, {"page": 2}).json()
+            self.assertEqual(set(page), {"count", "count_exact", "next", "previous", "total_pages", "current_page",
+                                         "results"})
+            self.assertEqual((page["count"], page["current_page"], page["total_pages"]), (25, 2, 3))
+            self.assertIn("page=3", page["next"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListCountTests(TestCase):
+    """Totals of the page-number lists: counted, estimated, cached or left out"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.category = Category.objects.create(title="Category", created_by=cls.owner)
+        for n in range(20):
+            Poll.objects.create(title=f"Poll {n}", created_by=cls.owner, category=cls.category if n < 15 else None)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        response = APIClient().get(reverse("poll-list-create"), {"page_size": 10, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unfiltered_list_uses_the_counter(self):
+        page = self.get()
+        self.assertEqual((page["count"], page["count_exact"], page["total_pages"]), (20, False, 2))
+        # bulk_create sends no post_save: the counter is off until it expires, but no page is lost
+        Poll.objects.bulk_create(Poll(title=f"Bulk {n}", created_by=self.owner) for n in range(5))
+        cache_utils.invalidate_namespace("polls")
+        page = self.get(page=2)
+        self.assertEqual((page["count"], page["total_pages"]), (20, 2))
+        self.assertIn("page=3", page["next"])
+        page = self.get(page=3)
+        self.assertEqual(len(page["results"]), 5)
+        self.assertIsNone(page["next"])
+
+    def test_filtered_list_is_counted(self):
+        page = self.get(category=str(self.category.pk))
+        self.assertEqual((page["count"], page["count_exact"], page["total_pages"]), (15, True, 2))
+
+    def test_estimate_threshold(self):
+        category = {"category": str(self.category.pk)}
+        with mock.patch("voteapp.row_counts.estimate_count", return_value=12000):
+            page = self.get(**category)
+            self.assertEqual((page["count"], page["count_exact"], page["total_pages"]), (12000, False, 1200))
+            # Pages past the estimate's real end are 404s, the last real page has no next
+            self.assertIsNone(self.get(page=2, **category)["next"])
+            self.assertEqual(APIClient().get(reverse("poll-list-create"), {"page": 3, "page_size": 10, **category})
+                             .status_code, 404)
+        cache.clear()
+        with mock.patch("voteapp.row_counts.estimate_count", return_value=9999):
+            self.assertEqual(self.get(**category)["count"], 15)
+
+    def test_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get(count="false")
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+        self.assertEqual((page["count"], page["count_exact"], page["total_pages"]), (None, False, None))
+        self.assertIn("page=2", page["next"])
+        # Exactly page_size rows left: the extra row fetched says there is no next page
+        page = self.get(count="false", page=2)
+        self.assertEqual(len(page["results"]), 10)
+        self.assertIsNone(page["next"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListResponseCacheTests(TestCase):
+    """The sync and async poll lists share one rendered page per canonical query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        for n in range(15):
+            Poll.objects.create(title=f"Poll {n}", created_by=cls.owner)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_share_entries(self):
+        factory = APIRequestFactory()
+        sync_view = PollListCreateView.as_view()
+        async_view = async_to_sync(async_views.poll_list_create)
+        for first, second in [(async_view, sync_view), (sync_view, async_view)]:
+            cache.clear()
+            # Misses are rendered before they are stored
+            stored = first(factory.get("/api/p/polls/", {"page": 2, "unknown": "x"}))
+            with self.assertNumQueries(0):
+                hit = second(factory.get("/api/p/polls/", {"page": "2 "}))
+            self.assertEqual(hit.content, stored.content)
+
+    def test_request_left_as_it_came(self):
+        factory = APIRequestFactory()
+        for view in (PollListCreateView.as_view(), async_to_sync(async_views.poll_list_create)):
+            cache.clear()
+            request = factory.get("/api/p/polls/", {"page": 1, "unknown": "x"})
+            response = view(request)
+            # The links come from the canonical query, the request keeps its own
+            self.assertEqual(json.loads(response.content)["next"], "http://testserver/api/p/polls/?page=2")
+            self.assertEqual(request.GET.dict(), {"page": "1", "unknown": "x"})
+            self.assertIn("unknown=x", request.META["QUERY_STRING"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PollSearchTests(TestCase):
+    """?search= on the poll list through the SQLite FTS5 index, and the icontains fallback"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        Poll.objects.create(title="Lunch", description="Which vote wins the office lunch", created_by=cls.owner)
+        Poll.objects.create(title="Vote on lunch", created_by=cls.owner)
+        Poll.objects.create(title="Voting rules", created_by=cls.owner)
+        Poll.objects.create(title="Weekend plans", created_by=cls.owner)
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, **params):
+        response = APIClient().get(reverse("poll-list-create"), params)
+        self.assertEqual(response.status_code, 200)
+        return [row["title"] for row in response.json()["results"]]
+
+    def test_index_exists(self):
+        self.assertEqual(search.backend(), "fts5")
+
+    def test_prefix_match(self):
+        self.assertCountEqual(self.titles(search="vot"), ["Lunch", "Vote on lunch", "Voting rules"])
+        # Every term must match, punctuation is dropped
+        self.assertCountEqual(self.titles(search="vot lun!"), ["Lunch", "Vote on lunch"])
+        self.assertEqual(self.titles(search="nothing"), [])
+
+    def test_ranking(self):
+        # A title match outweighs a description match
+        self.assertEqual(self.titles(search="vote lunch"), ["Vote on lunch", "Lunch"])
+
+    def test_ordering_overrides_rank(self):
+        self.assertEqual(self.titles(search="vote lunch", ordering="title"), ["Lunch", "Vote on lunch"])
+
+    def test_index_follows_edits(self):
+        poll = Poll.objects.get(title="Weekend plans")
+        poll.title = "Weekend vote"
+        poll.save()
+        self.assertIn("Weekend vote", self.titles(search="vote"))
+        poll.delete()
+        cache.clear()
+        self.assertNotIn("Weekend vote", self.titles(search="vote"))
+
+    def test_icontains_fallback(self):
+        with mock.patch("voteapp.search.backend", return_value=None), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertCountEqual(self.titles(search="vot"), ["Lunch", "Vote on lunch", "Voting rules"])
+        self.assertFalse(any(search.FTS_TABLE in query["sql"] for query in queries))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncViewFallbackTests(TestCase):
+    """Async read views answer what the DRF views would: 401 for bad credentials, the browsable API on request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.poll = PollReadPathVoteCostTests.make_poll(cls.owner, "Poll", votes=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return [reverse("poll-list-create"), reverse("poll-detail", args=[self.poll.pk]),
+                reverse("poll-results", args=[self.poll.pk])]
+
+    def test_async_views_in_use(self):
+        self.assertIs(urls.poll_detail, async_views.poll_detail)
+        # A sync-only middleware would put every ASGI request through a thread hop
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), "async_capable", False), path)
+
+    def test_invalid_token(self):
+        client = APIClient()
+        for url in self.urls():
+            self.assertEqual(client.get(url).status_code, 200)
+            client.credentials(HTTP_AUTHORIZATION="Bearer garbage")
+            self.assertEqual(client.get(url).status_code, 401)
+            client.credentials()
+
+    def test_valid_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.owner).access_token}")
+        for url in self.urls():
+            self.assertEqual(client.get(url).status_code, 200)
+
+    def test_browsable_api(self):
+        for url in self.urls():
+            response = APIClient().get(url, {"format": "api"})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response["Content-Type"].startswith("text/html"))
+            response = APIClient().get(url, HTTP_ACCEPT="text/html")
+            self.assertTrue(response["Content-Type"].startswith("text/html"))
+            self.assertEqual(APIClient().get(url, HTTP_ACCEPT="application/json")["Content-Type"], "application/json")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VoteBufferFlushTests(TestCase):
+    """A flushed batch keeps the accepted vote times and survives rows deleted since"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.poll = Poll.objects.create(title="Poll", created_by=cls.owner)
+        cls.options = PollOption.objects.bulk_create(
+            PollOption(poll=cls.poll, text=f"Option {n}", order=n) for n in range(2))
+
+    @staticmethod
+    def entry(vote):
+        payload = {"id": str(vote.id), "poll": str(vote.poll_id), "option": str(vote.option_id),
+                   "voter_user": str(vote.voter_user_id) if vote.voter_user_id else None,
+                   "voter_ip": vote.voter_ip, "voted_at": vote.voted_at.isoformat()}
+        return b"0-1", {b"vote": json.dumps(payload).encode()}
+
+    def buffered(self, **kwargs):
+        return Vote(id=uuid.uuid4(), poll=self.poll, voted_at=timezone.now() - datetime.timedelta(minutes=5),
+                    **kwargs)
+
+    def test_write_batch(self):
+        gone = get_user_model().objects.create_user(email="gone@example.com", password=None)
+        voter = get_user_model().objects.create_user(email="voter@example.com", password=None)
+        kept = self.buffered(option=self.options[0], voter_user=voter)
+        orphan = self.buffered(option=self.options[0], voter_user=gone)
+        dropped = self.buffered(option=self.options[1], voter_ip="10.0.0.1")
+        entries = [self.entry(vote) for vote in (kept, orphan, dropped)]
+        gone.delete()
+        self.options[1].delete()
+
+        created, replayed = vote_buffer._write_batch(entries)
+        self.assertEqual({vote.id for vote in created}, {str(kept.id), str(orphan.id)})
+        self.assertEqual(replayed, [])
+        self.assertEqual(Vote.objects.get(pk=kept.id).voted_at, kept.voted_at)
+        self.assertIsNone(Vote.objects.get(pk=orphan.id).voter_user_id)
+        # Replayed entries insert nothing
+        created, replayed = vote_buffer._write_batch(entries)
+        self.assertEqual(created, [])
+        self.assertEqual({vote.pk for vote in replayed}, {kept.id, orphan.id})
+
+    def test_replay_after_crash(self):
+        # The worker died after committing the batch, before votes_recorded and the XACK
+        votes = [self.buffered(option=self.options[0], voter_ip=f"10.0.0.{n}") for n in range(3)]
+        entries = [self.entry(vote) for vote in votes]
+        vote_buffer._write_batch(entries)
+
+        recorded = []
+        def receiver(sender, votes, **kwargs):
+            recorded.extend(votes)
+        signals.votes_recorded.connect(receiver, dispatch_uid="test_replay_after_crash")
+        self.addCleanup(signals.votes_recorded.disconnect, dispatch_uid="test_replay_after_crash")
+        conn = mock.MagicMock()
+        with mock.patch("voteapp.vote_buffer.get_redis", return_value=conn), \
+                mock.patch("voteapp.vote_buffer._read_batch", side_effect=[entries, []]):
+            self.assertEqual(vote_buffer.flush(), 0)
+        self.assertEqual({vote.pk for vote in recorded}, {vote.id for vote in votes})
+        self.assertEqual(Vote.objects.filter(poll=self.poll).count(), 3)
+        self.assertTrue(conn.pipeline.return_value.xack.called)
+
+    @override_settings(VOTE_INGESTION_MODE='buffered')
+    def test_buffered_duplicate_message(self):
+        # A voter whose vote is still in the buffer gets the same 400 as in sync mode
+        voter = get_user_model().objects.create_user(email="voter@example.com", password=None)
+        client = APIClient()
+        client.force_authenticate(voter)
+        with mock.patch("voteapp.serializers.claim_voter", return_value=False):
+            response = client.post(reverse("vote-create"), {"poll": str(self.poll.pk),
+                                                            "option": str(self.options[0].pk)}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["User has already voted in this poll."]})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, VOTE_INGESTION_MODE='sync')
+class ConcurrentVoteTests(TransactionTestCase):
+    """Simultaneous votes from one voter: exactly one is counted, the rest are 400s"""
+
+    voters = 8
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            # Shared-cache in-memory SQLite fails concurrent writers ("table is locked")
+            # instead of waiting for them; a file test database (TEST NAME) works
+            self.skipTest("needs a test database that serialises concurrent writers")
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        self.poll = Poll.objects.create(title="Poll", created_by=self.owner)
+        self.option = PollOption.objects.create(poll=self.poll, text="Option", order=0)
+
+    def vote_at_once(self, make_client):
+        start = threading.Barrier(self.voters)
+
+        def vote(n):
+            client = make_client()
+            start.wait()
+            try:
+                return client.post(reverse("vote-create"), {"poll": self.poll.pk, "option": self.option.pk}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.voters) as pool:
+            statuses = sorted(pool.map(vote, range(self.voters)))
+        self.assertEqual(statuses, [201] + [400] * (self.voters - 1))
+        self.assertEqual(Vote.objects.filter(poll=self.poll).count(), 1)
+        self.assertEqual(PollOption.objects.with_live_counts().get(pk=self.option.pk).live_vote_count, 1)
+
+    def test_same_ip(self):
+        self.vote_at_once(lambda: APIClient(REMOTE_ADDR="10.0.0.1"))
+
+    def test_same_user(self):
+        voter = get_user_model().objects.create_user(email="voter@example.com", password=None)
+        token = str(RefreshToken.for_user(voter).access_token)
+        self.vote_at_once(lambda: APIClient(HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchResultsTests(TestCase):
+    """Batch results match the per-poll endpoint and cost the same for one poll or many"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.campaign = Campaign.objects.create(title="Campaign", created_by=owner)
+        cls.polls = [
+            PollReadPathVoteCostTests.make_poll(owner, f"Poll {n}", votes=n) for n in range(30)
+        ] + [Poll.objects.create(title="No options", created_by=owner)]
+        Poll.objects.update(campaign=cls.campaign)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_batch(self, polls):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(reverse("poll-results-batch"),
+                                       {"ids": ",".join(str(poll.pk) for poll in polls)})
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_same_results_as_single_poll_endpoint(self):
+        missing = uuid.uuid4()
+        response = APIClient().get(reverse("poll-results-batch"),
+                                   {"ids": ",".join([*(str(poll.pk) for poll in self.polls), str(missing)])})
+        single = [APIClient().get(reverse("poll-results", args=[poll.pk])).json() for poll in self.polls]
+        self.assertEqual(response.json()["results"], single)
+        self.assertEqual(response.data["not_found"], [str(missing)])
+
+    def test_queries_independent_of_poll_count(self):
+        _, one = self.get_batch(self.polls[:1])
+        data, many = self.get_batch(self.polls[:30])
+        self.assertEqual(len(data["results"]), 30)
+        self.assertEqual(one, many)
+
+    def test_campaign_results(self):
+        response = APIClient().get(reverse("campaign-results", args=[self.campaign.pk]), {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], len(self.polls))
+        self.assertEqual(response.data["results"][0]["poll_id"], str(self.polls[-1].pk))
+        self.assertEqual(APIClient().get(reverse("campaign-results", args=[uuid.uuid4()])).status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CampaignStatsTests(TestCase):
+    """?include=stats on a campaign detail: the campaign's vote totals, at a cost independent of its size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.voter = get_user_model().objects.create_user(email="voter@example.com", password=None)
+        cls.small = cls.make_campaign("Small", polls=1, votes=1)
+        cls.large = cls.make_campaign("Large", polls=15, votes=40)
+        # A voter seen in several polls counts once; two days ago shows up in votes_by_day
+        Vote.objects.filter(poll__campaign=cls.large, voter_ip="10.0.0.1").update(voter_ip=None, voter_user=cls.voter)
+        Vote.objects.filter(poll__campaign=cls.large, voter_ip="10.0.0.2").update(
+            voted_at=timezone.now() - datetime.timedelta(days=2))
+
+    @classmethod
+    def make_campaign(cls, title, polls, votes):
+        campaign = Campaign.objects.create(title=title, created_by=cls.owner)
+        for n in range(polls):
+            poll = PollReadPathVoteCostTests.make_poll(cls.owner, f"{title} {n}", votes=votes + n)
+            poll.campaign = campaign
+            poll.save(update_fields=["campaign"])
+        return campaign
+
+    def setUp(self):
+        cache.clear()
+
+    def get_stats(self, campaign):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(reverse("campaign-detail", args=[campaign.pk]), {"include": "stats"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["stats"], len(queries)
+
+    def test_stats(self):
+        stats, _ = self.get_stats(self.large)
+        votes = Vote.objects.filter(poll__campaign=self.large)
+        self.assertFalse(stats["pending"])
+        self.assertEqual(stats["total_votes"], votes.count())
+        self.assertEqual(stats["unique_voters"], 54)
+        self.assertEqual(stats["polls_with_votes"], 15)
+        self.assertEqual(stats["last_vote_at"], votes.latest("voted_at").voted_at.isoformat())
+        self.assertEqual([poll["title"] for poll in stats["top_polls"]], [f"Large {n}" for n in range(14, 4, -1)])
+        self.assertEqual(stats["top_polls"][0]["votes"], 54)
+        days = stats["votes_by_day"]
+        self.assertEqual(len(days), settings.CAMPAIGN_ROLLUP["DAYS"])
+        self.assertEqual(days[-1]["date"], timezone.now().date().isoformat())
+        self.assertEqual([day["votes"] for day in days[-3:]], [15, 0, votes.count() - 15])
+
+    def test_queries_independent_of_campaign_size(self):
+        small, small_queries = self.get_stats(self.small)
+        _, large_queries = self.get_stats(self.large)
+        self.assertEqual(small["total_votes"], 1)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_stats_only_when_included(self):
+        response = APIClient().get(reverse("campaign-detail", args=[self.large.pk]))
+        self.assertNotIn("stats", response.json())
+
+
+class CampaignRollupTests(RedisTestMixin, TestCase):
+    """Campaign rollups in Redis: rebuilds keep the votes recorded while they scan, and run without a worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.campaign = Campaign.objects.create(title="Campaign", created_by=owner)
+        cls.poll = PollReadPathVoteCostTests.make_poll(owner, "Poll", votes=3)
+        cls.poll.campaign = cls.campaign
+        cls.poll.save(update_fields=["campaign"])
+
+    def rebuild_with_vote_during_scan(self):
+        """rebuild() with a vote committed and recorded right after its first scan"""
+        scan = rollups._scan
+
+        def scan_then_vote(campaign_id, since=None):
+            result = scan(campaign_id, since)
+            if not Vote.objects.filter(voter_ip="10.9.9.9").exists():
+                vote = Vote.objects.create(poll=self.poll, option=self.poll.options.first(), voter_ip="10.9.9.9")
+                rollups.record_votes([vote])
+            return result
+
+        with mock.patch("voteapp.rollups._scan", side_effect=scan_then_vote) as scanned:
+            rollups.rebuild(self.campaign.pk)
+        self.assertEqual(scanned.call_count, 2)
+        self.assertEqual(rollups.campaign_stats(self.campaign.pk)["total_votes"], 4)
+
+    def test_vote_during_first_build(self):
+        # No rollup for the vote to bump yet
+        self.rebuild_with_vote_during_scan()
+
+    def test_vote_during_rebuild(self):
+        # The rewrite would drop the vote bumped into the old rollup
+        rollups.rebuild(self.campaign.pk)
+        self.rebuild_with_vote_during_scan()
+
+    def test_stats_etag(self):
+        url = reverse("campaign-detail", args=[self.campaign.pk])
+        rollups.rebuild(self.campaign.pk)
+        response = APIClient().get(url, {"include": "stats"})
+        etag = response["ETag"]
+        self.assertEqual(APIClient().get(url, {"include": "stats"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(APIClient().get(url)["ETag"], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post(reverse("vote-create"), {"poll": str(self.poll.pk),
+                                                      "option": str(self.poll.options.first().pk)},
+                             format="json", REMOTE_ADDR="10.9.9.7")
+        response = APIClient().get(url, {"include": "stats"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stats"]["total_votes"], 4)
+
+    @mock.patch("voteapp.tasks.rebuild_campaign_rollup.delay")
+    def test_pending_until_timeout(self, delay):
+        # The task is queued but no worker runs it
+        self.assertEqual(rollups.campaign_stats(self.campaign.pk), {"pending": True})
+        self.assertEqual(rollups.campaign_stats(self.campaign.pk), {"pending": True})
+        delay.assert_called_once_with(str(self.campaign.pk))
+        with override_settings(CAMPAIGN_ROLLUP={**settings.CAMPAIGN_ROLLUP, "PENDING_TIMEOUT": 0}):
+            stats = rollups.campaign_stats(self.campaign.pk)
+        self.assertFalse(stats["pending"])
+        self.assertEqual(stats["total_votes"], 3)
+
+    @mock.patch("voteapp.tasks.rebuild_campaign_rollup.delay", side_effect=ConnectionError("no broker"))
+    def test_no_broker(self, delay):
+        stats = rollups.campaign_stats(self.campaign.pk)
+        self.assertFalse(stats["pending"])
+        self.assertEqual(stats["total_votes"], 3)
+
+
+@override_settings(VOTE_INGESTION_MODE='sync')
+@mock.patch("voteapp.tasks.warm_voter_set.delay")
+class VoterSetTests(RedisTestMixin, TestCase):
+    """Duplicate-vote checks through the per-poll voter sets, and the stats they keep"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        cls.poll = PollReadPathVoteCostTests.make_poll(owner, "Poll", votes=3)
+        cls.option = cls.poll.options.first()
+
+    def vote(self, ip):
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post(reverse("vote-create"), {"poll": str(self.poll.pk),
+                                                             "option": str(self.option.pk)},
+                                    format="json", REMOTE_ADDR=ip)
+
+    def test_warm_set(self, delay):
+        membership.warm(self.poll.pk)
+        self.assertEqual(membership.check(self.poll.pk, "ip:10.0.0.1"), membership.MAYBE)
+        self.assertEqual(self.vote("10.0.0.1").status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.check(self.poll.pk, "ip:10.1.0.1"), membership.NOT_VOTED)
+        self.assertEqual(self.vote("10.1.0.1").status_code, 201)
+        # The vote joined the set as it committed
+        self.assertEqual(membership.check(self.poll.pk, "ip:10.1.0.1"), membership.MAYBE)
+        delay.assert_not_called()
+        self.assertEqual(membership.stats(), {
+            "lookups": 5, "db_queries_avoided": 2, "maybe": 3, "confirmed": 1, "unknown": 0,
+            "false_positive_rate": 0.6667,
+        })
+
+    def test_cold_set(self, delay):
+        self.assertEqual(membership.check(self.poll.pk, "ip:10.0.0.1"), membership.UNKNOWN)
+        self.assertEqual(self.vote("10.0.0.1").status_code, 400)
+        self.assertEqual(self.vote("10.1.0.1").status_code, 201)
+        delay.assert_called_once_with(str(self.poll.pk))
+        self.assertEqual(membership.stats()["unknown"], 3)
+        # The warm-up never ran and its lock expired
+        self.redis.delete(redis_key("voters", self.poll.pk, "warming"))
+        with self.assertLogs("voteapp", "WARNING") as logs:
+            membership.check(self.poll.pk, "ip:10.2.0.1")
+        self.assertIn("still cold", logs.output[0])
+        self.assertEqual(delay.call_count, 2)
+        membership.warm(self.poll.pk)
+        self.assertEqual(membership.check(self.poll.pk, "ip:10.2.0.1"), membership.NOT_VOTED)
+
+    def test_stale_member(self, delay):
+        # A member whose vote never committed: the database has the final say
+        membership.warm(self.poll.pk)
+        membership.add_votes([Vote(poll=self.poll, option=self.option, voter_ip="10.1.0.1")])
+        self.assertEqual(self.vote("10.1.0.1").status_code, 201)
+        stats = membership.stats()
+        self.assertEqual((stats["maybe"], stats["confirmed"], stats["false_positive_rate"]), (1, 0, 1.0))
+
+    def test_stats_command(self, delay):
+        membership.warm(self.poll.pk)
+        membership.check(self.poll.pk, "ip:10.1.0.1")
+        out = io.StringIO()
+        call_command("voter_set_stats", "--reset", stdout=out)
+        self.assertRegex(out.getvalue(), r"db queries avoided:\s+1 \(100.0%\)")
+        self.assertEqual(membership.stats()["lookups"], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUERY_BUDGETS=ENFORCED_BUDGETS)
+class EndpointQueryBudgetTests(EndpointBudgetCoverageMixin, TestCase):
+    """
+    Every endpoint in voteapp/urls.py on a cold cache: QueryBudgetMiddleware
+    raises when a request runs more queries than QUERY_BUDGETS allows or
+    repeats a query shape (N+1).
+    """
+
+    budget_urls = urls
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user(email="owner@example.com", password=None)
+        cls.voter = User.objects.create_user(email="voter@example.com", password=None)
+        cls.category = Category.objects.create(title="Category", created_by=cls.owner)
+        cls.campaign = Campaign.objects.create(title="Campaign", created_by=cls.owner)
+        cls.polls = [
+            Poll.objects.create(title=f"Poll {n}", created_by=cls.owner, category=cls.category, campaign=cls.campaign)
+            for n in range(12)
+        ]
+        for poll in cls.polls:
+            PollOption.objects.bulk_create(PollOption(poll=poll, text=f"Option {n}", order=n) for n in range(3))
+        cls.poll = cls.polls[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.client_for(self.owner)
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return client
+
+    def test_unlisted_views_are_not_checked(self):
+        # The admin is not budgeted
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", password="pw")
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(reverse("admin:index")).status_code, 200)
+
+    def test_poll_list(self):
+        self.assertEqual(self.client.get(reverse("poll-list-create")).status_code, 200)
+
+    def test_poll_list_search(self):
+        self.assertEqual(self.client.get(reverse("poll-list-create"), {"search": "poll"}).status_code, 200)
+
+    def test_poll_create(self):
+        response = self.client.post(reverse("poll-list-create"), {
+            "title": "New poll", "options": [{"text": f"Option {n}"} for n in range(6)],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([option["order"] for option in response.data["options"]], list(range(6)))
+
+    def test_poll_detail(self):
+        self.assertEqual(self.client.get(reverse("poll-detail", args=[self.poll.pk])).status_code, 200)
+
+    def test_poll_results(self):
+        self.assertEqual(self.client.get(reverse("poll-results", args=[self.poll.pk])).status_code, 200)
+
+    def test_poll_results_stream(self):
+        # A missing poll answers before the stream starts; the stream itself reads no rows
+        response = self.client.get(reverse("poll-results-stream", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_poll_results_batch(self):
+        ids = ",".join(str(poll.pk) for poll in self.polls)
+        self.assertEqual(self.client.get(reverse("poll-results-batch"), {"ids": ids}).status_code, 200)
+
+    def test_campaign_results(self):
+        self.assertEqual(self.client.get(reverse("campaign-results", args=[self.campaign.pk])).status_code, 200)
+
+    def test_poll_trending(self):
+        self.assertEqual(self.client.get(reverse("poll-trending")).status_code, 200)
+
+    def test_poll_trending_with_scores(self):
+        # Scores live in Redis; the feed's queries are the polls and their options
+        scores = [(str(poll.pk), float(n)) for n, poll in enumerate(self.polls)]
+        with mock.patch("voteapp.views.trending.top", return_value=scores):
+            response = self.client.get(reverse("poll-trending"))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), 10)
+            cache.clear()
+            self.assertEqual(APIClient().get(reverse("poll-trending")).status_code, 200)
+
+    def test_vote_create(self):
+        option = self.poll.options.first()
+        response = self.client_for(self.voter).post(
+            reverse("vote-create"), {"poll": str(self.poll.pk), "option": str(option.pk)}, format="json")
+        self.assertIn(response.status_code, (201, 202))
+
+    def test_category_list(self):
+        self.assertEqual(self.client.get(reverse("category-list-create")).status_code, 200)
+
+    def test_category_create(self):
+        response = self.client.post(reverse("category-list-create"), {"title": "New category"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_category_detail(self):
+        url = reverse("category-detail", args=[self.category.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.patch(url, {"description": "Updated"}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+    def test_campaign_list(self):
+        self.assertEqual(self.client.get(reverse("campaign-list-create")).status_code, 200)
+
+    def test_campaign_create(self):
+        response = self.client.post(reverse("campaign-list-create"), {"title": "New campaign"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_campaign_poll_import(self):
+        polls = [
+            {"title": f"Imported {n}", "category": str(self.category.pk),
+             "options": [{"text": "Yes"}, {"text": "No"}]}
+            for n in range(20)
+        ]
+        response = self.client.post(reverse("campaign-poll-import", args=[self.campaign.pk]), {"polls": polls},
+                                    format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 20)
+        self.assertEqual(PollOption.objects.filter(poll__title__startswith="Imported").count(), 40)
+
+    def test_campaign_detail(self):
+        url = reverse("campaign-detail", args=[self.campaign.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url, {"include": "stats"}).status_code, 200)
+        self.assertEqual(self.client.patch(url, {"description": "Updated"}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FastReadPathTests(TestCase):
+    """The fast serializers and renderer produce the same bytes as DRF's"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email="owner@example.com", password=None)
+        category = Category.objects.create(title="Category", created_by=owner)
+        campaign = Campaign.objects.create(title="Campaign", created_by=owner)
+        expires_at = timezone.now() + datetime.timedelta(days=3, microseconds=123456)
+        cls.polls = [
+            Poll.objects.create(title="Ünïcode poll", description="Line\u2028separated “quotes”", created_by=owner,
+                                category=category, campaign=campaign, expires_at=expires_at),
+            Poll.objects.create(title="No options", created_by=owner, is_active=False, allow_multiple_votes=True),
+        ] + [Poll.objects.create(title=f"Poll {n}", created_by=owner, category=category) for n in range(12)]
+        for poll in cls.polls[:1] + cls.polls[2:]:
+            options = PollOption.objects.bulk_create(
+                PollOption(poll=poll, text=f"Option {n}", order=2 - n, vote_count=n * 7) for n in range(3))
+            PollOptionCounter.objects.create(option=options[0], shard=1, count=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_same_bytes(self, drf_data, fast_data):
+        self.assertEqual(JSONRenderer().render(drf_data), JSONRenderer().render(fast_data))
+        self.assertEqual(JSONRenderer().render(drf_data), FastJSONRenderer().render(fast_data))
+
+    def test_poll_serializer(self):
+        queryset = PollListCreateView.queryset.all()
+        self.assert_same_bytes(PollSerializer(queryset, many=True).data,
+                               FastPollSerializer(FastPollSerializer.values(queryset), many=True).data)
+        poll = PollDetailView.queryset.all().get(pk=self.polls[0].pk)
+        row = FastPollSerializer.values(PollDetailView.queryset).get(pk=poll.pk)
+        self.assert_same_bytes(PollSerializer(poll).data, FastPollSerializer(row).data)
+
+    def test_poll_serializer_sparse(self):
+        queryset = PollListCreateView.queryset.all()
+        for names in ({"id", "created_at", "category"}, {"title", "options"}):
+            self.assert_same_bytes(
+                PollSerializer(queryset, many=True, fields=names).data,
+                FastPollSerializer(FastPollSerializer.values(queryset, names), many=True, fields=names).data,
+            )
+
+    def test_renderer(self):
+        data = {
+            "when": timezone.now().replace(microsecond=654321),
+            "day": datetime.date(2024, 2, 29),
+            "amount": decimal.Decimal("12.50"),
+            "id": uuid.uuid4(),
+            "lazy": gettext_lazy("Not found."),
+            "error": ErrorDetail("Invalid.", code="invalid"),
+            "text": "Ünïcode\u2028and\u2029separators",
+            "numbers": [0, -1, 2 ** 40, 33.33, 100.0, 0.1],
+            "flags": (True, False, None),
+            "nested": {"empty": [], "more": {}},
+        }
+        self.assertEqual(JSONRenderer().render(data), FastJSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def get_both(self, get, path, **params):
+        """Response bodies of a GET with the fast read path off, then on"""
+        bodies = []
+        for fast_read_path in (FAST_READ_PATH_OFF, settings.FAST_READ_PATH):
+            cache.clear()
+            with self.settings(FAST_READ_PATH=fast_read_path):
+                response = get(path, params)
+                self.assertEqual(response.status_code, 200)
+                bodies.append(response.content)
+        return bodies
+
+    def assert_endpoint_unchanged(self, path, **params):
+        client = APIClient()
+        sync_list, sync_detail = PollListCreateView.as_view(), PollDetailView.as_view()
+        factory = APIRequestFactory()
+
+        def get_sync(path, params):
+            request = factory.get(path, params)
+            if path == reverse("poll-list-create"):
+                response = sync_list(request)
+            else:
+                response = sync_detail(request, pk=self.polls[0].pk)
+            return response.render()
+
+        for get in (client.get, get_sync):
+            off, on = self.get_both(get, path, **params)
+            self.assertEqual(off, on)
+
+    def test_poll_list_endpoint(self):
+        path = reverse("poll-list-create")
+        self.assert_endpoint_unchanged(path)
+        self.assert_endpoint_unchanged(path, page=2)
+        self.assert_endpoint_unchanged(path, pagination="cursor")
+        self.assert_endpoint_unchanged(path, fields="id,title")
+        self.assert_endpoint_unchanged(path, omit="options", ordering="title")
+        self.assert_endpoint_unchanged(path, search="poll")
+
+    def test_poll_detail_endpoint(self):
+        path = reverse("poll-detail", args=[self.polls[0].pk])
+        self.assert_endpoint_unchanged(path)
+        self.assert_endpoint_unchanged(path, fields="options")
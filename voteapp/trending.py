@@ -0,0 +1,188 @@
+"""
+Trending polls from time-decayed vote scores in Redis sorted sets.
+
+A vote cast at time t is worth 2 ** ((t - epoch) / HALF_LIFE) instead of
+decaying every score as time passes (forward decay): older votes are worth
+exponentially less than newer ones, and the ranking never changes without
+a vote, so a vote is a single ZINCRBY and the top N is one ZREVRANGE.
+Scores are kept per poll in a global set and in one set per category and
+per campaign. rebase_scores() periodically moves the epoch forward and
+scales every set down so the weights stay far from float overflow; a vote
+triggers it itself if that has not happened for 64 half-lives. Scripts
+only touch keys they are given in KEYS, so the rebase reads the registry
+of sets first and passes them all.
+
+The sets are an index, not the source of truth: polls are looked up in the
+database when a feed is read, so inactive, expired, deleted or recategorised
+polls drop out of it. A poll moved to another category only ranks there
+with the votes cast after the move.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+from .cache_utils import get_redis, redis_key
+from .models import Poll, Vote
+
+# KEYS: epoch, registry, sorted sets; ARGV: now, half-life, member, votes, max entries, ttl
+# Returns 1 when the epoch is overdue for rebase_scores()
+RECORD_VOTES = """
+local now, half_life = tonumber(ARGV[1]), tonumber(ARGV[2])
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[1], now)
+end
+local weight = tonumber(ARGV[4]) * math.pow(2, (now - epoch) / half_life)
+local keep = tonumber(ARGV[5])
+for i = 3, #KEYS do
+    redis.call('ZINCRBY', KEYS[i], weight, ARGV[3])
+    if redis.call('ZCARD', KEYS[i]) > keep then
+        redis.call('ZREMRANGEBYRANK', KEYS[i], 0, -keep - 1)
+    end
+    redis.call('EXPIRE', KEYS[i], ARGV[6])
+    redis.call('SADD', KEYS[2], KEYS[i])
+end
+if (now - epoch) / half_life > 64 then
+    return 1
+end
+return 0
+"""
+
+# KEYS: epoch, registry, every set in the registry; ARGV: now, half-life
+# Moves the epoch to now and scales every set by the same factor. Returns
+# the number of sets rescaled, or -1 if the registry no longer matches KEYS.
+REBASE = """
+if redis.call('SCARD', KEYS[2]) ~= #KEYS - 2 then
+    return -1
+end
+for i = 3, #KEYS do
+    if redis.call('SISMEMBER', KEYS[2], KEYS[i]) == 0 then
+        return -1
+    end
+end
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    return 0
+end
+local now, half_life = tonumber(ARGV[1]), tonumber(ARGV[2])
+local factor = math.pow(2, (epoch - now) / half_life)
+local rescaled = 0
+for i = 3, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('ZUNIONSTORE', KEYS[i], 1, KEYS[i], 'WEIGHTS', factor)
+        rescaled = rescaled + 1
+    else
+        redis.call('SREM', KEYS[2], KEYS[i])
+    end
+end
+redis.call('SET', KEYS[1], now)
+return rescaled
+"""
+
+# Registry reads before rebase_scores() gives up on a registry that keeps changing
+REBASE_ATTEMPTS = 5
+
+logger = logging.getLogger('voteapp')
+
+
+def _epoch_key():
+    return redis_key("trending", "epoch")
+
+
+def _registry_key():
+    return redis_key("trending", "keys")
+
+
+def feed_key(category_id=None, campaign_id=None):
+    if campaign_id is not None:
+        return redis_key("trending", "campaign", campaign_id)
+    if category_id is not None:
+        return redis_key("trending", "category", category_id)
+    return redis_key("trending", "all")
+
+
+def _poll_keys(poll_id, category_id, campaign_id):
+    keys = [feed_key()]
+    if category_id is not None:
+        keys.append(feed_key(category_id=category_id))
+    if campaign_id is not None:
+        keys.append(feed_key(campaign_id=campaign_id))
+    return keys
+
+
+def record_votes(votes):
+    """Add committed votes to the trending scores of their polls"""
+    conn = get_redis()
+    if conn is None or not votes:
+        return
+    counts = {}
+    for vote in votes:
+        counts[vote.poll_id] = counts.get(vote.poll_id, 0) + 1
+    # Polls already loaded by the vote path save the lookup
+    polls = {vote.poll_id: vote.poll for vote in votes if Vote.poll.is_cached(vote)}
+    missing = set(counts) - set(polls)
+    if missing:
+        polls.update(Poll.objects.only('id', 'category_id', 'campaign_id').in_bulk(missing))
+
+    conf = settings.TRENDING
+    now = time.time()
+    script = conn.register_script(RECORD_VOTES)
+    pipe = conn.pipeline()
+    for poll_id, n in counts.items():
+        poll = polls.get(poll_id)
+        if poll is None:
+            continue
+        keys = [_epoch_key(), _registry_key(), *_poll_keys(poll_id, poll.category_id, poll.campaign_id)]
+        script(keys=keys, args=[now, conf['HALF_LIFE'], str(poll_id), n, conf['MAX_ENTRIES'], conf['TTL']],
+               client=pipe)
+    if any(pipe.execute()):
+        # rebase_scores() has not run for a while: keep weights within float range
+        rebase_scores()
+
+
+def forget(poll):
+    """Drop a deleted poll from the feeds it was in"""
+    conn = get_redis()
+    if conn is not None:
+        pipe = conn.pipeline()
+        for key in _poll_keys(poll.pk, poll.category_id, poll.campaign_id):
+            pipe.zrem(key, str(poll.pk))
+        pipe.execute()
+
+
+def top(limit, category_id=None, campaign_id=None):
+    """
+    [(poll_id, score)] of the highest scored polls, best first. A score is
+    the number of votes the poll would need right now to match its decayed
+    votes; candidates beyond ``limit`` make up for polls filtered out later.
+    """
+    conn = get_redis()
+    if conn is None:
+        return []
+    pipe = conn.pipeline()
+    pipe.get(_epoch_key())
+    pipe.zrevrange(feed_key(category_id, campaign_id), 0, limit * settings.TRENDING['OVERFETCH'] - 1,
+                   withscores=True)
+    epoch, members = pipe.execute()
+    if epoch is None:
+        return []
+    decay = 2 ** ((float(epoch) - time.time()) / settings.TRENDING['HALF_LIFE'])
+    return [(member.decode(), score * decay) for member, score in members]
+
+
+def rebase_scores():
+    """Move the epoch to now and scale every feed to match; returns the number of feeds rescaled"""
+    conn = get_redis()
+    if conn is None:
+        return 0
+    rebase = conn.register_script(REBASE)
+    for _ in range(REBASE_ATTEMPTS):
+        feeds = [key.decode() for key in conn.smembers(_registry_key())]
+        rescaled = rebase(keys=[_epoch_key(), _registry_key(), *feeds],
+                          args=[time.time(), settings.TRENDING['HALF_LIFE']])
+        if rescaled >= 0:
+            return rescaled
+    logger.warning("Trending scores not rebased: new feeds kept being registered")
+    return 0
@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from .views import (PollListCreateView, PollDetailView, VoteCreateView,
-                    PollResultsView, CategoryListCreateView, CategoryDetailView,
-                    CampaignListCreateView, CampaignDetailView)
+                    PollResultsView, BatchResultsView, PollTrendingView, CategoryListCreateView,
+                    CategoryDetailView, CampaignListCreateView, CampaignDetailView, CampaignPollImportView,
+                    CampaignResultsView, poll_results_stream)
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+    poll_list_create = async_views.poll_list_create
+    poll_detail = async_views.poll_detail
+    poll_results = async_views.poll_results
+else:
+    poll_list_create = PollListCreateView.as_view()
+    poll_detail = PollDetailView.as_view()
+    poll_results = PollResultsView.as_view()
 
 urlpatterns = [
-    path("polls/", PollListCreateView.as_view(), name="poll-list-create"),
-    path("polls/<uuid:pk>/", PollDetailView.as_view(), name="poll-detail"),
-    path("polls/<uuid:pk>/results/", PollResultsView.as_view(), name="poll-results"),
+    path("polls/", poll_list_create, name="poll-list-create"),
+    path("polls/trending/", PollTrendingView.as_view(), name="poll-trending"),
+    path("polls/<uuid:pk>/", poll_detail, name="poll-detail"),
+    path("polls/<uuid:pk>/results/", poll_results, name="poll-results"),
+    path("polls/<uuid:pk>/results/stream/", poll_results_stream, name="poll-results-stream"),
+    path("results/", BatchResultsView.as_view(), name="poll-results-batch"),
     path("votes/", VoteCreateView.as_view(), name="vote-create"),
     
     path("categories/", CategoryListCreateView.as_view(), name="category-list-create"),
@@ -14,6 +29,8 @@ urlpatterns = [
 
     path("campaigns/", CampaignListCreateView.as_view(), name="campaign-list-create"),
     path("campaigns/<uuid:pk>/", CampaignDetailView.as_view(), name="campaign-detail"),
+    path("campaigns/<uuid:pk>/polls/", CampaignPollImportView.as_view(), name="campaign-poll-import"),
+    path("campaigns/<uuid:pk>/results/", CampaignResultsView.as_view(), name="campaign-results"),
 
 ]
 
@@ -1,40 +1,52 @@
 from rest_framework import generics, permissions, filters, status
 from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from asgiref.sync import sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
 from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie, vary_on_headers
+from django.views.decorators.http import condition
 
 from .models import Poll, PollOption, Vote, Category, Campaign
 from .serializers import (
     PollSerializer, CreatePollSerializer, VoteSerializer, 
-    CategorySerializer, CampaignSerializer
+    CategorySerializer, CampaignSerializer, CampaignPollImportSerializer, FastPollSerializer
 )
-from .pagination import StandardResultsSetPagination, LargeResultsSetPagination
-from .cache_utils import cache_response, invalidate_cache_pattern
+from .pagination import BatchResultsPagination, HybridResultsSetPagination
+from .search import PollSearchFilter
+from .vote_buffer import buffer_enabled
+from . import etags, fieldsets, rollups, tally, trending
+from .fast_serializers import FastReadMixin
+from .fieldsets import SparseFieldsetsMixin
+from .streaming import get_hub, results_event_stream
+from .cache_utils import StillComputing, cache_list_response, cache_response, invalidate_namespace
 import logging
+import uuid
 
 logger = logging.getLogger('voteapp')
 
-class PollListCreateView(generics.ListCreateAPIView):
-    queryset = Poll.objects.select_related('category', 'campaign', 'created_by').prefetch_related('options').all().order_by("-created_at")
+class PollListCreateView(FastReadMixin, SparseFieldsetsMixin, generics.ListCreateAPIView):
+    queryset = Poll.objects.select_related('category', 'campaign', 'created_by').prefetch_related(
+        Prefetch('options', queryset=PollOption.objects.with_live_counts())).all().order_by("-created_at", "-id")
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = HybridResultsSetPagination
+    filter_backends = [DjangoFilterBackend, PollSearchFilter, filters.OrderingFilter]
     filterset_fields = ["category", "campaign", "is_active"]
     search_fields = ["title", "description"]
     ordering_fields = ["created_at", "title"]
+    fast_serializer_class = FastPollSerializer
 
     def get_serializer_class(self):
         if self.request.method == "POST":
             return CreatePollSerializer
         return PollSerializer
 
-    @method_decorator(cache_page(settings.CACHE_TTL.get('polls_list', 300)))
-    @method_decorator(vary_on_headers("Authorization"))
+    @method_decorator(condition(etag_func=etags.namespace_list_etag('polls')))
+    @cache_list_response('polls', settings.CACHE_TTL.get('polls_list', 300))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -42,38 +54,34 @@ class PollListCreateView(generics.ListCreateAPIView):
         try:
             poll = serializer.save(created_by=self.request.user)
             logger.info(f"Poll created: {poll.title} by user {self.request.user.username}")
-            invalidate_cache_pattern('polls')
+            invalidate_namespace('polls')
         except Exception as e:
             logger.error(f"Error creating poll: {str(e)}", exc_info=True)
             raise
 
 
-class PollDetailView(generics.RetrieveAPIView):
-    queryset = Poll.objects.select_related('category', 'campaign', 'created_by').prefetch_related('options__votes').all()
+class PollDetailView(FastReadMixin, generics.RetrieveAPIView):
+    # Vote rows are never loaded: option counts come from vote_count and the counter shards
+    queryset = Poll.objects.prefetch_related(
+        Prefetch('options', queryset=PollOption.objects.with_live_counts())).all()
     serializer_class = PollSerializer
+    fast_serializer_class = FastPollSerializer
     permission_classes = [permissions.AllowAny]
 
+    @method_decorator(condition(etag_func=etags.poll_detail_etag))
+    @cache_response(timeout=settings.CACHE_TTL.get('poll_detail', 600), key_prefix='poll_detail',
+                    version_func=etags.poll_detail_etag)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def retrieve(self, request, *args, **kwargs):
-        # Create cache key
-        cache_key = f"poll_detail_{kwargs.get('pk')}"
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-        
-        # Get fresh data
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        
-        # Cache the response
-        cache.set(
-            cache_key, 
-            serializer.data, 
-            settings.CACHE_TTL.get('poll_detail', 600)
-        )
-        
-        return Response(serializer.data)
+        # The rendered bytes are cached by get(), under the ETag
+        fields = fieldsets.requested_fields(request, self.get_serializer_class())
+        data = self.get_serializer(self.get_object()).data
+
+        # Counts come from the live tally, like the ETag: buffered votes may not be rows yet
+        data = tally.overlay_counts(data, tally.get_counts(kwargs['pk']))
+        return Response(fieldsets.project(data, fields))
 
 
 class VoteCreateView(generics.CreateAPIView):
@@ -81,16 +89,21 @@ class VoteCreateView(generics.CreateAPIView):
     serializer_class = VoteSerializer
     permission_classes = [permissions.AllowAny]
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if buffer_enabled():
+            # Accepted into the vote buffer, written to the database by the flush task
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
     def perform_create(self, serializer):
         try:
             vote = serializer.save()
-            poll_id = vote.poll_option.poll.id
-            logger.info(f"Vote recorded for poll {poll_id}")
-            
-            # Invalidate caches
-            cache.delete(f"poll_detail_{poll_id}")
-            cache.delete(f"poll_results_{poll_id}")
-            invalidate_cache_pattern(f'polls')
+            # Cache invalidation runs from the votes_recorded signal once the vote is committed
+            logger.info(f"Vote {'queued' if buffer_enabled() else 'recorded'} for poll {vote.poll_id}")
+        except ValidationError:
+            # duplicate votes surface here from the unique constraints
+            raise
         except Exception as e:
             logger.error(f"Error recording vote: {str(e)}", exc_info=True)
             raise
@@ -99,51 +112,141 @@ class VoteCreateView(generics.CreateAPIView):
 class PollResultsView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @method_decorator(condition(etag_func=etags.poll_results_etag))
+    @cache_response(timeout=settings.CACHE_TTL.get('poll_results', 120), key_prefix='poll_results',
+                    version_func=etags.poll_results_etag)
     def get(self, request, pk):
-        # Create cache key
-        cache_key = f"poll_results_{pk}"
-        
-        # Try to get from cache
-        cached_results = cache.get(cache_key)
-        if cached_results:
-            return Response(cached_results)
-        
-        # Get fresh results
-        try:
-            poll = Poll.objects.select_related('category').prefetch_related('options__votes').get(pk=pk)
-        except Poll.DoesNotExist:
+        # Served from the live Redis tally; the database is only read to rebuild it
+        results = tally.get_results(pk)
+        if results is None:
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        results = poll.get_results()
-        
-        # Cache the results
-        cache.set(
-            cache_key, 
-            results, 
-            settings.CACHE_TTL.get('poll_results', 120)
-        )
-        
         return Response(results)
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class BatchResultsView(APIView):
+    """
+    GET ?ids=<uuid>,<uuid>,...: Results of many polls in one request, from
+    the live tallies (see tally.get_many_results). Ids of polls that don't
+    exist are listed in not_found.
+    """
+    permission_classes = [permissions.AllowAny]
+    ids_query_param = 'ids'
+    max_ids = 100
+
+    def get_ids(self, request):
+        ids = []
+        for value in request.query_params.get(self.ids_query_param, '').split(','):
+            if not value.strip():
+                continue
+            try:
+                ids.append(str(uuid.UUID(value.strip())))
+            except ValueError:
+                raise ValidationError({self.ids_query_param: [f"'{value.strip()}' is not a valid UUID."]})
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise ValidationError({self.ids_query_param: ["This query parameter is required."]})
+        if len(ids) > self.max_ids:
+            raise ValidationError({self.ids_query_param: [f"At most {self.max_ids} polls per request."]})
+        return ids
+
+    def get(self, request):
+        ids = self.get_ids(request)
+        results = tally.get_many_results(ids)
+        return Response({
+            'results': [results[pk] for pk in ids if pk in results],
+            'not_found': [pk for pk in ids if pk not in results],
+        })
+
+
+class CampaignResultsView(generics.GenericAPIView):
+    """
+    GET: Results of a campaign's polls, newest first, a page of up to 100
+    (?page_size=, default 50) fetched together by tally.get_many_results.
+    """
+    permission_classes = [permissions.AllowAny]
+    pagination_class = BatchResultsPagination
+
+    def get_queryset(self):
+        return Poll.objects.filter(campaign_id=self.kwargs['pk']).order_by(
+            '-created_at', '-id').values_list('pk', flat=True)
+
+    def get(self, request, pk):
+        page = self.paginate_queryset(self.get_queryset())
+        if not page and not Campaign.objects.filter(pk=pk).exists():
+            raise NotFound("No Campaign matches the given query.")
+        results = tally.get_many_results(page)
+        return self.get_paginated_response([results[str(poll_id)] for poll_id in page if str(poll_id) in results])
+
+
+class PollTrendingView(APIView):
+    """
+    GET: Active polls with the most recent votes, best first, from the
+    trending sorted sets. Filters: ?category=, ?campaign=, ?limit= (default 10).
+    """
+    permission_classes = [permissions.AllowAny]
+    queryset = PollListCreateView.queryset
+    default_limit = 10
+    max_limit = 50
+
+    def get_filter(self, request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            raise ValidationError({name: ["Must be a valid UUID."]})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        return max(1, min(limit, self.max_limit))
+
+    @cache_response(timeout=settings.CACHE_TTL.get('polls_trending', 30), key_prefix='polls_trending')
+    def get(self, request):
+        category_id = self.get_filter(request, 'category')
+        campaign_id = self.get_filter(request, 'campaign')
+        limit = self.get_limit(request)
+
+        scores = dict(trending.top(limit, category_id=category_id, campaign_id=campaign_id))
+        # The sorted sets only rank; whether a poll still belongs in the feed is up to the database
+        queryset = self.queryset.filter(pk__in=scores, is_active=True).filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+        if category_id:
+            queryset = queryset.filter(category_id=category_id)
+        if campaign_id:
+            queryset = queryset.filter(campaign_id=campaign_id)
+        polls = sorted(queryset, key=lambda poll: scores[str(poll.pk)], reverse=True)[:limit]
+
+        results = []
+        for poll in polls:
+            data = PollSerializer(poll).data
+            data['trending_score'] = round(scores[str(poll.pk)], 4)
+            results.append(data)
+        return Response({'results': results})
+
+
+class CategoryListCreateView(SparseFieldsetsMixin, generics.ListCreateAPIView):
     """
     GET: List all categories (cached)
     POST: Create a new category
     """
-    queryset = Category.objects.select_related('created_by').all().order_by("-created_at")
+    queryset = Category.objects.select_related('created_by').all().order_by("-created_at", "-id")
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = HybridResultsSetPagination
 
-    @method_decorator(cache_page(settings.CACHE_TTL.get('categories', 900)))
+    @method_decorator(condition(etag_func=etags.namespace_list_etag('categories')))
+    @cache_list_response('categories', settings.CACHE_TTL.get('categories', 900))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         # Invalidate categories cache
-        invalidate_cache_pattern('categories')
+        invalidate_namespace('categories')
 
 
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -156,55 +259,51 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    @method_decorator(condition(etag_func=etags.namespace_detail_etag('categories')))
+    @cache_response(timeout=settings.CACHE_TTL.get('categories', 900), key_prefix='categories',
+                    version_func=etags.namespace_detail_etag('categories'))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def retrieve(self, request, *args, **kwargs):
-        cache_key = f"category_detail_{kwargs.get('pk')}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data)
-        
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        cache.set(cache_key, serializer.data, settings.CACHE_TTL.get('categories', 900))
-        
-        return Response(serializer.data)
+        # The rendered bytes are cached by get(), under the ETag
+        fields = fieldsets.requested_fields(request, self.get_serializer_class())
+        return Response(fieldsets.project(self.get_serializer(self.get_object()).data, fields))
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        # Invalidate cache for this category
-        cache.delete(f"category_detail_{instance.pk}")
-        invalidate_cache_pattern('categories')
+        serializer.save()
+        # Invalidate category list and detail caches
+        invalidate_namespace('categories')
 
     def perform_destroy(self, instance):
-        pk = instance.pk
         instance.delete()
-        cache.delete(f"category_detail_{pk}")
-        invalidate_cache_pattern('categories')
+        invalidate_namespace('categories')
 
 
-class CampaignListCreateView(generics.ListCreateAPIView):
+class CampaignListCreateView(SparseFieldsetsMixin, generics.ListCreateAPIView):
     """
     GET: List all campaigns (cached)
     POST: Create a new campaign
     """
-    queryset = Campaign.objects.select_related('created_by').all().order_by("-created_at")
+    queryset = Campaign.objects.select_related('created_by').all().order_by("-created_at", "-id")
     serializer_class = CampaignSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = HybridResultsSetPagination
 
-    @method_decorator(cache_page(settings.CACHE_TTL.get('campaigns', 900)))
+    @method_decorator(condition(etag_func=etags.namespace_list_etag('campaigns')))
+    @cache_list_response('campaigns', settings.CACHE_TTL.get('campaigns', 900))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         # Invalidate campaigns cache
-        invalidate_cache_pattern('campaigns')
+        invalidate_namespace('campaigns')
 
 
 class CampaignDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
-    GET: Retrieve one campaign (cached)
+    GET: Retrieve one campaign (cached), with its vote stats for ?include=stats
     PUT/PATCH: Update campaign
     DELETE: Delete campaign
     """
@@ -212,26 +311,71 @@ class CampaignDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CampaignSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    @method_decorator(condition(etag_func=etags.campaign_detail_etag))
+    @cache_response(timeout=settings.CACHE_TTL.get('campaigns', 900), key_prefix='campaigns',
+                    version_func=etags.campaign_detail_etag)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def retrieve(self, request, *args, **kwargs):
-        cache_key = f"campaign_detail_{kwargs.get('pk')}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data)
-        
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        cache.set(cache_key, serializer.data, settings.CACHE_TTL.get('campaigns', 900))
-        
-        return Response(serializer.data)
+        # The rendered bytes are cached by get(), under the ETag
+        fields = fieldsets.requested_fields(request, self.get_serializer_class())
+        data = fieldsets.project(self.get_serializer(self.get_object()).data, fields)
+        if rollups.stats_requested(request):
+            # ?include=stats: vote totals from the campaign rollup, not from its polls
+            data = {**data, 'stats': rollups.campaign_stats(kwargs.get('pk'))}
+        return Response(data)
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        cache.delete(f"campaign_detail_{instance.pk}")
-        invalidate_cache_pattern('campaigns')
+        serializer.save()
+        invalidate_namespace('campaigns')
 
     def perform_destroy(self, instance):
-        pk = instance.pk
         instance.delete()
-        cache.delete(f"campaign_detail_{pk}")
-        invalidate_cache_pattern('campaigns')
\ No newline at end of file
+        invalidate_namespace('campaigns')
+
+
+class CampaignPollImportView(generics.GenericAPIView):
+    """
+    POST: Create many polls, options included, in a campaign at once:
+    {"polls": [{"title": ..., "options": [{"text": ...}, ...]}, ...]}
+    """
+    queryset = Campaign.objects.all()
+    serializer_class = CampaignPollImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        campaign = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.context["campaign"] = campaign
+        serializer.save()
+        logger.info(f"Imported {serializer.data['created']} polls into campaign {campaign.pk} by user {request.user.pk}")
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+async def poll_results_stream(request, pk):
+    """
+    Server-Sent Events stream of a poll's live results: one 'results' event
+    with the full snapshot, then coalesced 'delta' events as votes arrive.
+    Needs an ASGI server.
+    """
+    try:
+        results = await sync_to_async(tally.get_results)(pk)
+    except StillComputing as exc:
+        # Plain Django view: answer what DRF would for it
+        response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+        response["Retry-After"] = str(exc.wait)
+        return response
+    if results is None:
+        return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    hub = get_hub()
+    subscriber = hub.subscribe(pk, results)
+    response = StreamingHttpResponse(
+        results_event_stream(pk, results, subscriber, hub),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,218 @@
+"""
+Buffered vote ingestion.
+
+With VOTE_INGESTION_MODE = 'buffered' a validated vote is appended to a
+Redis stream and acknowledged with 202; voteapp.tasks.flush_vote_buffer
+drains the stream in batches.
+
+Delivery guarantees:
+- A vote is only accepted once XADD has succeeded, so it is never lost
+  as long as Redis persists the stream.
+- Entries are read through a consumer group and XACKed only after the
+  database transaction commits and votes_recorded has been sent. Entries
+  left pending by a crashed worker are reclaimed with XAUTOCLAIM and
+  processed again.
+- Vote ids and times are assigned at ingest time. On redelivery rows
+  that already exist are skipped and counts are only bumped for newly
+  inserted rows, so a replayed batch never double-counts in the database.
+  votes_recorded is sent again for every vote of the batch that is in the
+  database, inserted now or before the crash, so the Redis side (tallies,
+  trending, rollups, voter sets, notifications) is delivered at least
+  once: only a worker dying between the signal and the XACK sends it
+  twice.
+- Votes whose option was deleted before the flush are dropped, and votes
+  whose user was deleted are kept without a user, as if they had been
+  flushed first: an entry can never fail its batch again on every retry.
+"""
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import ResponseError
+
+from .cache_utils import get_redis, redis_key
+from .counters import increment_vote_counts
+from .models import PollOption, Vote
+
+logger = logging.getLogger('voteapp')
+
+GROUP = "vote-flushers"
+
+
+def buffer_enabled():
+    return getattr(settings, 'VOTE_INGESTION_MODE', 'sync') == 'buffered'
+
+
+def _stream_key():
+    return redis_key("vote_buffer", "stream")
+
+
+def _pending_voters_key(poll_id):
+    return redis_key("vote_buffer", "voters", poll_id)
+
+
+def _consumer_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _ensure_group(conn):
+    try:
+        conn.xgroup_create(_stream_key(), GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def claim_voter(poll_id, voter_key):
+    """
+    Fast dedupe for votes still sitting in the buffer.
+    Returns False if the voter already has a buffered vote for this poll.
+    """
+    conn = get_redis()
+    key = _pending_voters_key(poll_id)
+    added = conn.sadd(key, voter_key)
+    conn.expire(key, settings.VOTE_BUFFER['VOTER_TTL'])
+    return bool(added)
+
+
+def enqueue_vote(poll, option, voter_user=None, voter_ip=None):
+    """Append a vote to the stream and return an unsaved Vote for the response"""
+    vote = Vote(
+        id=uuid.uuid4(),
+        poll=poll,
+        option=option,
+        voter_user=voter_user,
+        voter_ip=voter_ip,
+        voted_at=timezone.now(),
+    )
+    payload = {
+        "id": str(vote.id),
+        "poll": str(poll.pk),
+        "option": str(option.pk),
+        "voter_user": str(voter_user.pk) if voter_user else None,
+        "voter_ip": voter_ip,
+        "voted_at": vote.voted_at.isoformat(),
+    }
+    conn = get_redis()
+    conn.xadd(_stream_key(), {"vote": json.dumps(payload)})
+    schedule_flush(conn)
+    return vote
+
+
+def schedule_flush(conn=None):
+    """Queue at most one flush task per flush interval"""
+    from .tasks import flush_vote_buffer
+
+    conn = conn or get_redis()
+    interval = settings.VOTE_BUFFER['FLUSH_INTERVAL']
+    if conn.set(redis_key("vote_buffer", "scheduled"), 1, nx=True, ex=interval):
+        flush_vote_buffer.apply_async(countdown=interval)
+
+
+def _read_batch(conn, consumer, batch_size):
+    # Entries a dead consumer never acknowledged come first
+    _, entries, *_ = conn.xautoclaim(
+        _stream_key(), GROUP, consumer,
+        min_idle_time=settings.VOTE_BUFFER['CLAIM_IDLE_MS'],
+        start_id="0-0", count=batch_size,
+    )
+    if entries:
+        return entries
+    response = conn.xreadgroup(GROUP, consumer, {_stream_key(): ">"}, count=batch_size)
+    return response[0][1] if response else []
+
+
+def _write_batch(entries):
+    """
+    Insert one batch. Returns the Vote rows newly created and those a
+    previous attempt at the batch had already inserted.
+    """
+    votes = []
+    for _, fields in entries:
+        if not fields:
+            # deleted from the stream while pending
+            continue
+        data = json.loads(fields[b"vote"])
+        # Entries queued before voted_at was part of the payload
+        voted_at = parse_datetime(data["voted_at"]) if data.get("voted_at") else timezone.now()
+        votes.append(Vote(
+            id=data["id"],
+            poll_id=data["poll"],
+            option_id=data["option"],
+            voter_user_id=data["voter_user"],
+            voter_ip=data["voter_ip"],
+            voted_at=voted_at,
+        ))
+
+    ids = [vote.id for vote in votes]
+    with transaction.atomic():
+        replayed = list(Vote.objects.filter(id__in=ids))
+        existing = {str(vote.pk) for vote in replayed}
+        # Options deleted since the vote was accepted would poison the batch
+        options = {
+            (str(pk), str(poll_id)) for pk, poll_id in
+            PollOption.objects.filter(pk__in={vote.option_id for vote in votes}).values_list("id", "poll_id")
+        }
+        fresh = [
+            vote for vote in votes
+            if vote.id not in existing and (vote.option_id, vote.poll_id) in options
+        ]
+        # So would users deleted since: their votes stay, like Vote.voter_user's SET_NULL
+        users = {
+            str(pk) for pk in get_user_model().objects.filter(
+                pk__in={vote.voter_user_id for vote in fresh if vote.voter_user_id}
+            ).values_list("pk", flat=True)
+        }
+        for vote in fresh:
+            if vote.voter_user_id and vote.voter_user_id not in users:
+                logger.warning(f"Buffered vote {vote.id}: user {vote.voter_user_id} was deleted, keeping it anonymous")
+                vote.voter_user_id = None
+        # Unique constraint conflicts (a voter that also voted synchronously) are dropped
+        Vote.objects.bulk_create(fresh, ignore_conflicts=True)
+        inserted = set(
+            str(pk) for pk in Vote.objects.filter(id__in=[vote.id for vote in fresh]).values_list("id", flat=True)
+        )
+        created = [vote for vote in fresh if vote.id in inserted]
+        increment_vote_counts(Counter(vote.option_id for vote in created))
+    return created, replayed
+
+
+def flush(max_batches=None):
+    """Drain the stream into the database. Returns the number of votes inserted."""
+    from .signals import votes_recorded
+
+    conn = get_redis()
+    _ensure_group(conn)
+    consumer = _consumer_name()
+    batch_size = settings.VOTE_BUFFER['BATCH_SIZE']
+    total = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        entries = _read_batch(conn, consumer, batch_size)
+        if not entries:
+            break
+        created, replayed = _write_batch(entries)
+        # Before the XACK: a worker dying after the commit leaves the batch pending,
+        # and the replay announces the votes this attempt inserted
+        if created or replayed:
+            votes_recorded.send(sender=Vote, votes=created + replayed, buffered=True)
+        entry_ids = [entry_id for entry_id, _ in entries]
+        pipe = conn.pipeline()
+        pipe.xack(_stream_key(), GROUP, *entry_ids)
+        pipe.xdel(_stream_key(), *entry_ids)
+        pipe.execute()
+        batches += 1
+        total += len(created)
+
+    if total:
+        logger.info(f"Flushed {total} buffered votes in {batches} batches")
+    return total